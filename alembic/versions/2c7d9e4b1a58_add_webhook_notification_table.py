@@ -0,0 +1,45 @@
+"""Add webhook notification outbox table
+
+Revision ID: 2c7d9e4b1a58
+Revises: f1c9a3e6b482
+Create Date: 2025-06-24 09:42:18.530617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7d9e4b1a58'
+down_revision: Union[str, None] = 'f1c9a3e6b482'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'webhooknotification',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('url', sqlmodel.sql.sqltypes.AutoString(length=2048), nullable=False),
+        sa.Column('event_id', sa.Uuid(), nullable=False),
+        sa.Column('app_id', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+        sa.Column('event_name', sqlmodel.sql.sqltypes.AutoString(length=125), nullable=False),
+        sa.Column('outcome', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_webhooknotification_available_at_url', 'webhooknotification',
+                    ['available_at', 'url'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_webhooknotification_available_at_url', table_name='webhooknotification')
+    op.drop_table('webhooknotification')
@@ -0,0 +1,34 @@
+"""Add partial index on unprocessed analytics rows
+
+Revision ID: 3b7e1c9d4f21
+Revises: fc9356dfab8d
+Create Date: 2025-06-02 09:12:41.218530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c9d4f21'
+down_revision: Union[str, None] = 'fc9356dfab8d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_analyticstrackbase_unprocessed_created_at',
+        'analyticstrackbase',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_analyticstrackbase_unprocessed_created_at', table_name='analyticstrackbase')
@@ -0,0 +1,36 @@
+"""Add claim lease column and per-app backlog index
+
+Revision ID: 5e9b3d7a2c68
+Revises: c41a7e2b9f05
+Create Date: 2025-06-12 16:40:17.382645
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b3d7a2c68'
+down_revision: Union[str, None] = 'c41a7e2b9f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('analyticstrackbase', sa.Column('available_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_analyticstrackbase_unprocessed_app_id_created_at',
+        'analyticstrackbase',
+        ['app_id', 'created_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_analyticstrackbase_unprocessed_app_id_created_at', table_name='analyticstrackbase')
+    op.drop_column('analyticstrackbase', 'available_at')
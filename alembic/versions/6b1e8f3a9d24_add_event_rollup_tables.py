@@ -0,0 +1,41 @@
+"""Add per-minute and per-hour event rollup tables
+
+Revision ID: 6b1e8f3a9d24
+Revises: d3f8b6a4c170
+Create Date: 2025-06-18 10:12:44.208913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1e8f3a9d24'
+down_revision: Union[str, None] = 'd3f8b6a4c170'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ('eventrollupminute', 'eventrolluphour')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.create_table(
+            table,
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('app_id', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+            sa.Column('event_name', sqlmodel.sql.sqltypes.AutoString(length=125), nullable=False),
+            sa.Column('outcome', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('bucket', 'app_id', 'event_name', 'outcome'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_table(table)
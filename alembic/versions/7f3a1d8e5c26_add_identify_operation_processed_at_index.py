@@ -0,0 +1,34 @@
+"""Add processed_at index for the identify operation retention purge
+
+Revision ID: 7f3a1d8e5c26
+Revises: 2c7d9e4b1a58
+Create Date: 2025-06-25 10:12:47.291805
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3a1d8e5c26'
+down_revision: Union[str, None] = '2c7d9e4b1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_identifyoperation_processed_at',
+        'identifyoperation',
+        ['processed_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_identifyoperation_processed_at', table_name='identifyoperation')
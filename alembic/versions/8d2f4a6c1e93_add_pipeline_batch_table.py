@@ -0,0 +1,42 @@
+"""Add pipeline batch table
+
+Revision ID: 8d2f4a6c1e93
+Revises: 3b7e1c9d4f21
+Create Date: 2025-06-04 14:27:03.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f4a6c1e93'
+down_revision: Union[str, None] = '3b7e1c9d4f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pipelinebatch',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('destination', sqlmodel.sql.sqltypes.AutoString(length=32), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+        sa.Column('rows_fetched', sa.Integer(), nullable=False),
+        sa.Column('rows_delivered', sa.Integer(), nullable=False),
+        sa.Column('max_lag_seconds', sa.Float(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_pipelinebatch_finished_at'), 'pipelinebatch', ['finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pipelinebatch_finished_at'), table_name='pipelinebatch')
+    op.drop_table('pipelinebatch')
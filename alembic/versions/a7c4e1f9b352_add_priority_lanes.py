@@ -0,0 +1,46 @@
+"""Add priority lane column and per-lane backlog index
+
+Revision ID: a7c4e1f9b352
+Revises: 5e9b3d7a2c68
+Create Date: 2025-06-13 10:12:44.918204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e1f9b352'
+down_revision: Union[str, None] = '5e9b3d7a2c68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('analyticstrackbase', sa.Column('priority', sqlmodel.sql.sqltypes.AutoString(length=16),
+                                                  nullable=False, server_default='default'))
+    op.drop_index('ix_analyticstrackbase_unprocessed_app_id_created_at', table_name='analyticstrackbase')
+    op.create_index(
+        'ix_analyticstrackbase_unprocessed_priority_app_id_created_at',
+        'analyticstrackbase',
+        ['priority', 'app_id', 'created_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_analyticstrackbase_unprocessed_priority_app_id_created_at', table_name='analyticstrackbase')
+    op.create_index(
+        'ix_analyticstrackbase_unprocessed_app_id_created_at',
+        'analyticstrackbase',
+        ['app_id', 'created_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+    )
+    op.drop_column('analyticstrackbase', 'priority')
@@ -0,0 +1,28 @@
+"""Add claim lease column to identify operations
+
+Revision ID: b6e2f4a9d173
+Revises: 7f3a1d8e5c26
+Create Date: 2025-06-26 09:21:35.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2f4a9d173'
+down_revision: Union[str, None] = '7f3a1d8e5c26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('identifyoperation', sa.Column('available_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('identifyoperation', 'available_at')
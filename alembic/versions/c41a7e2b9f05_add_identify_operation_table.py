@@ -0,0 +1,49 @@
+"""Add identify operation table
+
+Revision ID: c41a7e2b9f05
+Revises: 8d2f4a6c1e93
+Create Date: 2025-06-09 11:03:52.706114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41a7e2b9f05'
+down_revision: Union[str, None] = '8d2f4a6c1e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'identifyoperation',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('app_id', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+        sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+        sa.Column('device_id', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+        sa.Column('user_properties', sa.JSON(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_identifyoperation_app_id'), 'identifyoperation', ['app_id'], unique=False)
+    op.create_index(
+        'ix_identifyoperation_unprocessed_created_at',
+        'identifyoperation',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_identifyoperation_unprocessed_created_at', table_name='identifyoperation')
+    op.drop_index(op.f('ix_identifyoperation_app_id'), table_name='identifyoperation')
+    op.drop_table('identifyoperation')
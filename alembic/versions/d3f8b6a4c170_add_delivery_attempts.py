@@ -0,0 +1,32 @@
+"""Add delivery attempt tracking to analytics events
+
+Revision ID: d3f8b6a4c170
+Revises: a7c4e1f9b352
+Create Date: 2025-06-16 09:27:03.551872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8b6a4c170'
+down_revision: Union[str, None] = 'a7c4e1f9b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('analyticstrackbase', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('analyticstrackbase', sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(length=255),
+                                                  nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('analyticstrackbase', 'last_error')
+    op.drop_column('analyticstrackbase', 'attempts')
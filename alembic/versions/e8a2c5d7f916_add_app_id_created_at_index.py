@@ -0,0 +1,32 @@
+"""Add app_id, created_at, id index for raw event queries
+
+Revision ID: e8a2c5d7f916
+Revises: 6b1e8f3a9d24
+Create Date: 2025-06-19 15:41:09.734120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a2c5d7f916'
+down_revision: Union[str, None] = '6b1e8f3a9d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_analyticstrackbase_app_id_created_at_id',
+        'analyticstrackbase',
+        ['app_id', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_analyticstrackbase_app_id_created_at_id', table_name='analyticstrackbase')
@@ -0,0 +1,62 @@
+"""Add replay job and chunk checkpoint tables
+
+Revision ID: f1c9a3e6b482
+Revises: e8a2c5d7f916
+Create Date: 2025-06-20 11:05:37.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c9a3e6b482'
+down_revision: Union[str, None] = 'e8a2c5d7f916'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'replayjob',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('destination', sqlmodel.sql.sqltypes.AutoString(length=32), nullable=False),
+        sa.Column('start', sa.DateTime(), nullable=False),
+        sa.Column('end', sa.DateTime(), nullable=False),
+        sa.Column('event_name', sqlmodel.sql.sqltypes.AutoString(length=125), nullable=True),
+        sa.Column('new_insert_ids', sa.Boolean(), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'replaychunk',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('job_id', sa.Uuid(), nullable=False),
+        sa.Column('app_id', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+        sa.Column('chunk_start', sa.DateTime(), nullable=False),
+        sa.Column('chunk_end', sa.DateTime(), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+        sa.Column('cursor_created_at', sa.DateTime(), nullable=True),
+        sa.Column('cursor_id', sa.Uuid(), nullable=True),
+        sa.Column('rows_sent', sa.Integer(), nullable=False),
+        sa.Column('rows_skipped', sa.Integer(), nullable=False),
+        sa.Column('rows_failed', sa.Integer(), nullable=False),
+        sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['replayjob.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_replaychunk_job_id'), 'replaychunk', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_replaychunk_job_id'), table_name='replaychunk')
+    op.drop_table('replaychunk')
+    op.drop_table('replayjob')
@@ -0,0 +1,86 @@
+"""
+Asynchronous reachability check for the Celery broker.
+
+The API process never blocks on Redis: the check opens a plain asyncio
+connection, sends a RESP ``PING`` and waits for ``+PONG`` with a short
+timeout, without importing redis or Celery. Results are cached and refreshed
+in the background, so /health reports the last known state immediately.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def ping_redis(url: str, timeout: float = 2.0) -> bool:
+    """
+    Return True when the Redis server at ``url`` answers PING.
+    """
+    parsed = urlparse(url)
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parsed.hostname or "localhost", parsed.port or 6379,
+                                    ssl=parsed.scheme == "rediss" or None),
+            timeout,
+        )
+        if parsed.password:
+            credentials = f"{parsed.username} {parsed.password}" if parsed.username else parsed.password
+            writer.write(f"AUTH {credentials}\r\n".encode())
+        writer.write(b"PING\r\n")
+        await writer.drain()
+        if parsed.password:
+            await asyncio.wait_for(reader.readline(), timeout)
+        reply = await asyncio.wait_for(reader.readline(), timeout)
+        return reply.startswith(b"+PONG")
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class BrokerStatus:
+    """
+    Last known broker reachability, refreshed in the background.
+    """
+
+    def __init__(self, url: str, interval: float):
+        self.url = url
+        self.interval = interval
+        self.reachable: Optional[bool] = None
+        self.checked_at: Optional[datetime] = None
+        self._checked_monotonic = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        reachable = await ping_redis(self.url)
+        if reachable != self.reachable:
+            log = logger.info if reachable else logger.warning
+            log("Celery broker %s is %s", urlparse(self.url).hostname, "reachable" if reachable else "unreachable")
+        self.reachable = reachable
+        self.checked_at = datetime.utcnow()
+        self._checked_monotonic = time.monotonic()
+        return reachable
+
+    def schedule_check(self) -> None:
+        """Start a check on the running loop unless one is in flight."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self.check())
+
+    def snapshot(self) -> Dict[str, Any]:
+        if time.monotonic() - self._checked_monotonic >= self.interval:
+            self.schedule_check()
+        return {
+            "reachable": self.reachable,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+        }
+
+
+broker_status = BrokerStatus(settings.CELERY_BROKER_URL, settings.BROKER_CHECK_INTERVAL_SECONDS)
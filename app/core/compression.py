@@ -0,0 +1,206 @@
+"""
+Compressed request bodies on the ingest endpoints.
+
+``DecompressionMiddleware`` accepts ``Content-Encoding: gzip`` and ``zstd``
+on POST requests under a path prefix and hands the route the decompressed
+JSON, so the routes and their body parsing stay unchanged.
+
+Bodies are decompressed while they are received, a bounded piece at a
+time, and rejected with 413 as soon as the output passes the size limit,
+so a small compression bomb cannot make the server inflate gigabytes.
+gzip is inflated chunk by chunk as it arrives; zstd, whose decoder cannot
+bound the output of a single input chunk, is measured through a bounded
+stream reader once the (size-limited) compressed body is in, and only then
+decoded. Bodies of several gzip members or zstd frames decode to their
+concatenation; a truncated member or frame is rejected with 400.
+
+zstd needs the ``zstandard`` package; without it zstd bodies get 415.
+"""
+import io
+import json
+import logging
+import zlib
+from typing import Callable, List, Optional
+
+from app.core.metrics import INGEST_BODY_BYTES, INGEST_COMPRESSION_RATIO
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed to accept zstd bodies
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ENCODINGS = ("gzip", "zstd")
+# Output produced per decompression step
+READ_SIZE = 64 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class GzipDecoder:
+    """
+    Incremental gzip decoder that never produces more than ``limit`` bytes.
+    Concatenated gzip members decode to the concatenation of their contents,
+    like ``gzip.decompress``; the limit covers all of them together.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self._parts: List[bytes] = []
+        self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def _take(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.limit:
+            raise BodyTooLarge()
+        self._parts.append(data)
+
+    def feed(self, chunk: bytes) -> None:
+        data = chunk
+        while data:
+            if self._inflater.eof:
+                # The previous member ended, the rest of the input is the next one
+                self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._take(self._inflater.decompress(data, READ_SIZE))
+            data = self._inflater.unused_data if self._inflater.eof else self._inflater.unconsumed_tail
+
+    def finish(self) -> bytes:
+        self._take(self._inflater.flush())
+        if not self._inflater.eof:
+            raise zlib.error("incomplete gzip stream")
+        return b"".join(self._parts)
+
+
+class ZstdDecoder:
+    """zstd decoder reading the output in bounded steps, up to ``limit`` bytes."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self._compressed: List[bytes] = []
+        self._compressed_size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        # The output is at least as large as the input for anything worth accepting
+        self._compressed_size += len(chunk)
+        if self._compressed_size > self.limit:
+            raise BodyTooLarge()
+        self._compressed.append(chunk)
+
+    def finish(self) -> bytes:
+        compressed = b"".join(self._compressed)
+        decompressor = zstandard.ZstdDecompressor()
+        # Measure first, in bounded steps, so a bomb is refused before it is inflated
+        with decompressor.stream_reader(io.BytesIO(compressed), read_across_frames=True) as reader:
+            while True:
+                data = reader.read(READ_SIZE)
+                if not data:
+                    break
+                self.size += len(data)
+                if self.size > self.limit:
+                    raise BodyTooLarge()
+
+        # The stream reader ends quietly at a truncated frame; decode frame by
+        # frame so an incomplete one is an error instead of lost events
+        parts = []
+        size = 0
+        while compressed:
+            frame = decompressor.decompressobj()
+            data = frame.decompress(compressed)
+            size += len(data)
+            if size > self.limit:
+                raise BodyTooLarge()
+            if not frame.eof:
+                raise zstandard.ZstdError("incomplete zstd frame")
+            parts.append(data)
+            compressed = frame.unused_data
+        return b"".join(parts)
+
+
+DECODERS = {"gzip": GzipDecoder, "x-gzip": GzipDecoder, "zstd": ZstdDecoder}
+
+
+async def _send_error(send: Callable, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class DecompressionMiddleware:
+    """
+    ASGI middleware decompressing gzip and zstd request bodies of POSTs under ``path_prefix``.
+    """
+
+    def __init__(self, app, path_prefix: str, max_body_bytes: int):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.max_body_bytes = max_body_bytes
+
+    @staticmethod
+    def _encoding(scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                return value.decode("latin-1").strip().lower()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+
+        encoding = self._encoding(scope)
+        if encoding in (None, "", "identity"):
+            return await self.app(scope, receive, send)
+
+        decoder_class = DECODERS.get(encoding)
+        if decoder_class is None or (decoder_class is ZstdDecoder and zstandard is None):
+            return await _send_error(send, 415, f"Unsupported Content-Encoding {encoding!r}, "
+                                                f"expected one of {list(SUPPORTED_ENCODINGS)}")
+        encoding = "zstd" if decoder_class is ZstdDecoder else "gzip"
+
+        decoder = decoder_class(self.max_body_bytes)
+        compressed_size = 0
+        try:
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                compressed_size += len(chunk)
+                decoder.feed(chunk)
+                more_body = message.get("more_body", False)
+            body = decoder.finish()
+        except BodyTooLarge:
+            return await _send_error(send, 413, f"Decompressed body exceeds {self.max_body_bytes} bytes")
+        except Exception as e:
+            logger.warning(f"Rejected {encoding} body that failed to decompress: {str(e)}")
+            return await _send_error(send, 400, f"Invalid {encoding} body")
+
+        INGEST_BODY_BYTES.labels(encoding, "compressed").inc(compressed_size)
+        INGEST_BODY_BYTES.labels(encoding, "decompressed").inc(len(body))
+        if compressed_size:
+            INGEST_COMPRESSION_RATIO.labels(encoding).observe(len(body) / compressed_size)
+
+        headers = [(name, value) for name, value in scope["headers"]
+                   if name not in (b"content-encoding", b"content-length")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        scope = {**scope, "headers": headers}
+
+        delivered = False
+
+        async def receive_decompressed():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, receive_decompressed, send)
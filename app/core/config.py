@@ -41,6 +41,181 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = "analytics_worker"
 
+    AMPLITUDE_API_KEY: str = "d68af844f7a681f8f9364981097737fb"
+    # Overrides the Amplitude endpoint, e.g. to point at benchmarks/fake_amplitude.py
+    AMPLITUDE_SERVER_URL: Optional[str] = None
+
+    # User-property operations for the same user within this window are merged into one identify
+    IDENTIFY_COALESCE_WINDOW_SECONDS: int = 60
+    IDENTIFY_BATCH_SIZE: int = 5000
+
+    # Sampling and pre-aggregation rules, see app/pipeline/rules.py
+    EVENT_RULES: list[dict[str, Any]] = []
+
+    # Weighted fair claiming across app_ids, see app/pipeline/scheduler.py
+    APP_WEIGHTS: dict[str, float] = {}
+    DEFAULT_APP_WEIGHT: float = 1.0
+    # Upper bound on the rows one app may take from a single batch
+    APP_QUOTAS: dict[str, int] = {}
+    # Claimed rows are hidden from other workers for this long unless acknowledged
+    CLAIM_LEASE_SECONDS: int = 300
+
+    # Failed deliveries are retried after base * 2^attempts seconds (capped, with
+    # jitter) and given up after DELIVERY_MAX_ATTEMPTS
+    DELIVERY_RETRY_BASE_SECONDS: float = 30.0
+    DELIVERY_RETRY_MAX_SECONDS: float = 3600.0
+    DELIVERY_MAX_ATTEMPTS: int = 10
+
+    # Backfill and replay, see replay.py and app/pipeline/replay.py
+    REPLAY_WORKERS: int = 4
+    REPLAY_CHUNK_MINUTES: int = 60
+    REPLAY_PAGE_SIZE: int = 1000
+    # Combined send rate of all replay workers, so a replay leaves room for live traffic
+    REPLAY_MAX_EVENTS_PER_SECOND: float = 200.0
+    # Sends of a page's transiently failed events before they are counted as failed
+    REPLAY_MAX_ATTEMPTS: int = 3
+
+    # Priority lanes, see app/pipeline/priority.py
+    # e.g. PRIORITY_EVENTS='{"purchase": "critical", "signup": "critical", "scroll": "low"}'
+    PRIORITY_EVENTS: dict[str, str] = {}
+    # Target ingest-to-delivery time per lane
+    LANE_SLO_SECONDS: dict[str, float] = {"critical": 10.0, "default": 300.0, "low": 3600.0}
+    # How often the critical lane is drained, independent of the one-minute beat tick
+    CRITICAL_LANE_INTERVAL_SECONDS: float = 5.0
+    # Minimum gap between on-ingest drains of the critical lane, per API process
+    CRITICAL_LANE_KICK_SECONDS: float = 1.0
+
+    CELERY_BROKER_URL: str = "redis://localhost:6379/0"
+    CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    # Seconds between background broker reachability checks reported by /health
+    BROKER_CHECK_INTERVAL_SECONDS: float = 30.0
+
+    # "celery" queues batches to Celery workers; "embedded" runs the dispatch
+    # loop inside the API process without Celery or Redis
+    PIPELINE_MODE: Literal["celery", "embedded"] = "celery"
+    # Spawn the Celery worker and beat from the API process on startup (celery mode)
+    CELERY_AUTOSTART: bool = True
+
+    # Overlap claiming, dispatching and acknowledging of consecutive batches,
+    # see run_overlapped_batches in app/pipeline/batch.py
+    PIPELINE_OVERLAP: bool = False
+    # Batches claimed but not yet acknowledged at once; bounds memory
+    PIPELINE_MAX_IN_FLIGHT: int = 3
+    # Batches one overlapped run works through before returning
+    PIPELINE_OVERLAP_BATCHES: int = 10
+
+    # Backlog-driven drain tasks (celery mode), see app/pipeline/autoscale.py
+    AUTOSCALE_ENABLED: bool = True
+    # Seconds between decisions; also how long a drain task runs at most
+    AUTOSCALE_INTERVAL_SECONDS: float = 15.0
+    # Drain tasks are sized to clear the backlog within this time, on top of new arrivals
+    AUTOSCALE_DRAIN_TARGET_SECONDS: float = 300.0
+    AUTOSCALE_MIN_TASKS: int = 0
+    AUTOSCALE_MAX_TASKS: int = 8
+    # Assumed rate of one drain task until batches have been recorded
+    AUTOSCALE_TASK_EVENTS_PER_SECOND: float = 200.0
+    # Lane drained by the drain tasks, together with the lanes above it
+    AUTOSCALE_LANE: Literal["critical", "default", "low"] = "low"
+    AUTOSCALE_BATCH_SIZE: int = 1000
+    # Also resize the pools of workers started with --autoscale to fit the drain tasks
+    AUTOSCALE_RESIZE_POOL: bool = False
+    # Pool processes kept beyond the drain tasks, for beat-driven batches
+    AUTOSCALE_POOL_RESERVE: int = 2
+
+    # callback_webhook delivery notifications, see app/pipeline/webhooks.py
+    WEBHOOKS_ENABLED: bool = True
+    WEBHOOK_INTERVAL_SECONDS: float = 5.0
+    # Notifications claimed per run, and events per POST to one URL
+    WEBHOOK_CLAIM_SIZE: int = 5000
+    WEBHOOK_BATCH_SIZE: int = 500
+    WEBHOOK_MAX_CONNECTIONS: int = 100
+    WEBHOOK_MAX_CONNECTIONS_PER_HOST: int = 4
+    # Per request, including the wait for a pooled connection
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_RETRY_BASE_SECONDS: float = 30.0
+    WEBHOOK_RETRY_MAX_SECONDS: float = 3600.0
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    # Hosts notifications may be sent to, e.g. WEBHOOK_ALLOWED_HOSTS='["hooks.example.com"]';
+    # empty allows any host. Private, loopback, link-local and reserved addresses are always refused
+    WEBHOOK_ALLOWED_HOSTS: list[str] = []
+
+    # Retention purge of processed rows, see app/pipeline/retention.py
+    # Days processed rows are kept, None keeps them forever; per app overrides, e.g.
+    # RETENTION_DAYS_BY_APP='{"esa": 90, "audit": null}'
+    RETENTION_DAYS: Optional[float] = None
+    RETENTION_DAYS_BY_APP: dict[str, Optional[float]] = {}
+    # Days per-minute rollups are kept, None keeps them forever
+    RETENTION_MINUTE_ROLLUP_DAYS: Optional[float] = None
+    # Days pipeline batch records and processed identify operations are kept, None keeps them forever
+    RETENTION_PIPELINE_BATCH_DAYS: Optional[float] = 7.0
+    RETENTION_IDENTIFY_OPERATION_DAYS: Optional[float] = 7.0
+    RETENTION_INTERVAL_SECONDS: float = 3600.0
+    # Rows deleted per transaction, and the pause between transactions
+    RETENTION_CHUNK_SIZE: int = 2000
+    RETENTION_PAUSE_SECONDS: float = 0.5
+    # The purge waits while a standby lags more or more backends are active
+    RETENTION_MAX_REPLICATION_LAG_SECONDS: float = 10.0
+    RETENTION_MAX_ACTIVE_BACKENDS: int = 20
+    # Time budget of one run; the next run continues
+    RETENTION_MAX_RUN_SECONDS: float = 1800.0
+
+    # Embedded dispatcher, see app/pipeline/embedded.py
+    EMBEDDED_CONCURRENCY: int = 2
+    EMBEDDED_BATCH_SIZE: int = 1000
+    EMBEDDED_INTERVAL_SECONDS: float = 60.0
+    # How long shutdown waits for queued and running batches to finish
+    EMBEDDED_DRAIN_TIMEOUT_SECONDS: float = 30.0
+
+    # Logging, see app/core/logs.py
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # Records buffered for the log writer thread before new ones are dropped
+    LOG_QUEUE_SIZE: int = 10000
+
+    # Seconds the /health pipeline snapshot is reused before the DB is queried again;
+    # also how often load shedding re-reads the backlog
+    HEALTH_CACHE_SECONDS: float = 5.0
+
+    # Largest ingest request body accepted after decompression, see app/core/compression.py
+    INGEST_MAX_BODY_BYTES: int = 10 * 1024 * 1024
+
+    # Ingest admission, see app/pipeline/backpressure.py
+    # Events per second per app_id, e.g. INGEST_RATE_LIMITS='{"esa": 500}'; unlisted
+    # apps get DEFAULT_INGEST_RATE_LIMIT, unlimited when None
+    INGEST_RATE_LIMITS: dict[str, float] = {}
+    DEFAULT_INGEST_RATE_LIMIT: Optional[float] = None
+    # Bucket size in seconds of the app's rate: how long a burst may run before it is limited
+    INGEST_BURST_SECONDS: float = 10.0
+    # "memory" limits each API process on its own, "redis" shares the buckets across processes
+    INGEST_RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    # Defaults to CELERY_BROKER_URL
+    INGEST_RATE_LIMIT_REDIS_URL: Optional[str] = None
+    # Ingest of a lane is refused with 429 once the backlog depth or the age of the
+    # oldest unprocessed row passes the lane's threshold; lower lanes are shed with it
+    SHED_BACKLOG_DEPTH: dict[str, int] = {"low": 1_000_000, "default": 5_000_000}
+    SHED_BACKLOG_AGE_SECONDS: dict[str, float] = {}
+    SHED_MAX_RETRY_AFTER_SECONDS: int = 300
+
+    # Tracing
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 1.0
+    TRACE_EXPORT_PATH: Optional[str] = "logs/traces.jsonl"
+    TRACE_OTLP_ENDPOINT: Optional[str] = None  # e.g. http://localhost:4318/v1/traces
+
+    # Connection pool per process; every Celery pool process and API worker has its own
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    # Recycle connections older than this many seconds, -1 to keep them
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Executions of a query before psycopg prepares it server-side, None to never prepare
+    DB_PREPARE_THRESHOLD: Optional[int] = 5
+    # Compiled SQL statements cached by SQLAlchemy per engine
+    DB_QUERY_CACHE_SIZE: int = 500
+    # Connect through PgBouncer in transaction pooling mode, see app/core/db.py
+    DB_PGBOUNCER: bool = False
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
@@ -1,10 +1,55 @@
+import os
+
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, create_engine
 
 from app.core.config import settings
 
-from app.models import *
+# Registers every table with SQLModel.metadata for init_db
+import app.models  # noqa: F401
+
+
+def create_db_engine():
+    """
+    Build the engine from the DB_* settings.
+
+    With DB_PGBOUNCER the app expects a PgBouncer in transaction pooling mode
+    in front of Postgres: connections are not pooled locally (PgBouncer does
+    that) and psycopg's server-side prepared statements are disabled, since
+    consecutive transactions may run on different server connections.
+    """
+    kwargs = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "query_cache_size": settings.DB_QUERY_CACHE_SIZE,
+    }
+    connect_args = {}
+
+    if settings.DB_PGBOUNCER:
+        kwargs["poolclass"] = NullPool
+        connect_args["prepare_threshold"] = None
+    else:
+        kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+        connect_args["prepare_threshold"] = settings.DB_PREPARE_THRESHOLD
+
+    return create_engine(str(settings.SQLALCHEMY_DATABASE_URI), connect_args=connect_args, **kwargs)
+
+
+engine = create_db_engine()
+
+
+def _dispose_pool_after_fork() -> None:
+    # Pooled connections inherited from the parent (e.g. before the Celery prefork
+    # pool starts) must not be used by the child; drop them without closing the
+    # sockets the parent still owns, so the child opens its own
+    engine.dispose(close=False)
+
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+os.register_at_fork(after_in_child=_dispose_pool_after_fork)
 
 
 def init_db(session: Session) -> None:
@@ -0,0 +1,182 @@
+"""
+Logging setup for the API, the Celery processes and the embedded dispatcher.
+
+Records are handed to a bounded in-memory queue by a non-blocking
+``QueueHandler`` and formatted and written by a ``QueueListener`` thread, so
+a slow terminal or disk never stalls a request or a batch. When the queue is
+full, records are dropped and counted instead of blocking the caller.
+
+Output is one JSON object per line by default (LOG_FORMAT=json), with the
+level, logger, message and any ``extra`` fields; LOG_FORMAT=text keeps the
+classic ``asctime - name - levelname - message`` lines. The level defaults
+to INFO (LOG_LEVEL).
+
+Hot paths should log with %-style arguments so nothing is formatted when the
+level is disabled, and use ``RateLimitedLog`` for per-event warnings.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+
+from app.core.config import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a single-line JSON object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that never blocks: records are dropped when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, since they may change after the call returns;
+        # the formatter and the I/O run on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitedLog:
+    """
+    Lets through at most ``limit`` messages per key within ``interval`` seconds
+    and reports how many were suppressed once the interval is over.
+
+    Usage:
+        missing_ids = RateLimitedLog(logger, interval=60)
+        missing_ids.warning("missing-ids", "Event %s has neither user_id nor device_id", event_name)
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 60.0, limit: int = 1):
+        self.logger = logger
+        self.interval = interval
+        self.limit = limit
+        self._windows: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def log(self, level: int, key: str, msg: str, *args, **kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = int(window[2]) if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    self.logger.log(level, "%d similar messages suppressed in the last %.0fs (%s)",
+                                    suppressed, self.interval, key)
+            if window[1] >= self.limit:
+                window[2] += 1
+                return
+            window[1] += 1
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def warning(self, key: str, msg: str, *args, **kwargs) -> None:
+        self.log(logging.WARNING, key, msg, *args, **kwargs)
+
+    def error(self, key: str, msg: str, *args, **kwargs) -> None:
+        self.log(logging.ERROR, key, msg, *args, **kwargs)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+_output_handlers: List[logging.Handler] = []
+
+
+def _start_listener() -> None:
+    global _listener
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive a fork (Celery prefork pool)
+    if _queue_handler is not None:
+        _start_listener()
+
+
+def configure_logging(level: Union[int, str, None] = None, log_file: Optional[str] = None) -> None:
+    """
+    Route all logging through the non-blocking queue handler.
+
+    Safe to call more than once; later calls replace the output handlers.
+
+    Args:
+        level: Level name or number, defaults to LOG_LEVEL
+        log_file: Write to this file instead of stderr
+    """
+    global _queue_handler, _output_handlers
+    level = level or settings.LOG_LEVEL
+    if isinstance(level, str):
+        level = level.upper()
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    _output_handlers = [output]
+
+    root = logging.getLogger()
+    if _queue_handler is None:
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _start_listener()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records; call before the process exits."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
@@ -0,0 +1,136 @@
+"""
+Reading the tail of log files without spawning ``tail``.
+
+``tail_lines`` seeks to the end of the file and reads fixed-size blocks
+backwards until it has the requested number of (matching) lines, so its cost
+depends on N rather than on the file size. ``follow_lines`` polls the file
+for appended lines and survives truncation and rotation.
+
+Filters match a minimum level, detected as the first level name on a line
+(both the plain and the Celery log formats carry one), and/or a substring.
+Lines without a level, such as traceback continuations, only pass when no
+level filter is set.
+"""
+import asyncio
+import os
+import re
+from typing import AsyncIterator, Callable, List, Optional
+
+BLOCK_SIZE = 64 * 1024
+# Upper bound on the bytes read backwards for a filtered tail that matches rarely
+MAX_SCAN_BYTES = 32 * 1024 * 1024
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+_LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b")
+
+LineFilter = Callable[[str], bool]
+
+
+def line_filter(level: Optional[str] = None, contains: Optional[str] = None) -> Optional[LineFilter]:
+    """
+    Build a predicate for ``tail_lines`` and ``follow_lines``.
+
+    Args:
+        level: Minimum level name, e.g. WARNING
+        contains: Substring the line must contain
+
+    Returns:
+        callable: The predicate, or None when nothing is filtered
+    """
+    min_level = None
+    if level:
+        min_level = LEVELS.get(level.upper())
+        if min_level is None:
+            raise ValueError(f"Unknown log level {level}, expected one of {list(LEVELS)}")
+    if min_level is None and not contains:
+        return None
+
+    def matches(line: str) -> bool:
+        if contains and contains not in line:
+            return False
+        if min_level is not None:
+            found = _LEVEL_PATTERN.search(line)
+            return found is not None and LEVELS[found.group(1)] >= min_level
+        return True
+
+    return matches
+
+
+def tail_lines(path: str, count: int, predicate: Optional[LineFilter] = None,
+               block_size: int = BLOCK_SIZE, max_scan_bytes: int = MAX_SCAN_BYTES) -> List[str]:
+    """
+    Return the last ``count`` lines of a file that pass ``predicate``, oldest first.
+    """
+    if count <= 0:
+        return []
+
+    lines: List[str] = []
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        scanned = 0
+        remainder = b""
+        while position > 0 and len(lines) < count and scanned < max_scan_bytes:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + remainder
+            scanned += size
+            parts = block.split(b"\n")
+            # The first part may continue in the previous block
+            remainder = parts[0] if position > 0 else b""
+            complete = parts[1:] if position > 0 else parts
+            for raw in reversed(complete):
+                if not raw:
+                    continue
+                line = raw.decode("utf-8", errors="replace").rstrip("\r")
+                if predicate is None or predicate(line):
+                    lines.append(line)
+                    if len(lines) == count:
+                        break
+    lines.reverse()
+    return lines
+
+
+async def follow_lines(path: str, predicate: Optional[LineFilter] = None,
+                       poll_interval: float = 0.5, heartbeat_seconds: float = 15.0) -> AsyncIterator[Optional[str]]:
+    """
+    Yield lines appended to ``path`` from now on.
+
+    Yields None every ``heartbeat_seconds`` without output, so callers can
+    detect disconnected clients. Reopens the file when it is rotated or truncated.
+    """
+    f = open(path, "rb")
+    try:
+        f.seek(0, os.SEEK_END)
+        inode = os.fstat(f.fileno()).st_ino
+        pending = b""
+        idle = 0.0
+        while True:
+            chunk = f.read(BLOCK_SIZE)
+            if chunk:
+                idle = 0.0
+                *complete, pending = (pending + chunk).split(b"\n")
+                for raw in complete:
+                    line = raw.decode("utf-8", errors="replace").rstrip("\r")
+                    if line and (predicate is None or predicate(line)):
+                        yield line
+                continue
+
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and (stat.st_ino != inode or stat.st_size < f.tell()):
+                f.close()
+                f = open(path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+                pending = b""
+                continue
+
+            await asyncio.sleep(poll_interval)
+            idle += poll_interval
+            if idle >= heartbeat_seconds:
+                idle = 0.0
+                yield None
+    finally:
+        f.close()
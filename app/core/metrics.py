@@ -0,0 +1,169 @@
+"""
+Prometheus metrics for the ingest API and the analytics pipeline.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (required for uvicorn with several
+workers and for the Celery prefork pool), every process writes its samples
+to memory-mapped files in that directory and ``render_metrics`` aggregates
+them on scrape. The directory must exist and be emptied before startup.
+"""
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Ingest
+INGEST_REQUESTS = Counter(
+    "analytics_ingest_requests_total",
+    "Ingest requests received",
+    ["app_id", "status"],
+)
+INGEST_LATENCY = Histogram(
+    "analytics_ingest_latency_seconds",
+    "Ingest request handling time",
+    ["app_id"],
+    buckets=LATENCY_BUCKETS,
+)
+INGEST_INSERT_SIZE = Histogram(
+    "analytics_ingest_insert_size",
+    "Rows written per ingest insert",
+    buckets=SIZE_BUCKETS,
+)
+INGEST_BODY_BYTES = Counter(
+    "analytics_ingest_body_bytes_total",
+    "Compressed request body bytes received and their decompressed size",
+    ["encoding", "form"],
+)
+INGEST_COMPRESSION_RATIO = Histogram(
+    "analytics_ingest_compression_ratio",
+    "Decompressed to compressed size of compressed request bodies",
+    ["encoding"],
+    buckets=(1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 12.0, 20.0, 50.0, 100.0),
+)
+
+# Pipeline
+BACKLOG_DEPTH = Gauge(
+    "analytics_backlog_depth",
+    "Unprocessed analytics rows",
+    multiprocess_mode="mostrecent",
+)
+BACKLOG_OLDEST_AGE = Gauge(
+    "analytics_backlog_oldest_age_seconds",
+    "Age of the oldest unprocessed analytics row",
+    multiprocess_mode="mostrecent",
+)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "analytics_pipeline_stage_seconds",
+    "Time spent per batch in each pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS + (30.0, 60.0),
+)
+PIPELINE_BATCH_SIZE = Histogram(
+    "analytics_pipeline_batch_size",
+    "Rows fetched per pipeline batch",
+    buckets=SIZE_BUCKETS,
+)
+PIPELINE_EVENTS = Counter(
+    "analytics_pipeline_events_total",
+    "Events handled by the pipeline",
+    ["outcome"],
+)
+AUTOSCALE_DRAIN_TASKS = Gauge(
+    "analytics_autoscale_drain_tasks",
+    "Drain tasks queued by the last autoscale decision",
+    multiprocess_mode="mostrecent",
+)
+AUTOSCALE_ARRIVAL_RATE = Gauge(
+    "analytics_autoscale_arrival_events_per_second",
+    "Event arrival rate measured by the autoscale controller",
+    multiprocess_mode="mostrecent",
+)
+
+RULE_EVENTS = Counter(
+    "analytics_rule_events_total",
+    "Events sampled out or folded into counter events by the event rules",
+    ["app_id", "event_name", "action"],
+)
+EVENT_DELIVERY_LAG = Histogram(
+    "analytics_event_ingest_to_delivered_seconds",
+    "Time from ingest to confirmed delivery, per event",
+    ["lane"],
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 4 * 3600.0, 24 * 3600.0),
+)
+LANE_SLO_BREACHES = Counter(
+    "analytics_lane_slo_breaches_total",
+    "Events delivered later than the SLO of their priority lane",
+    ["lane"],
+)
+
+# Destinations
+DESTINATION_REQUEST_SECONDS = Histogram(
+    "analytics_destination_request_seconds",
+    "Destination request latency",
+    ["destination"],
+    buckets=LATENCY_BUCKETS + (30.0,),
+)
+DESTINATION_RESPONSES = Counter(
+    "analytics_destination_event_responses_total",
+    "Per-event destination response codes",
+    ["destination", "code"],
+)
+
+WEBHOOK_NOTIFICATIONS = Counter(
+    "analytics_webhook_notifications_total",
+    "callback_webhook notifications by outcome",
+    ["outcome"],
+)
+
+RETENTION_ROWS_PURGED = Counter(
+    "analytics_retention_rows_purged_total",
+    "Processed analytics rows deleted by the retention purge",
+    ["app_id"],
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    Returns:
+        tuple: (body, content_type)
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """
+    Drop the live gauge files of an exited process in multiprocess mode.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def start_metrics_server(port: int) -> None:
+    """
+    Serve metrics over HTTP from a standalone process such as a Celery worker.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
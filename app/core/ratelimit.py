@@ -0,0 +1,153 @@
+"""
+Token bucket rate limiting.
+
+A bucket refills at ``rate`` tokens per second up to ``burst`` tokens. With
+``shared=True`` its state lives in shared memory, so one bucket created
+before forking (or passed to a process pool initializer) caps the combined
+rate of all processes using it.
+
+    bucket = TokenBucket(rate=500, shared=True)
+    bucket.acquire(len(batch))      # blocks until the batch fits under the cap
+    wait = bucket.try_acquire(1)    # 0.0 if taken, otherwise seconds until it would be
+
+``KeyedRateLimiter`` and ``RedisRateLimiter`` keep one bucket per key, in
+the process or in Redis for limits shared across a cluster.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.logs import RateLimitedLog
+
+_redis_errors = RateLimitedLog(logging.getLogger(__name__), interval=60.0)
+
+
+class TokenBucket:
+    """
+    Rate limiter allowing ``rate`` tokens per second with bursts of up to ``burst``.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, shared: bool = False):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        if shared:
+            # [tokens, time of the last refill]; time.monotonic() is system-wide
+            self._state = multiprocessing.Array("d", [self.burst, time.monotonic()])
+            self._lock = self._state.get_lock()
+        else:
+            self._state = [self.burst, time.monotonic()]
+            self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> float:
+        tokens = min(self.burst, self._state[0] + (now - self._state[1]) * self.rate)
+        self._state[0] = tokens
+        self._state[1] = now
+        return tokens
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take ``tokens`` if they are available.
+
+        Returns:
+            float: 0.0 if the tokens were taken, otherwise seconds until they would be available
+        """
+        with self._lock:
+            available = self._refill(time.monotonic())
+            if available >= tokens:
+                self._state[0] = available - tokens
+                return 0.0
+            return (tokens - available) / self.rate
+
+    def reserve(self, tokens: float) -> float:
+        """
+        Take ``tokens`` now, going into debt if needed, so requests larger than
+        ``burst`` are still served.
+
+        Returns:
+            float: Seconds the caller has to wait before using the tokens
+        """
+        with self._lock:
+            remaining = self._refill(time.monotonic()) - tokens
+            self._state[0] = remaining
+        return max(0.0, -remaining / self.rate)
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Block until ``tokens`` may be used.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key (e.g. app_id), local to this process.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def try_acquire(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.rate != rate or bucket.burst != burst:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        # A request larger than the bucket takes all of it instead of never fitting
+        return bucket.try_acquire(min(cost, burst))
+
+
+# Refill and take atomically on the server; returns the wait as a string
+# since Lua numbers are truncated to integers in replies
+_REDIS_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """
+    Token buckets per key kept in Redis, shared by every process of the cluster.
+
+    If Redis cannot be reached within ``timeout`` the request is let through:
+    rate limiting protects the pipeline, it should not take ingest down with it.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:", timeout: float = 0.1):
+        # Imported here so processes using the in-memory limiter never load redis
+        import redis.asyncio
+
+        self.prefix = prefix
+        self._client = redis.asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._script = self._client.register_script(_REDIS_BUCKET_SCRIPT)
+
+    async def try_acquire(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        try:
+            wait = await self._script(keys=[self.prefix + key], args=[rate, burst, min(cost, burst)])
+            return float(wait)
+        except Exception as e:
+            _redis_errors.warning("redis-rate-limit", "Rate limit check failed, allowing request: %s", e)
+            return 0.0
@@ -0,0 +1,269 @@
+"""
+Lightweight tracing for the ingest API and the analytics pipeline.
+
+Spans are recorded in-process and handed to a background exporter thread
+which appends them as OTLP/JSON span objects to ``TRACE_EXPORT_PATH`` and,
+when ``TRACE_OTLP_ENDPOINT`` is set, posts them to an OTLP/HTTP collector.
+
+The ingest trace of an event uses the event_id as trace id, and its root
+span id is derived from it too, so pipeline spans can link back to the
+ingest of every event they carry without any lookup.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from uuid import UUID, uuid4
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 1.0
+EXPORT_QUEUE_SIZE = 10000
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+
+def event_trace_id(event_id: UUID) -> str:
+    """Trace id of the ingest trace for an event."""
+    return event_id.hex
+
+
+def event_span_id(event_id: UUID) -> str:
+    """Span id of the root ingest span for an event."""
+    return event_id.hex[:16]
+
+
+class Span:
+    """
+    A timed operation within a trace.
+    """
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "links",
+        "error",
+        "recording",
+    )
+
+    def __init__(self,
+                 name: str,
+                 trace_id: str,
+                 span_id: str,
+                 parent_id: Optional[str] = None,
+                 kind: int = SPAN_KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None,
+                 recording: bool = True):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.links = []
+        self.error = None
+        self.recording = recording
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.recording:
+            self.attributes[key] = value
+
+    def link_events(self, event_ids: Iterable[UUID]) -> None:
+        """Link this span to the ingest traces of the given events."""
+        if self.recording:
+            self.links.extend((event_trace_id(e), event_span_id(e)) for e in event_ids)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        body = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+        }
+        if self.parent_id:
+            body["parentSpanId"] = self.parent_id
+        if self.links:
+            body["links"] = [{"traceId": t, "spanId": s} for t, s in self.links]
+        if self.error:
+            body["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return body
+
+
+_NOOP_SPAN = Span("noop", "0" * 32, "0" * 16, recording=False)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _sampled(trace_id: str) -> bool:
+    rate = settings.TRACE_SAMPLE_RATE
+    if rate >= 1.0:
+        return True
+    # Deterministic per trace so every process keeps or drops the same traces
+    return zlib.crc32(trace_id.encode()) / 0xFFFFFFFF < rate
+
+
+class SpanExporter:
+    """
+    Buffers finished spans and exports them from a daemon thread.
+    Spans are dropped rather than blocking the caller when the buffer is full.
+    """
+
+    def __init__(self, path: Optional[str], endpoint: Optional[str], service_name: str):
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def export(self, span: Span) -> None:
+        # Celery forks its pool after import, so start the thread in the process that records
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+
+    def _run(self) -> None:
+        spans_queue = self._queue
+        while True:
+            batch = [spans_queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(spans_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write([span.to_otlp() for span in batch])
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} spans: {str(e)}")
+
+    def _write(self, spans: List[Dict[str, Any]]) -> None:
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.writelines(json.dumps(span, separators=(",", ":")) + "\n" for span in spans)
+
+        if self.endpoint:
+            payload = {
+                "resourceSpans": [{
+                    "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                    "scopeSpans": [{"scope": {"name": "analytics_worker"}, "spans": spans}],
+                }]
+            }
+            request = urllib.request.Request(
+                self.endpoint,
+                data=json.dumps(payload).encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+
+
+exporter = SpanExporter(
+    path=settings.TRACE_EXPORT_PATH,
+    endpoint=settings.TRACE_OTLP_ENDPOINT,
+    service_name=settings.PROJECT_NAME,
+)
+
+
+@contextmanager
+def span(name: str,
+         trace_id: Optional[str] = None,
+         span_id: Optional[str] = None,
+         kind: int = SPAN_KIND_INTERNAL,
+         attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+    """
+    Record a span around the enclosed block.
+
+    Without an explicit trace_id the span joins the trace of the enclosing
+    span, or starts a new trace when there is none.
+
+    Args:
+        name: Operation name
+        trace_id: Optional 32 hex character trace id
+        span_id: Optional 16 hex character span id
+        kind: OTLP span kind
+        attributes: Optional span attributes
+    """
+    if not settings.TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    if trace_id is None and parent is not None:
+        if not parent.recording:
+            yield _NOOP_SPAN
+            return
+        trace_id = parent.trace_id
+        parent_id = parent.span_id
+    else:
+        trace_id = trace_id or uuid4().hex
+        parent_id = None
+        if not _sampled(trace_id):
+            # Keep children of an unsampled root unsampled as well
+            token = _current_span.set(_NOOP_SPAN)
+            try:
+                yield _NOOP_SPAN
+            finally:
+                _current_span.reset(token)
+            return
+
+    current = Span(name, trace_id, span_id or uuid4().hex[:16], parent_id, kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        exporter.export(current)
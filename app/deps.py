@@ -1,7 +1,9 @@
 from collections.abc import Generator
+from datetime import datetime, timezone
 from typing import Annotated
 
 from fastapi import Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session
 
@@ -22,3 +24,19 @@ async def get_session() -> AsyncSession:
     )
     async with async_session() as session:
         yield session
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Convert a timezone-aware query parameter to the naive UTC used throughout the app."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def too_many_requests(reason: str, retry_after: int) -> JSONResponse:
+    """429 response for a request refused by ingest admission, see app/pipeline/backpressure.py."""
+    return JSONResponse(
+        content={"status": reason, "retry_after": retry_after},
+        status_code=429,
+        headers={"Retry-After": str(retry_after)},
+    )
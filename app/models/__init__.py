@@ -1,12 +1,21 @@
-import importlib
-import os
-from pathlib import Path
+"""
+Table models. Importing this package registers every table with
+``SQLModel.metadata``; import individual modules where only one is needed.
+"""
+from app.models.identify import IdentifyOperation
+from app.models.pipeline import PipelineBatch
+from app.models.replay import ReplayChunk, ReplayJob
+from app.models.rollup import EventRollupHour, EventRollupMinute
+from app.models.track import AnalyticsTrackBase
+from app.models.webhook import WebhookNotification
 
-models_dir = Path(__file__).parent
- 
-for file_path in models_dir.glob("*.py"):
-    if file_path.name != "__init__.py":
-        module_name = file_path.stem
-        importlib.import_module(f"app.models.{module_name}")
-
-print("Models loaded successfully")
+__all__ = [
+    "AnalyticsTrackBase",
+    "EventRollupHour",
+    "EventRollupMinute",
+    "IdentifyOperation",
+    "PipelineBatch",
+    "ReplayChunk",
+    "ReplayJob",
+    "WebhookNotification",
+]
@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import Column, Index, JSON, text
+from sqlmodel import Field, SQLModel
+
+
+class IdentifyOperation(SQLModel, table=True):
+    """
+    A queued user-property update waiting to be coalesced and sent as an identify.
+
+    Attributes:
+        app_id: Application identifier (e.g., 'esa')
+        user_id: Amplitude user id
+        device_id: Amplitude device id
+        user_properties: Property operations keyed by operation ($set, $setOnce, $add, $append, $prepend)
+        processed_at: Timestamp when the operation was sent
+        available_at: Claim lease; the operation is not claimed again before this time
+        created_at: Timestamp when the operation was received
+    """
+    __table_args__ = (
+        Index(
+            "ix_identifyoperation_unprocessed_created_at",
+            "created_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+        # Retention purge of sent operations
+        Index(
+            "ix_identifyoperation_processed_at",
+            "processed_at",
+            postgresql_where=text("processed_at IS NOT NULL"),
+        ),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    app_id: str = Field(default='esa', max_length=10, index=True)
+    user_id: Optional[str] = Field(default=None, max_length=255)
+    device_id: Optional[str] = Field(default=None, max_length=255)
+    user_properties: Dict = Field(default_factory=dict, sa_column=Column(JSON))
+    processed_at: Optional[datetime] = Field(default=None)
+    available_at: Optional[datetime] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    # Needed for Column(JSON)
+    class Config:
+        arbitrary_types_allowed = True
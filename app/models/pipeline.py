@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID, uuid4
+
+from sqlmodel import Field, SQLModel
+
+
+class PipelineBatch(SQLModel, table=True):
+    """
+    One run of the dispatch pipeline against a destination.
+
+    Attributes:
+        id: Batch identifier, also the trace id of the batch
+        destination: Destination the batch was sent to (e.g., 'amplitude')
+        status: 'success' or 'error'
+        rows_fetched: Rows claimed for the batch
+        rows_delivered: Rows confirmed delivered
+        max_lag_seconds: Ingest-to-delivered time of the oldest delivered row
+        started_at: Timestamp when the batch started
+        finished_at: Timestamp when the batch finished
+    """
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    destination: str = Field(max_length=32)
+    status: str = Field(max_length=16)
+    rows_fetched: int = Field(default=0)
+    rows_delivered: int = Field(default=0)
+    max_lag_seconds: Optional[float] = Field(default=None)
+    started_at: datetime
+    finished_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID, uuid4
+
+from sqlmodel import Field, SQLModel
+
+
+class ReplayJob(SQLModel, table=True):
+    """
+    A resend of a time range of events to a destination, see app/pipeline/replay.py.
+
+    Attributes:
+        id: Job identifier, used to resume the job
+        destination: Destination the events are sent to (e.g., 'amplitude')
+        start: Start of the ingest time range (inclusive)
+        end: End of the ingest time range (exclusive)
+        event_name: Only replay this event, all events if empty
+        new_insert_ids: Send with new insert ids, so the destination does not deduplicate them
+        status: 'running', 'done' or 'error'
+        created_at: Timestamp when the job was created
+        finished_at: Timestamp when the last chunk finished
+    """
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    destination: str = Field(max_length=32)
+    start: datetime
+    end: datetime
+    event_name: Optional[str] = Field(default=None, max_length=125)
+    new_insert_ids: bool = Field(default=False)
+    status: str = Field(default="running", max_length=16)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
+class ReplayChunk(SQLModel, table=True):
+    """
+    One app's slice of a replay job's time range and its checkpoint.
+
+    Attributes:
+        job_id: The replay job
+        app_id: Application identifier (e.g., 'esa')
+        chunk_start: Start of the slice (inclusive)
+        chunk_end: End of the slice (exclusive)
+        status: 'pending', 'done' or 'error'
+        cursor_created_at: created_at of the last event sent, the chunk resumes after it
+        cursor_id: id of the last event sent
+        rows_sent: Events delivered so far
+        rows_skipped: Events dropped by sampling rules
+        rows_failed: Events the destination did not accept
+        last_error: Error that stopped the chunk
+        updated_at: Timestamp of the last checkpoint
+    """
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    job_id: UUID = Field(foreign_key="replayjob.id", index=True)
+    app_id: str = Field(max_length=10)
+    chunk_start: datetime
+    chunk_end: datetime
+    status: str = Field(default="pending", max_length=16)
+    cursor_created_at: Optional[datetime] = Field(default=None)
+    cursor_id: Optional[UUID] = Field(default=None)
+    rows_sent: int = Field(default=0)
+    rows_skipped: int = Field(default=0)
+    rows_failed: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None, max_length=255)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
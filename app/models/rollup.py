@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class EventRollupBase(SQLModel):
+    """
+    Event counts per time bucket, maintained by the dispatch pipeline as rows
+    reach an outcome, see app/pipeline/rollup.py.
+
+    Attributes:
+        bucket: Start of the bucket the events were ingested in
+        app_id: Application identifier (e.g., 'esa')
+        event_name: Name of the tracked event
+        outcome: 'delivered', 'sampled_out', 'given_up' or 'retried' (failed attempts)
+        count: Events (or attempts, for 'retried') in the bucket
+    """
+    bucket: datetime = Field(primary_key=True)
+    app_id: str = Field(primary_key=True, max_length=10)
+    event_name: str = Field(primary_key=True, max_length=125)
+    outcome: str = Field(primary_key=True, max_length=16)
+    count: int = Field(default=0)
+
+
+class EventRollupMinute(EventRollupBase, table=True):
+    """Per-minute event counts."""
+
+
+class EventRollupHour(EventRollupBase, table=True):
+    """Per-hour event counts."""
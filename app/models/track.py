@@ -3,7 +3,7 @@ from typing import Dict, Optional
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON, text
 from sqlmodel import Field, SQLModel
 
 
@@ -17,9 +17,34 @@ class AnalyticsTrackBase(SQLModel, table=True):
         event_name: Name of the event being tracked (e.g., 'cart_add')
         event_data: Data specific to the event
         identity: User identification information from various analytics services
-        metadata: Additional tracking metadata
+        event_meta: Additional tracking metadata; callback_webhook receives the delivery outcome
+        processed_at: Timestamp when the event was delivered, or given up on (see last_error)
+        available_at: Claim lease or retry backoff; the row is not claimed again before this time
+        attempts: Failed delivery attempts so far
+        last_error: Destination response of the last failed attempt
+        priority: Priority lane, see app/pipeline/priority.py
         created_at: Timestamp when the event was created
     """
+    __table_args__ = (
+        # Keeps backlog lookups (oldest unprocessed row, backlog depth) proportional
+        # to the backlog instead of the whole table
+        Index(
+            "ix_analyticstrackbase_unprocessed_created_at",
+            "created_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+        # Per-lane, per-app claims and the backlogged app_id scan
+        Index(
+            "ix_analyticstrackbase_unprocessed_priority_app_id_created_at",
+            "priority",
+            "app_id",
+            "created_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+        # Keyset pagination and exports of one app's events, see app/queries/events.py
+        Index("ix_analyticstrackbase_app_id_created_at_id", "app_id", "created_at", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     event_id: UUID = Field(default_factory=uuid4, primary_key=False)
     app_id: str = Field(default='esa', max_length=10, index=True)
@@ -28,6 +53,10 @@ class AnalyticsTrackBase(SQLModel, table=True):
     identity: Dict = Field(default_factory=dict, sa_column=Column(JSON))
     event_meta: Dict = Field(default_factory=dict, sa_column=Column(JSON))
     processed_at: Optional[datetime] = Field(default=None)
+    available_at: Optional[datetime] = Field(default=None)
+    priority: str = Field(default="default", max_length=16)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None, max_length=255)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # Needed for Column(JSON)
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class WebhookNotification(SQLModel, table=True):
+    """
+    A pending callback_webhook notification for an event whose dispatch finished,
+    see app/pipeline/webhooks.py. Rows are deleted once sent or given up on.
+
+    Attributes:
+        url: The event's callback_webhook
+        event_id: Client-supplied event identifier
+        app_id: Application identifier (e.g., 'esa')
+        event_name: Name of the event
+        outcome: 'delivered', 'sampled_out' or 'given_up'
+        processed_at: Timestamp when dispatch of the event finished
+        attempts: Failed notification attempts so far
+        available_at: Earliest time of the next attempt; also the claim lease
+        last_error: Error of the last failed attempt
+    """
+    __table_args__ = (
+        Index("ix_webhooknotification_available_at_url", "available_at", "url"),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    url: str = Field(max_length=2048)
+    event_id: UUID
+    app_id: str = Field(max_length=10)
+    event_name: str = Field(max_length=125)
+    outcome: str = Field(max_length=16)
+    processed_at: datetime
+    attempts: int = Field(default=0)
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = Field(default=None, max_length=255)
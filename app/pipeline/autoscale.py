@@ -0,0 +1,217 @@
+"""
+Backlog-driven scaling of the analytics drain (celery mode).
+
+The beat schedule queues one batch per lane per minute whatever the
+backlog. The autoscale controller runs every AUTOSCALE_INTERVAL_SECONDS,
+measures the backlog and the arrival rate, and queues as many parallel
+drain tasks as it takes to keep up with arrivals and clear the backlog
+within AUTOSCALE_DRAIN_TARGET_SECONDS:
+
+    tasks = ceil((arrival_rate + depth / drain_target) / rate_of_one_task)
+
+bounded by AUTOSCALE_MIN_TASKS and AUTOSCALE_MAX_TASKS. A drain task runs
+batches until its lane is drained or one controller interval has passed,
+and queued ones expire after an interval, so when the backlog is cleared
+the next decision queues nothing and the extra capacity is gone within an
+interval. With AUTOSCALE_RESIZE_POOL the controller also resizes the pools
+of workers started with ``--autoscale`` to match.
+
+Figures:
+    depth          planner estimate of unprocessed rows, 0 when none is left
+    arrival rate   inserts into the track table per second, from the
+                   statistics collector, between two controller runs; the
+                   last reading is kept in Redis, so runs in any worker
+                   process pair up. The recent delivery rate until then
+    task rate      rows per second of one batch run over recent batches,
+                   AUTOSCALE_TASK_EVENTS_PER_SECOND until batches were recorded
+"""
+import logging
+import math
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import AUTOSCALE_ARRIVAL_RATE, AUTOSCALE_DRAIN_TASKS
+from app.pipeline.batch import run_analytics_batch
+from app.pipeline.priority import lane_queue
+from app.queries.pipeline import select_batch_rate, select_delivered_since
+from app.queries.track import select_backlog_stats, select_inserted_rows_total
+
+logger = logging.getLogger(__name__)
+
+# Window over which delivery and batch rates are measured
+RATE_WINDOW = timedelta(minutes=5)
+# Redis key of the last insert counter reading, "<unix time>:<rows inserted>"
+INSERTED_READING_KEY = "autoscale:inserted"
+
+
+def plan_drain_tasks(depth: int, arrival_rate: float, task_rate: float, drain_seconds: float,
+                     min_tasks: int, max_tasks: int) -> int:
+    """
+    Number of parallel drain tasks needed to keep up with ``arrival_rate``
+    and clear ``depth`` rows within ``drain_seconds``.
+    """
+    if depth <= 0:
+        return min_tasks
+    required = arrival_rate + depth / drain_seconds
+    return max(min_tasks, min(max_tasks, math.ceil(required / task_rate)))
+
+
+def drain_lane(lane: str, batch_size: int, max_seconds: float) -> dict:
+    """
+    Run batches for ``lane`` until it is drained, a batch fails or ``max_seconds`` have passed.
+
+    Returns:
+        dict: Status with the number of batches and rows processed
+    """
+    deadline = time.monotonic() + max_seconds
+    totals = {"status": "success", "lane": lane, "batches": 0, "rows_fetched": 0, "rows_processed": 0}
+    while True:
+        result = run_analytics_batch(batch_size, lane)
+        totals["batches"] += 1
+        totals["rows_fetched"] += result.get("rows_fetched", 0)
+        totals["rows_processed"] += result.get("rows_processed", 0)
+        if result["status"] == "error":
+            totals["status"] = "error"
+            break
+        if result.get("drained", True) or time.monotonic() >= deadline:
+            break
+    totals["drained"] = totals["status"] == "success" and result.get("drained", True)
+    return totals
+
+
+class AutoscaleController:
+    """
+    Sizes the number of drain tasks to the backlog. The last insert counter
+    reading is shared through the broker's Redis, since consecutive
+    controller runs land in different worker processes.
+    """
+
+    def __init__(self, interval: float, drain_seconds: float, min_tasks: int, max_tasks: int,
+                 default_task_rate: float):
+        self.interval = interval
+        self.drain_seconds = drain_seconds
+        self.min_tasks = min_tasks
+        self.max_tasks = max_tasks
+        self.default_task_rate = default_task_rate
+        self.tasks = 0
+        self._redis = None
+
+    def _swap_inserted_reading(self, now: float, inserted: Optional[int]) -> Optional[Tuple[float, int]]:
+        """
+        Store this reading and return the previous one, whichever process took it.
+        None if there is none or Redis cannot be reached.
+        """
+        try:
+            if self._redis is None:
+                # Imported here, only the controller needs a Redis client
+                import redis
+
+                self._redis = redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=2.0)
+            if inserted is None:
+                previous = self._redis.getdel(INSERTED_READING_KEY)
+            else:
+                previous = self._redis.set(INSERTED_READING_KEY, f"{now}:{inserted}",
+                                           ex=int(RATE_WINDOW.total_seconds()), get=True)
+        except Exception as e:
+            logger.warning(f"Failed to share the insert counter reading: {str(e)}")
+            return None
+        if previous is None:
+            return None
+        taken_at, count = previous.decode().split(":")
+        return float(taken_at), int(count)
+
+    def _arrival_rate(self, inserted: Optional[int], now: float) -> Optional[float]:
+        previous = self._swap_inserted_reading(now, inserted)
+        if previous is None or inserted is None:
+            return None
+        elapsed = now - previous[0]
+        # Stale readings average over too long a window; a lower counter means the statistics were reset
+        if elapsed <= 0 or elapsed > RATE_WINDOW.total_seconds() or inserted < previous[1]:
+            return None
+        return (inserted - previous[1]) / elapsed
+
+    def measure(self) -> Dict[str, Any]:
+        with Session(engine) as session:
+            depth, oldest = select_backlog_stats(session)
+            inserted = select_inserted_rows_total(session)
+            task_rate = select_batch_rate(session, RATE_WINDOW)
+            # Wall clock, the previous reading may come from another process
+            arrival_rate = self._arrival_rate(inserted, time.time())
+            if arrival_rate is None:
+                # No recent earlier reading: assume arrivals match deliveries
+                window = int(RATE_WINDOW.total_seconds())
+                arrival_rate = select_delivered_since(session, [window])[window] / window
+        return {
+            "depth": depth,
+            "arrival_rate": arrival_rate,
+            "task_rate": task_rate or self.default_task_rate,
+        }
+
+    def decide(self, figures: Dict[str, Any]) -> int:
+        return plan_drain_tasks(figures["depth"], figures["arrival_rate"], figures["task_rate"],
+                                self.drain_seconds, self.min_tasks, self.max_tasks)
+
+    def run(self) -> dict:
+        """
+        Measure the backlog, queue the drain tasks it needs and, if enabled,
+        resize the worker pools.
+
+        Returns:
+            dict: The figures measured and the number of drain tasks queued
+        """
+        figures = self.measure()
+        tasks = self.decide(figures)
+        if tasks != self.tasks:
+            logger.info("Scaling analytics drain from %d to %d tasks: backlog %d rows, "
+                        "arriving at %.1f/s, %.1f/s per task",
+                        self.tasks, tasks, figures["depth"], figures["arrival_rate"], figures["task_rate"])
+        self.tasks = tasks
+        AUTOSCALE_DRAIN_TASKS.set(tasks)
+        AUTOSCALE_ARRIVAL_RATE.set(figures["arrival_rate"])
+
+        self._queue_drain_tasks(tasks)
+        if settings.AUTOSCALE_RESIZE_POOL:
+            self._resize_pools(tasks)
+        return {"status": "success", "drain_tasks": tasks,
+                **{name: round(value, 2) for name, value in figures.items()}}
+
+    def _queue_drain_tasks(self, tasks: int) -> None:
+        # Imported here, processor imports this module for the controller task
+        from app.pipeline.processor import drain_analytics_backlog
+
+        lane = settings.AUTOSCALE_LANE
+        for _ in range(tasks):
+            drain_analytics_backlog.apply_async(
+                kwargs={"lane": lane, "batch_size": settings.AUTOSCALE_BATCH_SIZE, "max_seconds": self.interval},
+                queue=lane_queue(lane),
+                # Superseded by the next decision
+                expires=self.interval,
+            )
+
+    def _resize_pools(self, tasks: int) -> None:
+        from app.pipeline.celery_app import celery_app
+
+        try:
+            workers = len(celery_app.control.ping(timeout=1.0))
+            if not workers:
+                logger.warning("No Celery worker answered, not resizing pools")
+                return
+            # Drain tasks spread over the workers, plus room for the beat-driven batches
+            size = math.ceil(tasks / workers) + settings.AUTOSCALE_POOL_RESERVE
+            celery_app.control.autoscale(size, settings.AUTOSCALE_POOL_RESERVE)
+        except Exception as e:
+            logger.warning(f"Failed to resize Celery worker pools: {str(e)}")
+
+
+autoscaler = AutoscaleController(
+    interval=settings.AUTOSCALE_INTERVAL_SECONDS,
+    drain_seconds=settings.AUTOSCALE_DRAIN_TARGET_SECONDS,
+    min_tasks=settings.AUTOSCALE_MIN_TASKS,
+    max_tasks=settings.AUTOSCALE_MAX_TASKS,
+    default_task_rate=settings.AUTOSCALE_TASK_EVENTS_PER_SECOND,
+)
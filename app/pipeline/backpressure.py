@@ -0,0 +1,174 @@
+"""
+Ingest admission control: per-app rate limits and backlog-based load shedding.
+
+Rate limits are token buckets per app_id (INGEST_RATE_LIMITS events per
+second, bursts of INGEST_BURST_SECONDS worth), kept in each API process or,
+with INGEST_RATE_LIMIT_BACKEND=redis, shared in Redis across the cluster.
+
+Load shedding refuses a priority lane once the backlog depth or the age of
+the oldest unprocessed row passes that lane's threshold (SHED_BACKLOG_DEPTH,
+SHED_BACKLOG_AGE_SECONDS). Thresholds are set lower for the low lane, so low
+priority events are shed first, and shedding a lane sheds every lane below
+it. Retry-After is the time the pipeline needs at its recent throughput to
+bring the backlog back under the threshold.
+
+The backlog figures come from the cached /health snapshot, refreshed in the
+background, so admission never waits on the database. When they cannot be
+read, nothing is shed.
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.ratelimit import KeyedRateLimiter, RedisRateLimiter
+from app.pipeline.health import pipeline_health
+from app.pipeline.priority import LANES
+
+logger = logging.getLogger(__name__)
+
+
+class LoadShedder:
+    """
+    Lanes currently refused because of the backlog, with their Retry-After.
+    """
+
+    def __init__(self, depth_thresholds: Dict[str, int], age_thresholds: Dict[str, float],
+                 max_retry_after: int, interval: float):
+        self.depth_thresholds = depth_thresholds
+        self.age_thresholds = age_thresholds
+        self.max_retry_after = max_retry_after
+        self.interval = interval
+        self.shed: Dict[str, int] = {}
+        self.evaluated_at: Optional[datetime] = None
+        self._evaluated_monotonic = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.depth_thresholds or self.age_thresholds)
+
+    def evaluate(self, snapshot: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Lanes to shed for a pipeline health snapshot.
+
+        Returns:
+            dict: Retry-After in seconds, keyed by lane
+        """
+        if snapshot.get("status") != "ok":
+            return {}
+        depth = snapshot["backlog_depth_estimate"]
+        age = snapshot["oldest_unprocessed_age_seconds"]
+        throughput = snapshot["throughput_events_per_second"]["5m"]
+
+        shed: Dict[str, int] = {}
+        for lane in LANES:
+            retry_after = None
+            depth_limit = self.depth_thresholds.get(lane)
+            if depth_limit is not None and depth >= depth_limit:
+                retry_after = (depth - depth_limit) / throughput if throughput else self.max_retry_after
+            age_limit = self.age_thresholds.get(lane)
+            if age_limit is not None and age >= age_limit:
+                retry_after = max(retry_after or 0, age - age_limit)
+            if retry_after is not None:
+                shed[lane] = min(max(1, math.ceil(retry_after)), self.max_retry_after)
+
+        # LANES runs from the highest priority down; lanes below a shed one go with it
+        for index, lane in enumerate(LANES):
+            if lane in shed:
+                for lower in LANES[index + 1:]:
+                    shed[lower] = max(shed.get(lower, 0), shed[lane])
+        return shed
+
+    async def refresh(self) -> None:
+        snapshot = await asyncio.to_thread(pipeline_health.snapshot)
+        shed = self.evaluate(snapshot)
+        if shed.keys() != self.shed.keys():
+            if shed:
+                logger.warning("Shedding ingest for lanes %s: backlog depth %s, oldest row %ss",
+                               sorted(shed), snapshot.get("backlog_depth_estimate"),
+                               snapshot.get("oldest_unprocessed_age_seconds"))
+            else:
+                logger.info("Backlog back under the shedding thresholds, accepting all lanes")
+        self.shed = shed
+        self.evaluated_at = datetime.utcnow()
+        self._evaluated_monotonic = time.monotonic()
+
+    def schedule_refresh(self) -> None:
+        """Start a refresh on the running loop unless one is in flight."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self.refresh())
+
+    def retry_after(self, lane: str) -> Optional[int]:
+        """Seconds a client should wait before sending to ``lane`` again, None if it is accepted."""
+        if not self.enabled:
+            return None
+        if time.monotonic() - self._evaluated_monotonic >= self.interval:
+            self.schedule_refresh()
+        return self.shed.get(lane)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "shed_lanes": self.shed,
+            "evaluated_at": self.evaluated_at.isoformat() if self.evaluated_at else None,
+        }
+
+
+class IngestRateLimiter:
+    """
+    Per-app_id token buckets on the configured backend.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @staticmethod
+    def rate_for(app_id: str) -> Optional[float]:
+        return settings.INGEST_RATE_LIMITS.get(app_id, settings.DEFAULT_INGEST_RATE_LIMIT)
+
+    def _get_backend(self):
+        if self._backend is None:
+            if settings.INGEST_RATE_LIMIT_BACKEND == "redis":
+                self._backend = RedisRateLimiter(settings.INGEST_RATE_LIMIT_REDIS_URL or settings.CELERY_BROKER_URL,
+                                                 prefix="ingest-rate:")
+            else:
+                self._backend = KeyedRateLimiter()
+        return self._backend
+
+    async def retry_after(self, app_id: str, cost: int = 1) -> Optional[int]:
+        """Seconds until ``cost`` more events of ``app_id`` fit under its limit, None if they fit now."""
+        rate = self.rate_for(app_id)
+        if rate is None:
+            return None
+        wait = await self._get_backend().try_acquire(app_id, rate, rate * settings.INGEST_BURST_SECONDS, cost)
+        return math.ceil(wait) if wait else None
+
+
+load_shedder = LoadShedder(
+    settings.SHED_BACKLOG_DEPTH,
+    settings.SHED_BACKLOG_AGE_SECONDS,
+    max_retry_after=settings.SHED_MAX_RETRY_AFTER_SECONDS,
+    interval=settings.HEALTH_CACHE_SECONDS,
+)
+ingest_rate_limiter = IngestRateLimiter()
+
+
+async def admit(app_id: str, lane: Optional[str], cost: int = 1) -> Optional[Tuple[str, int]]:
+    """
+    Decide whether ``cost`` events of an app may be ingested into ``lane``;
+    without a lane only the rate limit applies. Shedding is checked first, so
+    refused requests do not use up the app's tokens.
+
+    Returns:
+        tuple: (reason, retry_after_seconds) if refused, reason being 'shed' or 'rate_limited'; None if admitted
+    """
+    retry_after = load_shedder.retry_after(lane) if lane else None
+    if retry_after:
+        return "shed", retry_after
+    retry_after = await ingest_rate_limiter.retry_after(app_id, cost)
+    if retry_after:
+        return "rate_limited", retry_after
+    return None
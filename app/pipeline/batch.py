@@ -0,0 +1,560 @@
+"""
+The analytics and identify batch runs, independent of how they are scheduled.
+
+Celery tasks (app/pipeline/processor.py) and the embedded dispatcher
+(app/pipeline/embedded.py) both call ``run_analytics_batch`` and
+``run_identify_batch``; each run uses its own database session.
+"""
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import (
+    BACKLOG_DEPTH,
+    BACKLOG_OLDEST_AGE,
+    EVENT_DELIVERY_LAG,
+    LANE_SLO_BREACHES,
+    PIPELINE_BATCH_SIZE,
+    PIPELINE_EVENTS,
+    PIPELINE_STAGE_SECONDS,
+    RULE_EVENTS,
+)
+from app.core.tracing import Span, span
+from app.models.pipeline import PipelineBatch
+from app.pipeline.identify import coalesce_operations, window_cutoff
+from app.pipeline.priority import DEFAULT_LANE, lane_slo_seconds, lanes_through
+from app.pipeline.rollup import RollupCounts
+from app.pipeline.records import EventRecord
+from app.pipeline.rules import RuleOutcome, rule_engine
+from app.pipeline.scheduler import claim_lanes
+from app.queries.identify import (
+    claim_identify_operations,
+    mark_identify_operations_processed,
+    release_identify_operations,
+)
+from app.queries.pipeline import insert_pipeline_batch
+from app.queries.rollup import add_rollup_counts
+from app.queries.track import mark_analytics_processed, schedule_analytics_retries, select_backlog_stats
+from app.queries.webhook import enqueue_webhook_notifications
+from app.services.amplitude import AmplitudeTracker, is_permanent_failure
+
+logger = logging.getLogger(__name__)
+
+
+def update_backlog_metrics(session: Session):
+    """
+    Refresh the backlog depth and oldest-unprocessed-age gauges.
+    """
+    try:
+        depth, oldest = select_backlog_stats(session)
+        BACKLOG_DEPTH.set(depth)
+        BACKLOG_OLDEST_AGE.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0)
+    except Exception as e:
+        session.rollback()
+        logger.warning(f"Failed to refresh backlog metrics: {str(e)}")
+
+
+def run_analytics_batch(batch_size: int = 1000, lane: str = DEFAULT_LANE) -> dict:
+    """
+    Process a batch of unprocessed analytics data rows from ``lane`` and the lanes above it,
+    or several overlapped batches when PIPELINE_OVERLAP is set.
+
+    Returns:
+        dict: Batch outcome with status, rows_fetched, rows_processed and
+            ``drained``, False when more rows are likely waiting
+    """
+    if settings.PIPELINE_OVERLAP:
+        return run_overlapped_batches(batch_size, lane)
+
+    batch_id = uuid4()
+    started_at = datetime.utcnow()
+    with span("process_analytics_batch",
+              trace_id=batch_id.hex,
+              attributes={"batch_id": str(batch_id), "batch_size": batch_size, "lane": lane}) as batch_span:
+        with Session(engine) as session:
+            result = _process_batch(session, batch_size, batch_span, lane)
+        batch_span.set_attribute("status", result["status"])
+        record_pipeline_batch(batch_id, started_at, result)
+        result["drained"] = result.get("rows_fetched", 0) < batch_size
+        return result
+
+
+def record_pipeline_batch(batch_id, started_at: datetime, result: dict):
+    """
+    Persist the outcome of a batch for /health lag and throughput reporting.
+    Runs that found nothing to send are not recorded; they say nothing about
+    delivery and would flood the table from the frequent critical-lane ticks.
+    """
+    if result["status"] != "error" and not result.get("rows_fetched"):
+        return
+    try:
+        with Session(engine) as batch_session:
+            insert_pipeline_batch(batch_session, PipelineBatch(
+                id=batch_id,
+                destination="amplitude",
+                status=result["status"],
+                rows_fetched=result.get("rows_fetched", 0),
+                rows_delivered=result.get("rows_processed", 0),
+                max_lag_seconds=result.get("max_lag_seconds"),
+                started_at=started_at,
+            ))
+    except Exception as e:
+        logger.warning(f"Failed to record pipeline batch {batch_id}: {str(e)}")
+
+
+def dispatch_records(records, insert_id_suffix: str = ""):
+    """
+    Send records to Amplitude and wait for the flush.
+
+    Args:
+        records: EventRecords to send
+        insert_id_suffix: See AmplitudeTracker; set by replays that must not be deduplicated
+
+    Returns:
+        tuple: (ids of delivered records, {id: (code, message)} of failed records)
+    """
+    # Initialize Amplitude tracker
+    amplitude = AmplitudeTracker(insert_id_suffix=insert_id_suffix)
+    logger.debug("AmplitudeTracker initialized")
+
+    try:
+        with PIPELINE_STAGE_SECONDS.labels("dispatch").time(), span("pipeline.dispatch") as dispatch_span:
+            if not amplitude.track_events(events=records):
+                logger.error("Failed to track events in Amplitude")
+
+            # A failed flush leaves the affected events without an outcome, so they are retried
+            if not amplitude.flush():
+                logger.error("Failed to flush events to Amplitude")
+
+            delivered, failed = amplitude.delivery_outcomes(records)
+            dispatch_span.set_attribute("delivered", len(delivered))
+            dispatch_span.set_attribute("failed", len(failed))
+    finally:
+        amplitude.close()
+
+    logger.debug("Amplitude accepted %d of %d events", len(delivered), len(records))
+    return delivered, failed
+
+
+def _schedule_retries(session: Session, failed_ids: Dict[UUID, List[UUID]], failed: Dict[UUID, Tuple[int, str]],
+                      now: datetime) -> Tuple[List[UUID], List[UUID]]:
+    """
+    Back off the source rows of failed records, grouped by error.
+
+    Returns:
+        tuple: (ids of rows scheduled for retry, ids of rows given up on)
+    """
+    groups: Dict[Tuple[bool, str], List[UUID]] = {}
+    for record_id, (code, message) in failed.items():
+        key = (is_permanent_failure(code, message), f"{code}: {message}")
+        groups.setdefault(key, []).extend(failed_ids[record_id])
+
+    retried, given_up = [], []
+    for (permanent, error), ids in groups.items():
+        exhausted = schedule_analytics_retries(
+            session, ids, error, now,
+            base_seconds=settings.DELIVERY_RETRY_BASE_SECONDS,
+            max_seconds=settings.DELIVERY_RETRY_MAX_SECONDS,
+            max_attempts=settings.DELIVERY_MAX_ATTEMPTS,
+            give_up=permanent,
+        )
+        given_up.extend(exhausted)
+        exhausted = set(exhausted)
+        retried.extend(row_id for row_id in ids if row_id not in exhausted)
+    return retried, given_up
+
+
+def _claim(session: Session, batch_size: int, lane: str, batch_span: Span) -> List[EventRecord]:
+    """
+    Claim unprocessed records as compact EventRecords, higher lanes first and
+    shared fairly between app_ids within a lane.
+    """
+    with PIPELINE_STAGE_SECONDS.labels("fetch").time(), span("pipeline.fetch"):
+        rows = claim_lanes(session, batch_size, lanes_through(lane))
+    PIPELINE_BATCH_SIZE.observe(len(rows))
+    batch_span.set_attribute("rows", len(rows))
+
+    if rows:
+        logger.debug("Found %d unprocessed analytics rows", len(rows))
+        # Link the batch to the ingest trace of every event it carries
+        batch_span.link_events(row.event_id for row in rows)
+
+        # Debug first row to understand structure
+        logger.debug("Sample row: %r", rows[0])
+
+        # Check if events have the required fields
+        missing_event_name = sum(1 for r in rows if not r.event_name)
+        if missing_event_name:
+            logger.warning("%d rows missing event_name field", missing_event_name)
+    return rows
+
+
+def _apply_rules(rows: List[EventRecord]) -> RuleOutcome:
+    """
+    Sample or pre-aggregate high-frequency events before they reach the destination.
+    """
+    with PIPELINE_STAGE_SECONDS.labels("rules").time(), span("pipeline.rules"):
+        outcome = rule_engine.apply(rows)
+    for (rule_app_id, rule_event_name, action), count in outcome.stats.items():
+        RULE_EVENTS.labels(rule_app_id, rule_event_name, action).inc(count)
+    if outcome.dropped_ids or outcome.merged_ids:
+        rules_summary = outcome.summary()
+        logger.info("Event rules: %d sampled out, %d aggregated into %d counter events",
+                    rules_summary['sampled_out'], rules_summary['aggregated_events'],
+                    rules_summary['counter_events'])
+        PIPELINE_EVENTS.labels("sampled_out").inc(rules_summary['sampled_out'])
+        PIPELINE_EVENTS.labels("aggregated").inc(rules_summary['aggregated_events'])
+    return outcome
+
+
+def _acknowledge(session: Session, rows: List[EventRecord], outcome: RuleOutcome, delivered: List[UUID],
+                 failed: Dict[UUID, Tuple[int, str]], lane: str) -> dict:
+    """
+    Mark delivered and sampled-out rows processed, back off failed ones and
+    count the outcomes, all in one transaction.
+
+    Returns:
+        dict: Batch outcome
+    """
+    # Rows removed by sampling are done without being sent
+    processed_ids = list(outcome.dropped_ids)
+
+    # Counter events stand for every row folded into them
+    source_ids = {record.id: outcome.merged_ids.get(record.id, (record.id,)) for record in outcome.records}
+    for record_id in delivered:
+        processed_ids.extend(source_ids[record_id])
+
+    now = datetime.utcnow()
+    max_lag_seconds = None
+    retried_ids, given_up_ids = [], []
+
+    try:
+        with PIPELINE_STAGE_SECONDS.labels("ack").time(), span("pipeline.ack"):
+            # Acknowledge only what was delivered; failed rows are backed off individually
+            if processed_ids:
+                mark_analytics_processed(session, processed_ids, now)
+            if failed:
+                retried_ids, given_up_ids = _schedule_retries(session, source_ids, failed, now)
+
+            # Count the outcomes in the same transaction as the ack
+            rollup = RollupCounts(rows)
+            rollup.add(processed_ids[len(outcome.dropped_ids):], "delivered")
+            rollup.add(outcome.dropped_ids, "sampled_out")
+            rollup.add(given_up_ids, "given_up")
+            rollup.add(retried_ids, "retried")
+            if rollup:
+                add_rollup_counts(session, rollup)
+            # Final outcomes for callback_webhook notifications, sent separately
+            if settings.WEBHOOKS_ENABLED:
+                for ids, final_outcome in ((processed_ids[len(outcome.dropped_ids):], "delivered"),
+                                           (outcome.dropped_ids, "sampled_out"),
+                                           (given_up_ids, "given_up")):
+                    if ids:
+                        enqueue_webhook_notifications(session, list(ids), final_outcome, now)
+            session.commit()
+    except Exception as db_error:
+        logger.error(f"Database error updating processed status: {str(db_error)}", exc_info=True)
+        session.rollback()
+        raise
+
+    retried, given_up = len(retried_ids), len(given_up_ids)
+    delivered_rows = len(processed_ids) - len(outcome.dropped_ids)
+    PIPELINE_EVENTS.labels("delivered").inc(delivered_rows)
+    if retried:
+        PIPELINE_EVENTS.labels("retried").inc(retried)
+    if given_up:
+        PIPELINE_EVENTS.labels("given_up").inc(given_up)
+    if failed:
+        logger.warning("%d rows failed delivery: %d scheduled for retry, %d given up",
+                       retried + given_up, retried, given_up, extra={"lane": lane})
+    logger.info("Successfully processed %d rows", len(processed_ids),
+                extra={"lane": lane, "rows_fetched": len(rows), "rows_processed": len(processed_ids)})
+
+    if delivered_rows:
+        acked = set(processed_ids).difference(outcome.dropped_ids)
+        delivered_created_at = []
+        for row in rows:
+            if row.id in acked:
+                lag = (now - row.created_at).total_seconds()
+                delivered_created_at.append(row.created_at)
+                EVENT_DELIVERY_LAG.labels(row.priority).observe(lag)
+                slo = lane_slo_seconds(row.priority)
+                if slo is not None and lag > slo:
+                    LANE_SLO_BREACHES.labels(row.priority).inc()
+        max_lag_seconds = (now - min(delivered_created_at)).total_seconds()
+
+    if not failed:
+        status = "success"
+    elif processed_ids:
+        status = "partial"
+    else:
+        status = "error"
+
+    return {
+        "status": status,
+        "lane": lane,
+        "rows_fetched": len(rows),
+        "rows_processed": len(processed_ids),
+        "rows_retried": retried,
+        "rows_given_up": given_up,
+        "max_lag_seconds": max_lag_seconds,
+        **outcome.summary(),
+        "processed_at": now.isoformat() if processed_ids else None
+    }
+
+
+def _process_batch(session: Session, batch_size: int, batch_span: Span, lane: str = DEFAULT_LANE):
+    # Per-batch logs use %-style arguments so disabled levels cost nothing
+    logger.debug("Starting analytics batch processing with size %d for lane %s", batch_size, lane)
+
+    try:
+        update_backlog_metrics(session)
+
+        rows = _claim(session, batch_size, lane, batch_span)
+        if not rows:
+            logger.debug("No unprocessed rows found")
+            return {"status": "success", "rows_fetched": 0, "rows_processed": 0, "message": "No unprocessed rows found"}
+
+        outcome = _apply_rules(rows)
+        delivered, failed = dispatch_records(outcome.records) if outcome.records else ([], {})
+        return _acknowledge(session, rows, outcome, delivered, failed, lane)
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error in analytics processing: {str(e)}", exc_info=True)
+        # Retry the task on failure
+        return {"status": "error", "message": str(e)}
+
+
+class _InFlightBatch:
+    """
+    A batch moving through the overlapped pipeline.
+    """
+    __slots__ = ("id", "started_at", "rows", "outcome", "delivered", "failed", "error")
+
+    def __init__(self):
+        self.id = uuid4()
+        self.started_at = datetime.utcnow()
+        self.rows: List[EventRecord] = []
+        self.outcome: Optional[RuleOutcome] = None
+        self.delivered: List[UUID] = []
+        self.failed: Dict[UUID, Tuple[int, str]] = {}
+        self.error: Optional[str] = None
+
+
+def run_overlapped_batches(batch_size: int = 1000, lane: str = DEFAULT_LANE, max_batches: Optional[int] = None,
+                           max_in_flight: Optional[int] = None) -> dict:
+    """
+    Process up to ``max_batches`` consecutive batches with the stages overlapped:
+    while batch N is sent to the destination, batch N+1 is claimed and batch
+    N-1 acknowledged, so the database and the network are both kept busy.
+
+    Claiming and dispatching run on one thread each, acknowledging on the
+    calling thread, connected by bounded queues. At most ``max_in_flight``
+    batches are claimed but not yet acknowledged at any time, which caps
+    memory and keeps the wait for an ack well inside the claim lease. The run
+    stops early when the lane is drained or a batch fails; batches still
+    queued then keep their lease and are claimed again once it expires.
+
+    Returns:
+        dict: Totals over the batches, with ``drained`` set when the backlog ran out
+    """
+    max_batches = max_batches or settings.PIPELINE_OVERLAP_BATCHES
+    max_in_flight = max_in_flight or settings.PIPELINE_MAX_IN_FLIGHT
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    to_dispatch: "queue.Queue[Optional[_InFlightBatch]]" = queue.Queue(maxsize=max_in_flight)
+    to_ack: "queue.Queue[Optional[_InFlightBatch]]" = queue.Queue(maxsize=max_in_flight)
+    stop = threading.Event()
+    drained = threading.Event()
+
+    def fetch():
+        try:
+            with Session(engine) as session:
+                update_backlog_metrics(session)
+                for _ in range(max_batches):
+                    in_flight.acquire()
+                    if stop.is_set():
+                        in_flight.release()
+                        return
+                    batch = _InFlightBatch()
+                    with span("process_analytics_batch.fetch", trace_id=batch.id.hex,
+                              attributes={"batch_id": str(batch.id), "batch_size": batch_size,
+                                          "lane": lane}) as fetch_span:
+                        batch.rows = _claim(session, batch_size, lane, fetch_span)
+                    if not batch.rows:
+                        in_flight.release()
+                        drained.set()
+                        return
+                    to_dispatch.put(batch)
+                    if len(batch.rows) < batch_size:
+                        drained.set()
+                        return
+        except Exception as e:
+            logger.error(f"Error claiming analytics batch: {str(e)}", exc_info=True)
+            drained.set()
+        finally:
+            to_dispatch.put(None)
+
+    def dispatch():
+        while True:
+            batch = to_dispatch.get()
+            if batch is None:
+                to_ack.put(None)
+                return
+            if not stop.is_set():
+                try:
+                    with span("process_analytics_batch.dispatch", trace_id=batch.id.hex,
+                              attributes={"batch_id": str(batch.id), "lane": lane}):
+                        batch.outcome = _apply_rules(batch.rows)
+                        if batch.outcome.records:
+                            batch.delivered, batch.failed = dispatch_records(batch.outcome.records)
+                except Exception as e:
+                    logger.error(f"Error dispatching analytics batch {batch.id}: {str(e)}", exc_info=True)
+                    batch.error = str(e)
+            to_ack.put(batch)
+
+    threads = [threading.Thread(target=fetch, name="pipeline-fetch", daemon=True),
+               threading.Thread(target=dispatch, name="pipeline-dispatch", daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    results = []
+    failed_batch = False
+    try:
+        with Session(engine) as session:
+            while True:
+                batch = to_ack.get()
+                if batch is None:
+                    break
+                if failed_batch:
+                    # Not sent; the rows are claimed again once their lease expires
+                    in_flight.release()
+                    continue
+                try:
+                    if batch.error is not None:
+                        result = {"status": "error", "rows_fetched": len(batch.rows), "message": batch.error}
+                    else:
+                        with span("process_analytics_batch.ack", trace_id=batch.id.hex,
+                                  attributes={"batch_id": str(batch.id), "lane": lane}):
+                            result = _acknowledge(session, batch.rows, batch.outcome, batch.delivered,
+                                                  batch.failed, lane)
+                except Exception as e:
+                    session.rollback()
+                    logger.error(f"Error in analytics processing: {str(e)}", exc_info=True)
+                    result = {"status": "error", "rows_fetched": len(batch.rows), "message": str(e)}
+                finally:
+                    in_flight.release()
+                if result["status"] == "error":
+                    failed_batch = True
+                    stop.set()
+                record_pipeline_batch(batch.id, batch.started_at, result)
+                results.append(result)
+    finally:
+        # Unblock the other stages if acknowledging stopped early
+        stop.set()
+        while any(thread.is_alive() for thread in threads):
+            try:
+                if to_ack.get(timeout=0.1) is not None:
+                    in_flight.release()
+            except queue.Empty:
+                pass
+        for thread in threads:
+            thread.join()
+
+    statuses = {result["status"] for result in results}
+    if not results or statuses == {"success"}:
+        status = "success"
+    elif statuses == {"error"}:
+        status = "error"
+    else:
+        status = "partial"
+    lags = [result["max_lag_seconds"] for result in results if result.get("max_lag_seconds") is not None]
+    return {
+        "status": status,
+        "lane": lane,
+        "batches": len(results),
+        "rows_fetched": sum(result.get("rows_fetched", 0) for result in results),
+        "rows_processed": sum(result.get("rows_processed", 0) for result in results),
+        "rows_retried": sum(result.get("rows_retried", 0) for result in results),
+        "rows_given_up": sum(result.get("rows_given_up", 0) for result in results),
+        "max_lag_seconds": max(lags, default=None),
+        # Stop after a failure instead of claiming again right away
+        "drained": drained.is_set() or failed_batch,
+    }
+
+
+def run_identify_batch(batch_size: Optional[int] = None, window_seconds: Optional[int] = None) -> dict:
+    """
+    Coalesce queued user-property operations from closed windows and send them as batched identifies.
+    """
+    batch_size = batch_size or settings.IDENTIFY_BATCH_SIZE
+    window_seconds = settings.IDENTIFY_COALESCE_WINDOW_SECONDS if window_seconds is None else window_seconds
+    now = datetime.utcnow()
+    cutoff = window_cutoff(now, window_seconds)
+
+    with Session(engine) as identify_session, span("process_identify_batch", attributes={"batch_size": batch_size}):
+        try:
+            operations = claim_identify_operations(identify_session, batch_size, cutoff,
+                                                   now + timedelta(seconds=settings.CLAIM_LEASE_SECONDS))
+            if not operations:
+                return {"status": "success", "operations": 0, "identifies_sent": 0}
+
+            identifies, merged = coalesce_operations(operations, window_seconds)
+            logger.info(f"Coalesced {len(operations)} identify operations into {len(identifies)} identifies "
+                        f"({merged} property operations merged)")
+
+            amplitude = AmplitudeTracker()
+            try:
+                amplitude.identify_batch(identifies)
+                # Identifies that were not queued or flushed have no outcome and are retried
+                if not amplitude.flush():
+                    logger.error("Failed to flush identifies to Amplitude")
+                failed = amplitude.identify_outcomes(identifies)
+            finally:
+                amplitude.close()
+
+            # A user's operations stay queued while any of their identifies failed,
+            # so the next run sends them again in order. It claims the same
+            # operations of the user and rebuilds the same identifies, whose
+            # insert_ids let Amplitude drop the ones it already applied
+            retry_users = set()
+            given_up = 0
+            for identify in identifies:
+                if identify.insert_id not in failed:
+                    continue
+                code, message = failed[identify.insert_id]
+                if is_permanent_failure(code, message):
+                    given_up += 1
+                    logger.warning(f"Amplitude rejected identify for user_id={identify.user_id}: {code} {message}")
+                else:
+                    retry_users.add((identify.app_id, identify.user_id, identify.device_id))
+
+            done, retried = [], []
+            for op in operations:
+                if (op.app_id, op.user_id, op.device_id) in retry_users:
+                    retried.append(op.id)
+                else:
+                    done.append(op.id)
+            mark_identify_operations_processed(identify_session, done, datetime.utcnow())
+            release_identify_operations(identify_session, retried)
+            identify_session.commit()
+            return {
+                "status": "partial" if retry_users else "success",
+                "operations": len(operations),
+                "operations_retried": len(retried),
+                "identifies_sent": len(identifies) - len(failed),
+                "identifies_given_up": given_up,
+                "properties_merged": merged,
+            }
+
+        except Exception as e:
+            identify_session.rollback()
+            logger.error(f"Error in identify processing: {str(e)}", exc_info=True)
+            return {"status": "error", "message": str(e)}
@@ -1,17 +1,21 @@
 """
 Celery application factory.
 Keep this file lightweight - just define the Celery app without complex imports.
+Task modules are listed in ``include`` and only imported by the worker.
 """
 from celery import Celery
-import os
+
+from app.core.config import settings
+from app.pipeline.celery_beat import BEAT_SCHEDULE
 
 
 def create_celery_app():
     """Factory function to create a properly configured Celery instance"""
     _app = Celery(
         'app',
-        broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
-        backend=os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+        broker=settings.CELERY_BROKER_URL,
+        backend=settings.CELERY_RESULT_BACKEND,
+        include=['app.pipeline.processor'],
     )
 
     # Configure Celery
@@ -25,9 +29,11 @@ def create_celery_app():
         worker_prefetch_multiplier=1,  # Prevents worker from prefetching too many tasks
         task_acks_late=True,  # Tasks are acknowledged after execution
         task_reject_on_worker_lost=True,  # Tasks are requeued if worker is lost
+        task_track_started=True,  # Mark tasks as started when they start running
         broker_connection_retry=True,  # Retry connecting to broker
         broker_connection_retry_on_startup=True,  # Retry connecting on startup
         broker_connection_max_retries=10,  # Maximum number of retries
+        beat_schedule=BEAT_SCHEDULE,
     )
 
     return _app
@@ -1,18 +1,83 @@
 """
-Celery beat schedule configuration.
+Celery beat schedule configuration, applied by the factory in celery_app.py.
 This is separate from tasks to prevent circular imports.
 """
+from datetime import timedelta
+
 from celery.schedules import crontab
-from app.pipeline.celery_app import celery_app
+from app.core.config import settings
+from app.pipeline.priority import LANE_QUEUES, WEBHOOKS_QUEUE
 
-# Configure beat schedule
-celery_app.conf.beat_schedule = {
+BEAT_SCHEDULE = {
+    'process-critical-analytics-data': {
+        'task': 'app.pipeline.processor.process_analytics_batch',
+        'schedule': timedelta(seconds=settings.CRITICAL_LANE_INTERVAL_SECONDS),
+        'kwargs': {'lane': 'critical'},
+        'options': {
+            'queue': LANE_QUEUES['critical'],
+            # A newer run supersedes a stale one
+            'expires': settings.CRITICAL_LANE_INTERVAL_SECONDS * 2,
+        }
+    },
     'process-analytics-data-every-minute': {
         'task': 'app.pipeline.processor.process_analytics_batch',
         'schedule': crontab(minute="*/1"),
+        'kwargs': {'lane': 'default'},
         'options': {
-            'queue': 'analytics',
+            'queue': LANE_QUEUES['default'],
             'expires': 60 * 2,  # Task expires after 2 minutes
         }
     },
+    'process-low-priority-analytics-data-every-minute': {
+        'task': 'app.pipeline.processor.process_analytics_batch',
+        'schedule': crontab(minute="*/1"),
+        'kwargs': {'lane': 'low'},
+        'options': {
+            'queue': LANE_QUEUES['low'],
+            'expires': 60 * 2,
+        }
+    },
+    'process-identify-operations-every-minute': {
+        'task': 'app.pipeline.processor.process_identify_batch',
+        'schedule': crontab(minute="*/1"),
+        'options': {
+            'queue': 'analytics',
+            'expires': 60 * 2,
+        }
+    },
 }
+
+if settings.WEBHOOKS_ENABLED:
+    BEAT_SCHEDULE['process-webhook-notifications'] = {
+        'task': 'app.pipeline.processor.process_webhook_batch',
+        'schedule': timedelta(seconds=settings.WEBHOOK_INTERVAL_SECONDS),
+        'options': {
+            # Own queue, so a dedicated worker can take slow customer endpoints off the analytics pool
+            'queue': WEBHOOKS_QUEUE,
+            'expires': settings.WEBHOOK_INTERVAL_SECONDS * 2,
+        }
+    }
+
+if (settings.RETENTION_DAYS is not None or settings.RETENTION_DAYS_BY_APP
+        or settings.RETENTION_MINUTE_ROLLUP_DAYS is not None
+        or settings.RETENTION_PIPELINE_BATCH_DAYS is not None
+        or settings.RETENTION_IDENTIFY_OPERATION_DAYS is not None):
+    BEAT_SCHEDULE['purge-retention'] = {
+        'task': 'app.pipeline.processor.purge_retention',
+        'schedule': timedelta(seconds=settings.RETENTION_INTERVAL_SECONDS),
+        'options': {
+            'queue': 'celery',
+            # A run still going when the next is due makes the next one pointless
+            'expires': settings.RETENTION_INTERVAL_SECONDS,
+        }
+    }
+
+if settings.AUTOSCALE_ENABLED:
+    BEAT_SCHEDULE['autoscale-analytics-drain'] = {
+        'task': 'app.pipeline.processor.autoscale_analytics_drain',
+        'schedule': timedelta(seconds=settings.AUTOSCALE_INTERVAL_SECONDS),
+        'options': {
+            'queue': 'celery',
+            'expires': settings.AUTOSCALE_INTERVAL_SECONDS,
+        }
+    }
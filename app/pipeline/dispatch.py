@@ -0,0 +1,37 @@
+"""
+Entry point for queueing pipeline batches from the API, whichever pipeline
+mode the process runs in. Celery is only imported in celery mode, so the
+embedded mode has no broker dependency.
+"""
+from typing import Optional
+
+from app.core.config import settings
+from app.pipeline.priority import DEFAULT_LANE, lane_queue
+
+
+def submit_analytics_batch(lane: str = DEFAULT_LANE,
+                           batch_size: int = 1000,
+                           expires: Optional[float] = None) -> Optional[str]:
+    """
+    Queue an analytics batch for ``lane``.
+
+    Args:
+        lane: Priority lane to drain, together with the lanes above it
+        batch_size: Rows per batch (celery mode; the embedded dispatcher uses EMBEDDED_BATCH_SIZE)
+        expires: Seconds after which a queued Celery task is discarded
+
+    Returns:
+        str: Celery task id, or None in embedded mode
+    """
+    if settings.PIPELINE_MODE == "embedded":
+        from app.pipeline.embedded import ANALYTICS, embedded_dispatcher
+
+        if not embedded_dispatcher.submit(ANALYTICS, lane):
+            raise RuntimeError("Embedded dispatcher is not running")
+        return None
+
+    from app.pipeline.processor import process_analytics_batch
+
+    task = process_analytics_batch.apply_async(kwargs={"batch_size": batch_size, "lane": lane},
+                                               queue=lane_queue(lane), expires=expires)
+    return task.id
@@ -0,0 +1,188 @@
+"""
+Embedded dispatcher: runs the analytics and identify pipelines as asyncio
+tasks inside the API process, for deployments too small to warrant Celery.
+
+Enabled with PIPELINE_MODE=embedded. Ticker tasks queue a batch per priority
+lane and an identify batch on the same intervals as the Celery beat
+schedule, and EMBEDDED_CONCURRENCY worker tasks run them. Webhook
+notifications are sent by a task of their own, so slow customer endpoints
+never take a worker from the pipelines. The batches themselves do
+blocking database and SDK I/O, so they run in the default thread pool to
+keep the event loop free for requests. A lane that returned a full batch is
+queued again right away, so a backlog drains without waiting for the next tick.
+
+On shutdown the tickers stop, queued and running batches get up to
+EMBEDDED_DRAIN_TIMEOUT_SECONDS to finish, and the workers are cancelled.
+Rows claimed by a batch that is cut off are released when their claim lease
+runs out.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.pipeline.batch import run_analytics_batch, run_identify_batch
+from app.pipeline.priority import CRITICAL_LANE, LANES
+from app.pipeline.webhooks import run_webhook_batch, webhook_client
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS = "analytics"
+IDENTIFY = "identify"
+WEBHOOKS = "webhooks"
+
+Job = Tuple[str, Optional[str]]
+
+
+class EmbeddedDispatcher:
+    """
+    Schedules and runs pipeline batches on the running event loop.
+    """
+
+    def __init__(self,
+                 concurrency: int = 2,
+                 batch_size: int = 1000,
+                 interval_seconds: float = 60.0,
+                 critical_interval_seconds: float = 5.0,
+                 drain_timeout_seconds: float = 30.0):
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.critical_interval_seconds = critical_interval_seconds
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self.batches_run = 0
+        self.last_batch_at: Optional[datetime] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[Job] = set()
+        self._in_flight = 0
+        self._running = False
+        self._tickers: List[asyncio.Task] = []
+        self._workers: List[asyncio.Task] = []
+        self._webhooks: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        self._running = True
+        for lane in LANES:
+            interval = self.critical_interval_seconds if lane == CRITICAL_LANE else self.interval_seconds
+            self._tickers.append(asyncio.create_task(self._tick((ANALYTICS, lane), interval)))
+        self._tickers.append(asyncio.create_task(self._tick((IDENTIFY, None), self.interval_seconds)))
+        if settings.WEBHOOKS_ENABLED:
+            self._webhooks = asyncio.create_task(self._send_webhooks(settings.WEBHOOK_INTERVAL_SECONDS))
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        logger.info(f"Embedded dispatcher started with concurrency {self.concurrency}")
+
+    async def stop(self) -> None:
+        """Stop scheduling and drain queued and running batches."""
+        if not self._running:
+            return
+        self._running = False
+        self._stopping.set()
+        for ticker in self._tickers:
+            ticker.cancel()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout_seconds)
+            logger.info("Embedded dispatcher drained")
+        except asyncio.TimeoutError:
+            logger.warning(f"Embedded dispatcher did not drain within {self.drain_timeout_seconds}s, "
+                           f"{self._queue.qsize()} batches queued and {self._in_flight} running are abandoned")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._tickers, *self._workers, return_exceptions=True)
+        self._tickers, self._workers = [], []
+        if self._webhooks is not None:
+            try:
+                await asyncio.wait_for(self._webhooks, timeout=self.drain_timeout_seconds)
+            except asyncio.TimeoutError:
+                logger.warning("Embedded webhook run did not finish in time, its notifications are sent again")
+            self._webhooks = None
+        await asyncio.to_thread(webhook_client.close)
+
+    def submit(self, kind: str = ANALYTICS, lane: Optional[str] = None) -> bool:
+        """
+        Queue a batch; safe to call from any thread.
+
+        Returns:
+            bool: False when the dispatcher is not running
+        """
+        if not self._running or self._loop is None:
+            return False
+        self._loop.call_soon_threadsafe(self._enqueue, (kind, lane))
+        return True
+
+    def _enqueue(self, job: Job) -> None:
+        # One queued run per job is enough, it claims whatever is pending when it starts
+        if self._running and job not in self._queued:
+            self._queued.add(job)
+            self._queue.put_nowait(job)
+
+    async def _tick(self, job: Job, interval: float) -> None:
+        while True:
+            self._enqueue(job)
+            await asyncio.sleep(interval)
+
+    async def _send_webhooks(self, interval: float) -> None:
+        """Send webhook notifications until stopped, right away again after a full run."""
+        while self._running:
+            try:
+                result = await asyncio.to_thread(run_webhook_batch)
+                self.batches_run += 1
+                self.last_batch_at = datetime.utcnow()
+            except Exception as e:
+                logger.error(f"Embedded {WEBHOOKS} batch failed: {str(e)}", exc_info=True)
+                result = {}
+            if result.get("claimed", 0) >= settings.WEBHOOK_CLAIM_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._queued.discard(job)
+            self._in_flight += 1
+            try:
+                kind, lane = job
+                if kind == ANALYTICS:
+                    result = await asyncio.to_thread(run_analytics_batch, self.batch_size, lane)
+                    if not result.get("drained", True):
+                        self._enqueue(job)
+                else:
+                    await asyncio.to_thread(run_identify_batch)
+                self.batches_run += 1
+                self.last_batch_at = datetime.utcnow()
+            except Exception as e:
+                logger.error(f"Embedded {job[0]} batch failed: {str(e)}", exc_info=True)
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "running": self._running,
+            "concurrency": self.concurrency,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_flight": self._in_flight,
+            "batches_run": self.batches_run,
+            "last_batch_at": self.last_batch_at.isoformat() if self.last_batch_at else None,
+        }
+
+
+embedded_dispatcher = EmbeddedDispatcher(
+    concurrency=settings.EMBEDDED_CONCURRENCY,
+    batch_size=settings.EMBEDDED_BATCH_SIZE,
+    interval_seconds=settings.EMBEDDED_INTERVAL_SECONDS,
+    critical_interval_seconds=settings.CRITICAL_LANE_INTERVAL_SECONDS,
+    drain_timeout_seconds=settings.EMBEDDED_DRAIN_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,85 @@
+"""
+Backlog and lag snapshot served by the /health endpoint.
+
+Every figure comes from an index lookup, a planner estimate or the
+pipelinebatch table, which is kept small by recording only runs that
+fetched rows and by the retention purge. The snapshot is cached for
+HEALTH_CACHE_SECONDS so load-balancer probes polling every second hit the
+database at most once per cache period per process.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.queries.pipeline import select_delivered_since, select_last_success_per_destination
+from app.queries.track import select_backlog_stats
+
+logger = logging.getLogger(__name__)
+
+THROUGHPUT_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+class PipelineHealth:
+    """
+    Cached pipeline health snapshot; concurrent callers share one refresh.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._expires_at = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self._snapshot is not None and time.monotonic() < self._expires_at:
+            return self._snapshot
+
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._snapshot is None or time.monotonic() >= self._expires_at:
+                self._snapshot = self._collect()
+                self._expires_at = time.monotonic() + self.ttl_seconds
+        return self._snapshot
+
+    @staticmethod
+    def _collect() -> Dict[str, Any]:
+        now = datetime.utcnow()
+        try:
+            with Session(engine) as session:
+                depth, oldest = select_backlog_stats(session)
+                delivered = select_delivered_since(session, list(THROUGHPUT_WINDOWS.values()), now=now)
+                last_success = select_last_success_per_destination(session)
+        except Exception as e:
+            logger.error(f"Failed to collect pipeline health: {str(e)}")
+            return {"status": "unknown", "error": str(e), "collected_at": now.isoformat()}
+
+        destinations = {
+            name: {
+                "last_success_at": batch.finished_at.isoformat(),
+                "seconds_since_last_success": round((now - batch.finished_at).total_seconds(), 1),
+                "delivery_lag_seconds": batch.max_lag_seconds,
+            }
+            for name, batch in last_success.items()
+        }
+        last_success_at = max((batch.finished_at for batch in last_success.values()), default=None)
+
+        return {
+            "status": "ok",
+            "collected_at": now.isoformat(),
+            "backlog_depth_estimate": depth,
+            "oldest_unprocessed_age_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0,
+            "last_successful_batch_at": last_success_at.isoformat() if last_success_at else None,
+            "destinations": destinations,
+            "throughput_events_per_second": {
+                label: round(delivered[seconds] / seconds, 2) for label, seconds in THROUGHPUT_WINDOWS.items()
+            },
+        }
+
+
+pipeline_health = PipelineHealth(ttl_seconds=settings.HEALTH_CACHE_SECONDS)
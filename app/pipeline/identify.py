@@ -0,0 +1,169 @@
+"""
+Coalescing of user-property operations into as few identify calls as possible.
+
+Operations for the same user within one time window are folded per property
+key, following Amplitude's semantics for each operation:
+
+    $set       later value wins, and overrides any earlier operation on the key
+    $setOnce   no-op once the key was touched earlier in the window
+    $add       summed with an earlier $add, or folded into an earlier numeric $set
+    $append    concatenated after an earlier $append, or folded into an earlier $set
+    $prepend   concatenated before an earlier $prepend, or folded into an earlier $set
+
+When an operation cannot be folded into what is already pending for the key
+(e.g. $add after $setOnce, whose outcome depends on the stored value), a new
+identify is started so the operations still reach Amplitude in order.
+"""
+import uuid
+from datetime import datetime, timedelta
+from numbers import Number
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+OPERATIONS = ("$set", "$setOnce", "$add", "$append", "$prepend")
+
+# Timestamps are naive UTC throughout the app
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+class CoalescedIdentify:
+    """
+    Property operations for one user that can be sent as a single identify.
+    Every key appears under at most one operation.
+    """
+    __slots__ = ("app_id", "user_id", "device_id", "sequence", "operations", "_key_ops", "source_ids")
+
+    def __init__(self, app_id: str, user_id: Optional[str], device_id: Optional[str], sequence: int = 0):
+        self.app_id = app_id
+        self.user_id = user_id
+        self.device_id = device_id
+        # Position among the identifies of the same user and window
+        self.sequence = sequence
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        self._key_ops: Dict[str, str] = {}
+        # Ids of the queued operations folded into this identify
+        self.source_ids = []
+
+    def __len__(self) -> int:
+        return len(self._key_ops)
+
+    @property
+    def insert_id(self) -> str:
+        """
+        Derived from the source operations, so the identify is the same on a
+        resend and Amplitude drops it if it was applied already. Stable as long
+        as a resend coalesces the same operations, which is why the claim takes
+        all of a user's operations from closed windows together.
+        """
+        key = f"identify:{self.sequence}:" + ",".join(str(source_id) for source_id in self.source_ids)
+        return str(uuid.uuid5(uuid.NAMESPACE_OID, key))
+
+    def _put(self, operation: str, key: str, value: Any) -> None:
+        current = self._key_ops.get(key)
+        if current is not None and current != operation:
+            del self.operations[current][key]
+            if not self.operations[current]:
+                del self.operations[current]
+        self.operations.setdefault(operation, {})[key] = value
+        self._key_ops[key] = operation
+
+    def apply(self, operation: str, key: str, value: Any) -> bool:
+        """
+        Fold an operation into this identify.
+
+        Returns:
+            bool: False if the operation cannot be merged and needs a new identify
+        """
+        current = self._key_ops.get(key)
+        if current is None:
+            self._put(operation, key, value)
+            return True
+
+        existing = self.operations[current][key]
+
+        if operation == "$set":
+            self._put("$set", key, value)
+            return True
+
+        if operation == "$setOnce":
+            # The key already holds a value by the time this operation applies
+            return True
+
+        if operation == "$add":
+            if current in ("$set", "$add") and _is_number(existing) and _is_number(value):
+                self._put(current, key, existing + value)
+                return True
+            return False
+
+        if operation == "$append":
+            if current == "$append":
+                self._put("$append", key, _as_list(existing) + _as_list(value))
+                return True
+            if current == "$set":
+                self._put("$set", key, _as_list(existing) + _as_list(value))
+                return True
+            return False
+
+        if operation == "$prepend":
+            if current == "$prepend":
+                self._put("$prepend", key, _as_list(value) + _as_list(existing))
+                return True
+            if current == "$set":
+                self._put("$set", key, _as_list(value) + _as_list(existing))
+                return True
+            return False
+
+        raise ValueError(f"Unsupported identify operation: {operation}")
+
+
+def coalesce_operations(operations: Iterable, window_seconds: int) -> Tuple[List[CoalescedIdentify], int]:
+    """
+    Merge queued operations per user and time window.
+
+    Args:
+        operations: Objects with app_id, user_id, device_id, user_properties,
+            created_at and id attributes
+        window_seconds: Length of the coalescing window
+
+    Returns:
+        tuple: (identifies in send order, number of property operations merged away)
+    """
+    pending: Dict[Tuple, List[CoalescedIdentify]] = {}
+    applied = 0
+
+    # Ties broken by id, so the same operations always coalesce the same way
+    for op in sorted(operations, key=lambda o: (o.created_at, o.id)):
+        window = int((op.created_at - _EPOCH).total_seconds() // window_seconds) if window_seconds else 0
+        group_key = (op.app_id, op.user_id, op.device_id, window)
+        identifies = pending.get(group_key)
+        if identifies is None:
+            identifies = pending[group_key] = [CoalescedIdentify(op.app_id, op.user_id, op.device_id)]
+
+        for operation in OPERATIONS:
+            for key, value in (op.user_properties or {}).get(operation, {}).items():
+                applied += 1
+                if not identifies[-1].apply(operation, key, value):
+                    identifies.append(CoalescedIdentify(op.app_id, op.user_id, op.device_id, len(identifies)))
+                    identifies[-1].apply(operation, key, value)
+                if op.id not in identifies[-1].source_ids:
+                    identifies[-1].source_ids.append(op.id)
+
+    result = [identify for identifies in pending.values() for identify in identifies if len(identify)]
+    return result, applied - sum(len(identify) for identify in result)
+
+
+def window_cutoff(now: datetime, window_seconds: int) -> datetime:
+    """
+    Start of the current window; operations created before it belong to closed windows.
+    """
+    if not window_seconds:
+        return now
+    elapsed = (now - _EPOCH).total_seconds()
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % window_seconds)
@@ -0,0 +1,70 @@
+"""
+Priority lanes for the analytics backlog.
+
+Every event is stored with a lane, taken from the ``priority`` field of the
+ingest payload or, when absent, from PRIORITY_EVENTS by event_name:
+
+    critical   revenue and signup events, drained every few seconds and on ingest
+    default    everything else
+    low        bulk telemetry, drained with whatever capacity is left
+
+Each lane is claimed separately and has its own Celery queue and delivery SLO
+(LANE_SLO_SECONDS). A batch for a lane first drains every lane above it, so
+critical events never wait behind a default or low backlog.
+"""
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+LANES = ("critical", "default", "low")
+CRITICAL_LANE = "critical"
+DEFAULT_LANE = "default"
+
+LANE_QUEUES = {
+    "critical": "analytics.critical",
+    "default": "analytics",
+    "low": "analytics.low",
+}
+
+# Celery's default queue, for tasks not tied to a lane, and the webhook notification queue
+DEFAULT_QUEUE = "celery"
+WEBHOOKS_QUEUE = "webhooks"
+
+
+def lane_for(event_name: str, requested: Optional[str] = None) -> str:
+    """
+    Resolve the lane of an event.
+
+    Args:
+        event_name: Name of the event
+        requested: Lane asked for in the ingest payload, if any
+
+    Returns:
+        str: One of LANES
+    """
+    if requested in LANE_QUEUES:
+        return requested
+    lane = settings.PRIORITY_EVENTS.get(event_name, DEFAULT_LANE)
+    return lane if lane in LANE_QUEUES else DEFAULT_LANE
+
+
+def lanes_through(lane: str) -> Tuple[str, ...]:
+    """Lanes drained by a batch for ``lane``, highest priority first."""
+    return LANES[:LANES.index(lane) + 1]
+
+
+def lane_queue(lane: str) -> str:
+    return LANE_QUEUES[lane]
+
+
+def lane_slo_seconds(lane: str) -> Optional[float]:
+    return settings.LANE_SLO_SECONDS.get(lane)
+
+
+def worker_queues() -> str:
+    """
+    Queues a worker consumes unless told otherwise, comma-separated for
+    Celery's ``-Q``: the default queue, every lane's queue highest first, and
+    the webhook notification queue.
+    """
+    return ",".join([DEFAULT_QUEUE, *(LANE_QUEUES[lane] for lane in LANES), WEBHOOKS_QUEUE])
@@ -0,0 +1,90 @@
+"""
+Compact in-memory representation of analytics events for the dispatch pipeline.
+
+Rows are materialized straight from the selected columns into ``EventRecord``
+instances instead of full ORM objects, so a batch carries no SQLAlchemy
+instance state or identity-map bookkeeping between the fetch and the send.
+"""
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+
+def extract_amplitude_ids(identity: Any) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Extract the Amplitude user_id and device_id from an identity payload.
+
+    Returns:
+        tuple: (user_id, device_id)
+    """
+    if not isinstance(identity, dict):
+        return None, None
+
+    amplitude_info = identity.get('amplitude')
+    if not amplitude_info or not isinstance(amplitude_info, dict):
+        return None, None
+
+    return amplitude_info.get('user_id'), amplitude_info.get('device_id')
+
+
+class EventRecord:
+    """
+    A single analytics event as it travels through the dispatch pipeline.
+
+    Attributes:
+        id: Primary key of the source row, used to acknowledge delivery
+        event_id: Client-supplied event identifier
+        app_id: Application identifier (interned)
+        event_name: Name of the event (interned)
+        event_data: Event properties
+        user_id: Amplitude user id extracted from the identity payload
+        device_id: Amplitude device id extracted from the identity payload
+        created_at: Timestamp when the event was ingested
+        priority: Priority lane the event was claimed from (interned)
+    """
+    __slots__ = (
+        "id",
+        "event_id",
+        "app_id",
+        "event_name",
+        "event_data",
+        "user_id",
+        "device_id",
+        "created_at",
+        "priority",
+    )
+
+    def __init__(self,
+                 id: UUID,
+                 event_id: UUID,
+                 app_id: str,
+                 event_name: str,
+                 event_data: Optional[Dict[str, Any]],
+                 user_id: Optional[str],
+                 device_id: Optional[str],
+                 created_at: datetime,
+                 priority: str = "default"):
+        self.id = id
+        self.event_id = event_id
+        # app_id and event_name repeat across almost every row of a batch,
+        # interning makes all records share a single string object
+        self.app_id = sys.intern(app_id) if app_id else app_id
+        self.event_name = sys.intern(event_name) if event_name else event_name
+        self.event_data = event_data or None
+        self.user_id = user_id
+        self.device_id = device_id
+        self.created_at = created_at
+        self.priority = sys.intern(priority)
+
+    @classmethod
+    def from_row(cls, row) -> "EventRecord":
+        """
+        Build a record from a row selected by ``select_un_processed_analytics``.
+        """
+        id, event_id, app_id, event_name, event_data, identity, created_at, priority = row
+        user_id, device_id = extract_amplitude_ids(identity)
+        return cls(id, event_id, app_id, event_name, event_data, user_id, device_id, created_at, priority)
+
+    def __repr__(self) -> str:
+        return f"EventRecord(id={self.id}, app_id={self.app_id!r}, event_name={self.event_name!r})"
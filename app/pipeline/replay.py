@@ -0,0 +1,228 @@
+"""
+Resumable, parallel resends of a time range of events to a destination.
+
+A job splits its range into one chunk per app_id and REPLAY_CHUNK_MINUTES
+slice, stored in the replaychunk table. Worker processes take the unfinished
+chunks and send them page by page in (created_at, id) order, checkpointing
+the key of the last page after every send, so a job resumed after a crash
+starts each chunk where it stopped and resends at most one page.
+
+All workers share one token bucket, which caps the combined send rate at
+REPLAY_MAX_EVENTS_PER_SECOND so a replay does not starve live dispatch.
+
+Events go through the event rules like live traffic. Their processed_at is
+not touched. By default they keep their insert_id, so Amplitude drops
+events it already received within its 7-day deduplication window;
+``new_insert_ids`` sends them as new events instead, e.g. after a mapping
+change.
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.ratelimit import TokenBucket
+from app.models.replay import ReplayChunk, ReplayJob
+from app.pipeline.batch import dispatch_records
+from app.pipeline.records import EventRecord
+from app.pipeline.rules import rule_engine
+from app.queries.events import select_event_records
+from app.queries.replay import (
+    checkpoint_replay_chunk,
+    finish_replay_chunk,
+    finish_replay_job,
+    insert_replay_job,
+    select_replay_progress,
+    select_unfinished_chunk_ids,
+)
+from app.services.amplitude import is_permanent_failure
+
+logger = logging.getLogger(__name__)
+
+# Send functions by destination name: (records, insert_id_suffix) -> (delivered ids, {id: (code, message)})
+DESTINATIONS: Dict[str, Callable] = {"amplitude": dispatch_records}
+
+# Shared rate limiter of the current worker process, set by the pool initializer
+_bucket: Optional[TokenBucket] = None
+
+
+def plan_chunks(app_ids: Sequence[str], start: datetime, end: datetime,
+                chunk: timedelta) -> List[Tuple[str, datetime, datetime]]:
+    """
+    Split ``[start, end)`` into slices of ``chunk`` for every app_id.
+
+    Returns:
+        list: (app_id, chunk_start, chunk_end), oldest slices first
+    """
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        chunks.extend((app_id, chunk_start, chunk_end) for app_id in app_ids)
+        chunk_start = chunk_end
+    return chunks
+
+
+def create_replay_job(destination: str, app_ids: Sequence[str], start: datetime, end: datetime,
+                      event_name: Optional[str] = None, new_insert_ids: bool = False,
+                      chunk_minutes: Optional[int] = None) -> ReplayJob:
+    if destination not in DESTINATIONS:
+        raise ValueError(f"Unknown destination {destination!r}, expected one of {list(DESTINATIONS)}")
+    if start >= end:
+        raise ValueError("start must be before end")
+    chunk = timedelta(minutes=chunk_minutes or settings.REPLAY_CHUNK_MINUTES)
+    job = ReplayJob(destination=destination, start=start, end=end,
+                    event_name=event_name, new_insert_ids=new_insert_ids)
+    chunks = plan_chunks(app_ids, start, end, chunk)
+    with Session(engine) as session:
+        insert_replay_job(session, job, chunks)
+        session.refresh(job)
+    logger.info("Created replay job %s with %d chunks", job.id, len(chunks))
+    return job
+
+
+def _init_worker(bucket: TokenBucket) -> None:
+    global _bucket
+    _bucket = bucket
+
+
+def _send_page(records: List[EventRecord], send: Callable, insert_id_suffix: str,
+               max_attempts: int) -> Tuple[int, int, int]:
+    """
+    Send one page, resending transiently failed events up to ``max_attempts`` times.
+
+    Returns:
+        tuple: (events delivered, events sampled out, events failed)
+    """
+    outcome = rule_engine.apply(records)
+    # Counter events stand for every row folded into them
+    weight = {record.id: len(outcome.merged_ids.get(record.id, (record.id,))) for record in outcome.records}
+    pending = outcome.records
+    sent = failed = 0
+
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            time.sleep(2 ** attempt)
+            if _bucket is not None:
+                _bucket.acquire(len(pending))
+        delivered, failures = send(pending, insert_id_suffix)
+        sent += sum(weight[record_id] for record_id in delivered)
+        failed += sum(weight[record_id] for record_id, (code, message) in failures.items()
+                      if is_permanent_failure(code, message))
+        pending = [record for record in pending
+                   if record.id in failures and not is_permanent_failure(*failures[record.id])]
+        if not pending:
+            break
+
+    failed += sum(weight[record.id] for record in pending)
+    return sent, len(outcome.dropped_ids), failed
+
+
+def replay_chunk(chunk_id: UUID) -> dict:
+    """
+    Send one chunk from its checkpoint to the end; runs in a pool worker process.
+    """
+    page_size = settings.REPLAY_PAGE_SIZE
+    with Session(engine) as session:
+        chunk = session.get(ReplayChunk, chunk_id)
+        job = session.get(ReplayJob, chunk.job_id)
+        send = DESTINATIONS[job.destination]
+        insert_id_suffix = f":replay:{job.id.hex[:8]}" if job.new_insert_ids else ""
+        after = (chunk.cursor_created_at, chunk.cursor_id) if chunk.cursor_id else None
+        app_id, chunk_start, chunk_end, event_name = chunk.app_id, chunk.chunk_start, chunk.chunk_end, job.event_name
+        session.commit()
+
+        totals = {"sent": 0, "skipped": 0, "failed": 0}
+        try:
+            while True:
+                records = select_event_records(session, app_id, page_size, start=chunk_start, end=chunk_end,
+                                               event_name=event_name, after=after)
+                # Do not hold the read transaction open while waiting on the rate cap or the destination
+                session.commit()
+                if not records:
+                    break
+
+                if _bucket is not None:
+                    _bucket.acquire(len(records))
+                sent, skipped, failed = _send_page(records, send, insert_id_suffix, settings.REPLAY_MAX_ATTEMPTS)
+                after = (records[-1].created_at, records[-1].id)
+                checkpoint_replay_chunk(session, chunk_id, after, sent, skipped, failed)
+                totals["sent"] += sent
+                totals["skipped"] += skipped
+                totals["failed"] += failed
+
+                if len(records) < page_size:
+                    break
+
+            finish_replay_chunk(session, chunk_id, "done")
+            logger.info("Replayed %s %s to %s: %d sent, %d sampled out, %d failed",
+                        app_id, chunk_start.isoformat(), chunk_end.isoformat(),
+                        totals["sent"], totals["skipped"], totals["failed"])
+            return {"chunk_id": str(chunk_id), "status": "done", **totals}
+
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Replay chunk {chunk_id} ({app_id} {chunk_start.isoformat()}) failed: {str(e)}",
+                         exc_info=True)
+            finish_replay_chunk(session, chunk_id, "error", str(e))
+            return {"chunk_id": str(chunk_id), "status": "error", "message": str(e), **totals}
+
+
+def run_replay(job_id: UUID, workers: Optional[int] = None,
+               max_events_per_second: Optional[float] = None) -> dict:
+    """
+    Send every unfinished chunk of a job with a pool of worker processes.
+    Also resumes a job: chunks continue from their checkpoint and chunks that
+    stopped on an error are tried again.
+
+    Returns:
+        dict: Job status with chunk counts and event totals
+    """
+    workers = workers or settings.REPLAY_WORKERS
+    rate = max_events_per_second or settings.REPLAY_MAX_EVENTS_PER_SECOND
+    with Session(engine) as session:
+        chunk_ids = select_unfinished_chunk_ids(session, job_id)
+    logger.info("Replaying %d chunks of job %s with %d workers at up to %.0f events/s",
+                len(chunk_ids), job_id, workers, rate)
+
+    # One bucket in shared memory caps the combined rate of all workers
+    bucket = TokenBucket(rate, shared=True)
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bucket,)) as pool:
+        futures = [pool.submit(replay_chunk, chunk_id) for chunk_id in chunk_ids]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process died; the chunk keeps its checkpoint for the next resume
+                logger.error(f"Replay worker failed: {str(e)}")
+                result = {"status": "error"}
+            errors += result["status"] == "error"
+            logger.info("Replay job %s: %d/%d chunks finished", job_id, done, len(chunk_ids))
+
+    status = "error" if errors else "done"
+    with Session(engine) as session:
+        finish_replay_job(session, job_id, status)
+        return {"job_id": str(job_id), "status": status, **select_replay_progress(session, job_id)}
+
+
+def replay_status(job_id: UUID) -> dict:
+    with Session(engine) as session:
+        job = session.get(ReplayJob, job_id)
+        if job is None:
+            raise ValueError(f"Unknown replay job {job_id}")
+        return {
+            "job_id": str(job.id),
+            "destination": job.destination,
+            "start": job.start.isoformat(),
+            "end": job.end.isoformat(),
+            "event_name": job.event_name,
+            "status": job.status,
+            **select_replay_progress(session, job_id),
+        }
@@ -0,0 +1,200 @@
+"""
+Retention purge of processed analytics rows.
+
+Rows are kept forever unless a retention is configured: RETENTION_DAYS for
+every app_id, overridden per app by RETENTION_DAYS_BY_APP (null keeps an
+app's rows). A run deletes the processed rows (delivered, sampled out or
+given up) ingested before each app's cutoff; rows still waiting for
+delivery are never touched.
+
+One large DELETE would lock millions of rows for its whole duration and
+leave their dead tuples to a single huge vacuum. Instead a run deletes
+RETENTION_CHUNK_SIZE rows per transaction, walking the (app_id,
+created_at, id) index with a keyset so no chunk rescans what the previous
+ones covered, skips rows locked by the pipeline, and sleeps
+RETENTION_PAUSE_SECONDS between chunks so autovacuum and the standbys keep
+up. Before every chunk it checks the replay lag of the standbys and the
+number of active backends, and waits while either is over its limit
+(RETENTION_MAX_REPLICATION_LAG_SECONDS, RETENTION_MAX_ACTIVE_BACKENDS).
+A run stops after RETENTION_MAX_RUN_SECONDS; the next one continues where
+the cutoff leaves off.
+
+Per-minute rollups older than RETENTION_MINUTE_ROLLUP_DAYS are purged the
+same way; hourly rollups are kept. So are the operational records:
+pipeline batches older than RETENTION_PIPELINE_BATCH_DAYS and identify
+operations sent more than RETENTION_IDENTIFY_OPERATION_DAYS ago. Those go
+first, they are small and would otherwise wait behind a long event purge.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import RETENTION_ROWS_PURGED
+from app.queries.retention import (
+    purge_minute_rollups,
+    purge_pipeline_batches,
+    purge_processed_analytics,
+    purge_processed_identify_operations,
+    select_active_backends,
+    select_app_ids,
+    select_replication_lag_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between load checks while the database is over a limit
+HEADROOM_POLL_SECONDS = 5.0
+
+
+def retention_cutoffs(app_ids, now: datetime) -> Dict[str, datetime]:
+    """
+    Cutoff per app_id: processed rows ingested before it are purged.
+    Apps without a retention are left out.
+    """
+    cutoffs = {}
+    for app_id in app_ids:
+        days = settings.RETENTION_DAYS_BY_APP.get(app_id, settings.RETENTION_DAYS)
+        if days is not None:
+            cutoffs[app_id] = now - timedelta(days=days)
+    return cutoffs
+
+
+class RetentionPurge:
+    """
+    One purge run: deletes in chunks within a time budget, throttled by database load.
+    """
+
+    def __init__(self, chunk_size: int, pause_seconds: float, max_lag_seconds: float,
+                 max_active_backends: int, max_run_seconds: float):
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.max_active_backends = max_active_backends
+        self.deadline = time.monotonic() + max_run_seconds
+        self.chunks = 0
+        self.paused_seconds = 0.0
+        self.rows_purged: Dict[str, int] = {}
+        # Rows purged from the other tables, keyed by table
+        self.table_rows_purged: Dict[str, int] = {}
+
+    def _wait_for_headroom(self, session: Session) -> bool:
+        """
+        Sleep the inter-chunk pause, then until replication lag and load are under their limits.
+
+        Returns:
+            bool: False when the run's time budget ran out while waiting
+        """
+        started = time.monotonic()
+        if self.chunks:
+            time.sleep(self.pause_seconds)
+        logged = False
+        while time.monotonic() < self.deadline:
+            lag = select_replication_lag_seconds(session)
+            active = select_active_backends(session)
+            session.commit()
+            if lag <= self.max_lag_seconds and active <= self.max_active_backends:
+                self.paused_seconds += time.monotonic() - started
+                return True
+            if not logged:
+                logger.info("Retention purge paused: replication lag %.1fs, %d active backends", lag, active)
+                logged = True
+            time.sleep(HEADROOM_POLL_SECONDS)
+        self.paused_seconds += time.monotonic() - started
+        return False
+
+    def purge_app(self, session: Session, app_id: str, cutoff: datetime) -> bool:
+        """
+        Delete the app's processed rows ingested before ``cutoff``.
+
+        Returns:
+            bool: False if the time budget ran out first
+        """
+        self.rows_purged.setdefault(app_id, 0)
+        after = None
+        while True:
+            if not self._wait_for_headroom(session):
+                return False
+            deleted, after = purge_processed_analytics(session, app_id, cutoff, after, self.chunk_size)
+            self.chunks += 1
+            self.rows_purged[app_id] += deleted
+            RETENTION_ROWS_PURGED.labels(app_id).inc(deleted)
+            if after is None:
+                return True
+
+    def purge_table(self, session: Session, table: str, purge: Callable[[Session, datetime, int], int],
+                    cutoff: datetime) -> bool:
+        """
+        Delete the rows ``purge`` selects as older than ``cutoff``, chunk by chunk.
+
+        Returns:
+            bool: False if the time budget ran out first
+        """
+        self.table_rows_purged.setdefault(table, 0)
+        while True:
+            if not self._wait_for_headroom(session):
+                return False
+            deleted = purge(session, cutoff, self.chunk_size)
+            self.chunks += 1
+            self.table_rows_purged[table] += deleted
+            if deleted < self.chunk_size:
+                return True
+
+
+def run_retention_purge(max_run_seconds: Optional[float] = None) -> dict:
+    """
+    Purge processed rows past their app's retention, and old minute rollups.
+
+    Returns:
+        dict: Status, rows purged per app_id and per other table, chunks and seconds paused
+    """
+    started = time.monotonic()
+    now = datetime.utcnow()
+    purge = RetentionPurge(
+        chunk_size=settings.RETENTION_CHUNK_SIZE,
+        pause_seconds=settings.RETENTION_PAUSE_SECONDS,
+        max_lag_seconds=settings.RETENTION_MAX_REPLICATION_LAG_SECONDS,
+        max_active_backends=settings.RETENTION_MAX_ACTIVE_BACKENDS,
+        max_run_seconds=max_run_seconds or settings.RETENTION_MAX_RUN_SECONDS,
+    )
+    result = {"status": "success"}
+
+    with Session(engine) as session:
+        try:
+            complete = True
+            for table, purge_rows, days in (
+                ("pipelinebatch", purge_pipeline_batches, settings.RETENTION_PIPELINE_BATCH_DAYS),
+                ("identifyoperation", purge_processed_identify_operations,
+                 settings.RETENTION_IDENTIFY_OPERATION_DAYS),
+            ):
+                if complete and days is not None:
+                    complete = purge.purge_table(session, table, purge_rows, now - timedelta(days=days))
+            if complete:
+                cutoffs = retention_cutoffs(select_app_ids(session), now)
+                session.commit()
+                complete = all(purge.purge_app(session, app_id, cutoff) for app_id, cutoff in cutoffs.items())
+            if complete and settings.RETENTION_MINUTE_ROLLUP_DAYS is not None:
+                rollup_cutoff = now - timedelta(days=settings.RETENTION_MINUTE_ROLLUP_DAYS)
+                complete = purge.purge_table(session, "eventrollupminute", purge_minute_rollups, rollup_cutoff)
+            if not complete:
+                result["status"] = "incomplete"
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Retention purge failed: {str(e)}", exc_info=True)
+            result.update(status="error", message=str(e))
+
+    result.update(
+        rows_purged=purge.rows_purged,
+        table_rows_purged=purge.table_rows_purged,
+        chunks=purge.chunks,
+        paused_seconds=round(purge.paused_seconds, 1),
+        duration_seconds=round(time.monotonic() - started, 1),
+    )
+    logger.info("Retention purge %s: %d rows in %d chunks, %d rows of other tables, paused %.1fs",
+                result["status"], sum(purge.rows_purged.values()), purge.chunks,
+                sum(purge.table_rows_purged.values()), purge.paused_seconds)
+    return result
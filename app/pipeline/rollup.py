@@ -0,0 +1,70 @@
+"""
+Incrementally maintained event counts per minute and per hour.
+
+Every batch counts the outcome of each claimed row by ingest bucket, app_id
+and event_name, and adds the counts to the rollup tables in the same
+transaction that acknowledges the rows, so a count is never lost or added
+twice when a batch fails half way. Outcomes:
+
+    delivered    accepted by the destination (rows folded into a counter event included)
+    sampled_out  dropped by a sampling rule
+    given_up     failed permanently or ran out of delivery attempts
+    retried      failed attempt scheduled for retry; counts attempts, not events
+
+Every event ends in exactly one of delivered, sampled_out and given_up, so
+their sum is the number of events ingested in a bucket once the backlog for
+it has drained. Rows processed before the tables existed are not counted.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+from uuid import UUID
+
+from app.pipeline.records import EventRecord
+
+GRANULARITIES = ("minute", "hour")
+OUTCOMES = ("delivered", "sampled_out", "given_up", "retried")
+# Outcomes that end an event; counting them counts every event once
+FINAL_OUTCOMES = ("delivered", "sampled_out", "given_up")
+GROUP_BY_COLUMNS = ("app_id", "event_name", "outcome")
+
+RollupKey = Tuple[datetime, str, str, str]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the minute or hour ``timestamp`` falls in."""
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported rollup granularity {granularity!r}, expected one of {GRANULARITIES}")
+
+
+class RollupCounts:
+    """
+    Outcome counts of one batch, keyed by (minute, app_id, event_name, outcome).
+    """
+    __slots__ = ("_rows", "counts")
+
+    def __init__(self, rows: Iterable[EventRecord]):
+        self._rows: Dict[UUID, EventRecord] = {row.id: row for row in rows}
+        self.counts: Dict[RollupKey, int] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.counts)
+
+    def add(self, ids: Iterable[UUID], outcome: str) -> None:
+        counts = self.counts
+        for row_id in ids:
+            row = self._rows[row_id]
+            key = (bucket_start(row.created_at, "minute"), row.app_id, row.event_name or "", outcome)
+            counts[key] = counts.get(key, 0) + 1
+
+    def by_granularity(self, granularity: str) -> Dict[RollupKey, int]:
+        """Counts folded into ``granularity`` buckets."""
+        if granularity == "minute":
+            return self.counts
+        folded: Dict[RollupKey, int] = {}
+        for (bucket, app_id, event_name, outcome), count in self.counts.items():
+            key = (bucket_start(bucket, granularity), app_id, event_name, outcome)
+            folded[key] = folded.get(key, 0) + count
+        return folded
@@ -0,0 +1,184 @@
+"""
+Sampling and pre-aggregation rules applied between claim and dispatch.
+
+Rules are keyed by app_id and event_name ("*" matches any) and configured
+through the EVENT_RULES setting, e.g.
+
+    EVENT_RULES='[
+        {"app_id": "esa", "event_name": "scroll", "action": "sample", "rate": 0.1},
+        {"app_id": "*", "event_name": "heartbeat", "action": "aggregate", "window_seconds": 300}
+    ]'
+
+``sample`` keeps a deterministic fraction of users per event name, so a
+sampled user's events are either all kept or all dropped; kept events carry
+a ``sample_rate`` property for scaling counts. ``aggregate`` replaces the
+events of each user within a window by a single counter event carrying
+``count``, ``window_start`` and ``window_end``. Counter events for a window
+that is still open when the batch runs are complemented by later batches,
+so summing ``count`` stays exact.
+"""
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import NAMESPACE_OID, UUID, uuid5
+
+from app.core.config import settings
+from app.pipeline.records import EventRecord
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+ACTIONS = ("sample", "aggregate")
+
+# Timestamps are naive UTC throughout the app
+_EPOCH = datetime(1970, 1, 1)
+
+
+class EventRule:
+    """
+    A sampling or aggregation rule for one app_id/event_name pair.
+    """
+    __slots__ = ("app_id", "event_name", "action", "rate", "window_seconds", "_threshold")
+
+    def __init__(self, app_id: str, event_name: str, action: str,
+                 rate: float = 1.0, window_seconds: int = 60):
+        if action not in ACTIONS:
+            raise ValueError(f"Unsupported rule action {action!r}, expected one of {ACTIONS}")
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Sampling rate must be between 0 and 1, got {rate}")
+        if window_seconds <= 0:
+            raise ValueError(f"Aggregation window must be positive, got {window_seconds}")
+        self.app_id = app_id
+        self.event_name = event_name
+        self.action = action
+        self.rate = rate
+        self.window_seconds = window_seconds
+        self._threshold = int(rate * 0xFFFFFFFF)
+
+    def keeps(self, record: EventRecord) -> bool:
+        """Deterministic per-user sampling decision."""
+        identity = record.user_id or record.device_id or str(record.event_id)
+        return zlib.crc32(f"{identity}:{record.event_name}".encode()) <= self._threshold
+
+
+class RuleOutcome:
+    """
+    Result of applying the rules to a batch.
+
+    Attributes:
+        records: Records to dispatch, including aggregated counter events
+        dropped_ids: Ids of rows removed by sampling
+        merged_ids: Ids of the rows folded into each counter event, keyed by the counter's id
+        stats: Per-rule counts of events sampled out and aggregated
+    """
+    __slots__ = ("records", "dropped_ids", "merged_ids", "stats")
+
+    def __init__(self):
+        self.records: List[EventRecord] = []
+        self.dropped_ids: List[UUID] = []
+        self.merged_ids: Dict[UUID, List[UUID]] = {}
+        self.stats: Dict[Tuple[str, str, str], int] = {}
+
+    def count(self, rule: EventRule, outcome: str, amount: int = 1) -> None:
+        key = (rule.app_id, rule.event_name, outcome)
+        self.stats[key] = self.stats.get(key, 0) + amount
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "sampled_out": len(self.dropped_ids),
+            "aggregated_events": sum(len(ids) for ids in self.merged_ids.values()),
+            "counter_events": len(self.merged_ids),
+        }
+
+
+class RuleEngine:
+    """
+    Looks up the rule for each record and applies it.
+    """
+
+    def __init__(self, rules: Iterable[EventRule]):
+        self._rules: Dict[Tuple[str, str], EventRule] = {(r.app_id, r.event_name): r for r in rules}
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def rule_for(self, app_id: str, event_name: str) -> Optional[EventRule]:
+        rules = self._rules
+        return (rules.get((app_id, event_name))
+                or rules.get((WILDCARD, event_name))
+                or rules.get((app_id, WILDCARD)))
+
+    def apply(self, records: Iterable[EventRecord]) -> RuleOutcome:
+        outcome = RuleOutcome()
+        if not self._rules:
+            outcome.records = list(records)
+            return outcome
+
+        groups: Dict[Tuple, List[EventRecord]] = {}
+        group_rules: Dict[Tuple, EventRule] = {}
+
+        for record in records:
+            rule = self.rule_for(record.app_id, record.event_name)
+            if rule is None:
+                outcome.records.append(record)
+            elif rule.action == "sample":
+                if rule.keeps(record):
+                    record.event_data = {**(record.event_data or {}), "sample_rate": rule.rate}
+                    outcome.records.append(record)
+                else:
+                    outcome.dropped_ids.append(record.id)
+                    outcome.count(rule, "sampled_out")
+            else:
+                window = int((record.created_at - _EPOCH).total_seconds() // rule.window_seconds)
+                key = (record.app_id, record.event_name, record.user_id, record.device_id, window)
+                groups.setdefault(key, []).append(record)
+                group_rules[key] = rule
+
+        for key, members in groups.items():
+            rule = group_rules[key]
+            counter = self._counter_event(members, key[-1], rule.window_seconds)
+            outcome.records.append(counter)
+            outcome.merged_ids[counter.id] = [m.id for m in members]
+            outcome.count(rule, "aggregated", len(members))
+
+        return outcome
+
+    @staticmethod
+    def _counter_event(members: List[EventRecord], window: int, window_seconds: int) -> EventRecord:
+        """
+        A counter event identified by all the rows it stands for: resending the
+        same rows keeps its insert_id, so Amplitude drops a duplicate, while a
+        counter that also carries rows of a later batch gets a new one.
+        """
+        first = members[0]
+        window_start = _EPOCH + timedelta(seconds=window * window_seconds)
+        counter_id = uuid5(NAMESPACE_OID, "counter:" + ",".join(sorted(str(m.id) for m in members)))
+        return EventRecord(
+            id=counter_id,
+            event_id=counter_id,
+            app_id=first.app_id,
+            event_name=first.event_name,
+            event_data={
+                "count": len(members),
+                "window_start": window_start.isoformat(),
+                "window_end": (window_start + timedelta(seconds=window_seconds)).isoformat(),
+            },
+            user_id=first.user_id,
+            device_id=first.device_id,
+            created_at=max(m.created_at for m in members),
+            priority=first.priority,
+        )
+
+
+def load_rules(raw_rules: List[Dict[str, Any]]) -> RuleEngine:
+    rules = []
+    for raw in raw_rules:
+        try:
+            rules.append(EventRule(**raw))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Ignoring invalid event rule {raw}: {str(e)}")
+    return RuleEngine(rules)
+
+
+rule_engine = load_rules(settings.EVENT_RULES)
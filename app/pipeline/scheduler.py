@@ -0,0 +1,174 @@
+"""
+Weighted fair claiming of unprocessed events across app_ids.
+
+Each batch is shared between the apps that currently have a backlog using
+deficit round robin: every backlogged app earns a quantum proportional to
+its weight (APP_WEIGHTS, DEFAULT_APP_WEIGHT) and may claim as many rows as
+its accumulated deficit allows, capped by its quota (APP_QUOTAS). Capacity
+left over because an app ran dry is handed to apps that still have rows,
+so the batch is filled whenever there is work. An app that claims fewer
+rows than it was allowed has run dry and forfeits its deficit, as does an
+app without a backlog, so idle apps cannot save up credit. Credit is never
+carried beyond one batch, and when carried credit asks for more rows than
+the batch holds, the shares are scaled down to fit.
+
+A burst from one app therefore only delays that app's own events; the
+others keep their weighted share of every batch. Shares are kept per
+priority lane, and ``claim_lanes`` fills a batch lane by lane, highest first.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.pipeline.priority import DEFAULT_LANE, LANES
+from app.pipeline.records import EventRecord
+from app.queries.track import claim_un_processed_analytics, select_backlogged_app_ids
+
+logger = logging.getLogger(__name__)
+
+
+class FairScheduler:
+    """
+    Deficit round robin over the backlogged app_ids of one priority lane.
+
+    State is per process; each worker process keeps its own deficits, which
+    is enough to keep the long-run shares fair across many batches.
+    """
+
+    def __init__(self,
+                 lane: str = DEFAULT_LANE,
+                 weights: Optional[Dict[str, float]] = None,
+                 quotas: Optional[Dict[str, int]] = None,
+                 default_weight: float = 1.0,
+                 lease_seconds: int = 300):
+        self.lane = lane
+        self.weights = weights or {}
+        self.quotas = quotas or {}
+        self.default_weight = default_weight
+        self.lease_seconds = lease_seconds
+        self._deficits: Dict[str, float] = {}
+
+    def weight(self, app_id: str) -> float:
+        return max(self.weights.get(app_id, self.default_weight), 0.0)
+
+    def plan(self, app_ids: List[str], batch_size: int) -> Dict[str, int]:
+        """
+        Split ``batch_size`` between ``app_ids`` and update the deficits.
+
+        Returns:
+            dict: Rows each app may claim in this batch
+        """
+        # Apps without a backlog forfeit their credit
+        self._deficits = {app_id: d for app_id, d in self._deficits.items() if app_id in app_ids}
+
+        active = [app_id for app_id in app_ids if self.weight(app_id) > 0]
+        total_weight = sum(self.weight(app_id) for app_id in active)
+        if not active or batch_size <= 0:
+            return {}
+
+        allowance = {}
+        for app_id in active:
+            deficit = self._deficits.get(app_id, 0.0) + batch_size * self.weight(app_id) / total_weight
+            deficit = min(deficit, self.quotas.get(app_id, batch_size), batch_size)
+            self._deficits[app_id] = deficit
+            allowance[app_id] = int(deficit)
+
+        # Carried credit can ask for more than the batch; scale the shares down,
+        # what they lose stays in the deficits for the next batch
+        requested = sum(allowance.values())
+        if requested > batch_size:
+            allowance = {app_id: rows * batch_size // requested for app_id, rows in allowance.items()}
+
+        # Rounding can leave a few rows unassigned; give them to the largest deficits
+        spare = batch_size - sum(allowance.values())
+        for app_id in sorted(active, key=lambda a: self._deficits[a] - allowance[a], reverse=True):
+            if spare <= 0:
+                break
+            if allowance[app_id] < min(self.quotas.get(app_id, batch_size), batch_size):
+                allowance[app_id] += 1
+                spare -= 1
+        return allowance
+
+    def charge(self, app_id: str, claimed: int, allowed: int) -> None:
+        """
+        Consume deficit for rows actually claimed; an app that claimed fewer
+        rows than ``allowed`` ran dry and forfeits the rest.
+        """
+        if app_id in self._deficits:
+            if claimed < allowed:
+                self._deficits[app_id] = 0.0
+            else:
+                self._deficits[app_id] = max(self._deficits[app_id] - claimed, 0.0)
+
+    def claim(self, session: Session, batch_size: int) -> List[EventRecord]:
+        """
+        Claim up to ``batch_size`` rows, shared fairly between backlogged apps.
+
+        Args:
+            session: Database session
+            batch_size: Maximum number of rows to claim
+
+        Returns:
+            list: Claimed records, oldest first
+        """
+        app_ids = select_backlogged_app_ids(session, self.lane)
+        allowance = self.plan(app_ids, batch_size)
+        lease_until = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+        records: List[EventRecord] = []
+        hungry = []
+        for app_id, limit in allowance.items():
+            if limit <= 0:
+                continue
+            claimed = claim_un_processed_analytics(session, self.lane, app_id, limit, lease_until)
+            self.charge(app_id, len(claimed), limit)
+            records.extend(claimed)
+            if len(claimed) == limit:
+                hungry.append(app_id)
+
+        # Work-conserving pass: hand unused capacity to apps that filled their share
+        for app_id in hungry:
+            remaining = batch_size - len(records)
+            if remaining <= 0:
+                break
+            quota = self.quotas.get(app_id)
+            if quota is not None:
+                remaining = min(remaining, quota - allowance[app_id])
+            if remaining <= 0:
+                continue
+            claimed = claim_un_processed_analytics(session, self.lane, app_id, remaining, lease_until)
+            records.extend(claimed)
+
+        if len(allowance) > 1:
+            logger.debug(f"Fair claim in lane {self.lane} over {len(allowance)} apps: {allowance}")
+        records.sort(key=lambda r: r.created_at)
+        return records
+
+
+lane_schedulers = {
+    lane: FairScheduler(
+        lane=lane,
+        weights=settings.APP_WEIGHTS,
+        quotas=settings.APP_QUOTAS,
+        default_weight=settings.DEFAULT_APP_WEIGHT,
+        lease_seconds=settings.CLAIM_LEASE_SECONDS,
+    )
+    for lane in LANES
+}
+
+
+def claim_lanes(session: Session, batch_size: int, lanes: Iterable[str]) -> List[EventRecord]:
+    """
+    Claim up to ``batch_size`` rows from ``lanes`` in order; a lane only
+    gets the capacity the lanes before it left unused.
+    """
+    records: List[EventRecord] = []
+    for lane in lanes:
+        remaining = batch_size - len(records)
+        if remaining <= 0:
+            break
+        records.extend(lane_schedulers[lane].claim(session, remaining))
+    return records
@@ -0,0 +1,295 @@
+"""
+Delivery notifications to the ``callback_webhook`` of events.
+
+The ack stage copies every delivered, sampled-out or given-up event whose
+event_meta has a callback_webhook into the webhooknotification outbox, in
+the ack's own transaction. Notifications are sent by separate runs, so a
+slow or failing customer endpoint never holds up a dispatch batch. In
+celery mode the runs are tasks on the ``webhooks`` queue every
+WEBHOOK_INTERVAL_SECONDS; a worker that also consumes the analytics queues
+lends them a pool process while they run, so deployments with many slow
+endpoints should consume ``webhooks`` with a worker of its own
+(``python worker.py --queues webhooks``). The embedded dispatcher sends
+them from a task of its own, outside EMBEDDED_CONCURRENCY.
+
+A run claims up to WEBHOOK_CLAIM_SIZE due notifications under a lease,
+groups them by URL and POSTs each group in bodies of up to
+WEBHOOK_BATCH_SIZE events:
+
+    {"events": [{"event_id": "...", "app_id": "esa", "event_name": "cart_add",
+                 "outcome": "delivered", "processed_at": "2025-06-24T09:42:18"}]}
+
+Requests share one pooled aiohttp session per process, kept on a
+background event loop so connections are reused across runs, with at most
+WEBHOOK_MAX_CONNECTIONS_PER_HOST connections to any host. A 2xx response
+deletes the notifications; anything else backs them off exponentially
+until WEBHOOK_MAX_ATTEMPTS, after which they are dropped.
+
+URLs come from event payloads, so they are not trusted: only http and https
+URLs to hosts in WEBHOOK_ALLOWED_HOSTS (when set) are called, and a host
+that is or resolves to a private, loopback, link-local or reserved address
+is refused. The check runs in the connector, on the address actually
+connected to, and redirects are not followed.
+
+Needs the ``aiohttp`` package.
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+from sqlalchemy import Row
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import DESTINATION_REQUEST_SECONDS, DESTINATION_RESPONSES, WEBHOOK_NOTIFICATIONS
+from app.queries.webhook import (
+    claim_webhook_notifications,
+    delete_webhook_notifications,
+    schedule_webhook_retries,
+)
+
+try:
+    import aiohttp
+    from aiohttp import TCPConnector
+except ImportError:  # only needed to send webhook notifications
+    aiohttp = None
+    TCPConnector = object
+
+logger = logging.getLogger(__name__)
+
+# Seconds a run may hold its claimed notifications before another run may take them
+LEASE_SECONDS = 300
+
+
+def parse_ip_address(host: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """
+    The address ``host`` stands for if it is an IP literal, None for a hostname.
+    Also parses the IPv4 forms inet_aton accepts, such as 127.1, 0177.0.0.1
+    and 2130706433, which connect like the canonical form.
+    """
+    try:
+        return ipaddress.ip_address(host.split("%", 1)[0])
+    except ValueError:
+        pass
+    try:
+        return ipaddress.IPv4Address(socket.inet_aton(host))
+    except OSError:
+        return None
+
+
+def is_public_address(address: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+    """Whether an IP address is routable on the internet."""
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+class PublicAddressConnector(TCPConnector):
+    """
+    Connector that refuses to connect to non-public addresses, so a webhook
+    URL cannot reach the internal network. Checks the addresses connected to,
+    after DNS resolution (including rebinding) or for IP literals in any form.
+    """
+
+    async def _resolve_host(self, host, port, traces=None):
+        addresses = await super()._resolve_host(host, port, traces=traces)
+        for address in addresses:
+            ip = parse_ip_address(address["host"])
+            if ip is None or not is_public_address(ip):
+                raise OSError(f"{host} is not a public address: {address['host']}")
+        return addresses
+
+
+class WebhookClient:
+    """
+    Pooled async HTTP client on its own event loop thread, usable from synchronous code.
+    """
+
+    def __init__(self, max_connections: int, max_connections_per_host: int, timeout: float):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session = None
+        self._pid = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A forked pool process does not inherit the loop thread, start its own
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="webhook-client", daemon=True).start()
+                self._session = asyncio.run_coroutine_threadsafe(self._create_session(), loop).result()
+                self._loop, self._pid = loop, os.getpid()
+        return self._loop
+
+    async def _create_session(self):
+        connector = PublicAddressConnector(limit=self.max_connections, limit_per_host=self.max_connections_per_host)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def _post(self, url: str, payload: dict) -> Tuple[Optional[int], Optional[str]]:
+        started = time.perf_counter()
+        try:
+            async with self._session.post(url, json=payload, allow_redirects=False) as response:
+                await response.read()
+                if 200 <= response.status < 300:
+                    return response.status, None
+                return response.status, f"HTTP {response.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            return None, f"{type(e).__name__}: {str(e) or 'timed out'}"
+        finally:
+            DESTINATION_REQUEST_SECONDS.labels("webhook").observe(time.perf_counter() - started)
+
+    async def _post_all(self, requests: Sequence[Tuple[str, dict]]) -> List[Tuple[Optional[int], Optional[str]]]:
+        return await asyncio.gather(*(self._post(url, payload) for url, payload in requests))
+
+    def post_all(self, requests: Sequence[Tuple[str, dict]]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        POST every (url, json payload) concurrently within the connection limits.
+
+        Returns:
+            list: (status code or None, error or None) per request, in order
+        """
+        loop = self._get_loop()
+        return asyncio.run_coroutine_threadsafe(self._post_all(requests), loop).result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = self._session = None
+
+
+def is_callable_url(url: str) -> bool:
+    """
+    Whether a notification may be sent to ``url``: http(s), an allowed host,
+    and not an IP literal of a non-public address. Hostnames are checked
+    against their addresses when connecting, see PublicAddressConnector.
+    """
+    try:
+        parsed = urlparse(url)
+        hostname = parsed.hostname
+    except ValueError:
+        return False
+    if parsed.scheme not in ("http", "https") or not hostname:
+        return False
+    if settings.WEBHOOK_ALLOWED_HOSTS and hostname not in {h.lower() for h in settings.WEBHOOK_ALLOWED_HOSTS}:
+        return False
+    ip = parse_ip_address(hostname)
+    return ip is None or is_public_address(ip)
+
+
+def group_notifications(notifications: Sequence[Row],
+                        batch_size: int) -> List[Tuple[str, List[Row]]]:
+    """
+    Group notifications by URL into POSTs of at most ``batch_size`` events.
+
+    Returns:
+        list: (url, notifications) per POST
+    """
+    by_url: Dict[str, List[Row]] = {}
+    for notification in notifications:
+        by_url.setdefault(notification.url, []).append(notification)
+    return [
+        (url, group[start:start + batch_size])
+        for url, group in by_url.items()
+        for start in range(0, len(group), batch_size)
+    ]
+
+
+def notification_payload(notifications: Sequence[Row]) -> dict:
+    return {
+        "events": [
+            {
+                "event_id": str(notification.event_id),
+                "app_id": notification.app_id,
+                "event_name": notification.event_name,
+                "outcome": notification.outcome,
+                "processed_at": notification.processed_at.isoformat(),
+            }
+            for notification in notifications
+        ]
+    }
+
+
+webhook_client = WebhookClient(
+    max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+    max_connections_per_host=settings.WEBHOOK_MAX_CONNECTIONS_PER_HOST,
+    timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+)
+
+
+def run_webhook_batch(claim_size: Optional[int] = None) -> dict:
+    """
+    Send the due callback_webhook notifications, batched per URL.
+
+    Returns:
+        dict: Status with the number of notifications claimed, sent, retried and given up
+    """
+    if aiohttp is None:
+        logger.error("Cannot send webhook notifications, aiohttp is not installed")
+        return {"status": "error", "message": "aiohttp is not installed"}
+
+    claim_size = claim_size or settings.WEBHOOK_CLAIM_SIZE
+    now = datetime.utcnow()
+    result = {"status": "success", "claimed": 0, "sent": 0, "retried": 0, "given_up": 0}
+
+    with Session(engine) as session:
+        notifications = claim_webhook_notifications(session, claim_size, now,
+                                                    now + timedelta(seconds=LEASE_SECONDS))
+        if not notifications:
+            return result
+        result["claimed"] = len(notifications)
+
+        invalid = [n for n in notifications if not is_callable_url(n.url)]
+        posts = group_notifications([n for n in notifications if is_callable_url(n.url)],
+                                    settings.WEBHOOK_BATCH_SIZE)
+        responses = webhook_client.post_all([(url, notification_payload(group)) for url, group in posts])
+
+        sent, failed = [], {}
+        for (url, group), (code, error) in zip(posts, responses):
+            DESTINATION_RESPONSES.labels("webhook", str(code) if code else "error").inc(len(group))
+            if error is None:
+                sent.extend(n.id for n in group)
+            else:
+                failed.setdefault(error, []).extend(n.id for n in group)
+                logger.warning("Webhook notification of %d events to %s failed: %s",
+                               len(group), urlparse(url).hostname, error)
+
+        try:
+            delete_webhook_notifications(session, sent + [n.id for n in invalid])
+            given_up = []
+            for error, ids in failed.items():
+                given_up.extend(schedule_webhook_retries(
+                    session, ids, error, datetime.utcnow(),
+                    base_seconds=settings.WEBHOOK_RETRY_BASE_SECONDS,
+                    max_seconds=settings.WEBHOOK_RETRY_MAX_SECONDS,
+                    max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+                ))
+            session.commit()
+        except Exception as e:
+            # The lease runs out and the notifications are sent again
+            logger.error(f"Database error acknowledging webhook notifications: {str(e)}", exc_info=True)
+            session.rollback()
+            return {**result, "status": "error", "message": str(e)}
+
+    if invalid:
+        logger.warning("Dropped %d webhook notifications with a URL that is not http(s), not allowed "
+                       "or of a non-public address", len(invalid))
+    result["sent"] = len(sent)
+    result["given_up"] = len(given_up) + len(invalid)
+    result["retried"] = sum(len(ids) for ids in failed.values()) - len(given_up)
+    for outcome in ("sent", "retried", "given_up"):
+        if result[outcome]:
+            WEBHOOK_NOTIFICATIONS.labels(outcome).inc(result[outcome])
+    return result
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.models.track import AnalyticsTrackBase
+from app.pipeline.records import EventRecord
+from app.queries.track import RECORD_COLUMNS
+
+# Columns returned by the raw event API, in response order
+EVENT_COLUMNS = (
+    AnalyticsTrackBase.id,
+    AnalyticsTrackBase.event_id,
+    AnalyticsTrackBase.app_id,
+    AnalyticsTrackBase.event_name,
+    AnalyticsTrackBase.event_data,
+    AnalyticsTrackBase.identity,
+    AnalyticsTrackBase.event_meta,
+    AnalyticsTrackBase.priority,
+    AnalyticsTrackBase.created_at,
+    AnalyticsTrackBase.processed_at,
+)
+
+# Rows fetched per server-side cursor round trip during an export
+EXPORT_FETCH_SIZE = 1000
+# Rows read per export transaction; the next chunk resumes after the last key
+EXPORT_CHUNK_ROWS = 50000
+
+EventKey = Tuple[datetime, UUID]
+
+
+def _events_statement(app_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      event_name: Optional[str] = None, user_id: Optional[str] = None,
+                      device_id: Optional[str] = None, after: Optional[EventKey] = None,
+                      descending: bool = False, columns: Sequence = EVENT_COLUMNS):
+    """
+    Events of one app in (created_at, id) order, resuming after the ``after`` key.
+    The app_id equality plus the key range is one range scan of the
+    (app_id, created_at, id) index; the other filters are applied on the way.
+    """
+    key = tuple_(AnalyticsTrackBase.created_at, AnalyticsTrackBase.id)
+    statement = select(*columns).where(AnalyticsTrackBase.app_id == app_id)
+    if start is not None:
+        statement = statement.where(AnalyticsTrackBase.created_at >= start)
+    if end is not None:
+        statement = statement.where(AnalyticsTrackBase.created_at < end)
+    if event_name is not None:
+        statement = statement.where(AnalyticsTrackBase.event_name == event_name)
+    if user_id is not None:
+        statement = statement.where(AnalyticsTrackBase.identity["amplitude"]["user_id"].as_string() == user_id)
+    if device_id is not None:
+        statement = statement.where(AnalyticsTrackBase.identity["amplitude"]["device_id"].as_string() == device_id)
+    if after is not None:
+        statement = statement.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    if descending:
+        return statement.order_by(AnalyticsTrackBase.created_at.desc(), AnalyticsTrackBase.id.desc())
+    return statement.order_by(AnalyticsTrackBase.created_at, AnalyticsTrackBase.id)
+
+
+def select_events_page(session: Session, app_id: str, limit: int, **filters) -> List:
+    """
+    One page of raw events, see ``_events_statement`` for the filters.
+    The caller passes the (created_at, id) of the last row as ``after`` to get the next page.
+    """
+    return list(session.exec(_events_statement(app_id, **filters).limit(limit)))
+
+
+def select_event_records(session: Session, app_id: str, limit: int, **filters) -> List[EventRecord]:
+    """
+    Like ``select_events_page``, as pipeline EventRecords in ascending key order.
+    """
+    statement = _events_statement(app_id, columns=RECORD_COLUMNS, **filters).limit(limit)
+    return [EventRecord.from_row(row) for row in session.exec(statement)]
+
+
+def stream_events(app_id: str, chunk_rows: int = EXPORT_CHUNK_ROWS, **filters) -> Iterator:
+    """
+    Every matching event in ascending (created_at, id) order.
+
+    Each chunk of ``chunk_rows`` is read through a server-side cursor in its
+    own short transaction, and the next chunk picks up after the last key, so
+    memory stays constant and no transaction lives as long as the export.
+    """
+    after = filters.pop("after", None)
+    while True:
+        fetched = 0
+        with Session(engine) as session:
+            statement = _events_statement(app_id, after=after, **filters).limit(chunk_rows)
+            result = session.exec(statement.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE))
+            for row in result:
+                fetched += 1
+                after = (row.created_at, row.id)
+                yield row
+        if fetched < chunk_rows:
+            return
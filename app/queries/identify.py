@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import List, Sequence
+from uuid import UUID
+
+from sqlalchemy import Row, and_, or_, update
+from sqlmodel import Session, select
+
+from app.models.identify import IdentifyOperation
+from app.queries.track import ACK_CHUNK_SIZE
+
+# Returned by the claim as plain rows, which outlive the claim's commit unlike ORM instances
+OPERATION_COLUMNS = (
+    IdentifyOperation.id,
+    IdentifyOperation.app_id,
+    IdentifyOperation.user_id,
+    IdentifyOperation.device_id,
+    IdentifyOperation.user_properties,
+    IdentifyOperation.created_at,
+)
+
+
+def _claimable(now: datetime, created_before: datetime):
+    return and_(IdentifyOperation.processed_at == None,
+                IdentifyOperation.created_at < created_before,
+                or_(IdentifyOperation.available_at == None, IdentifyOperation.available_at <= now))
+
+
+def claim_identify_operations(session: Session, query_size: int, created_before: datetime,
+                              lease_until: datetime) -> List[Row]:
+    """
+    Claim the available operations created before ``created_before`` of the
+    users owning the ``query_size`` oldest ones, by moving their
+    ``available_at`` to ``lease_until``; concurrent runs skip them until they
+    are sent, released or the lease runs out.
+
+    A user's operations are claimed together, never cut off by the limit, so a
+    resend coalesces the same operations of each closed window into the same
+    identifies under the same insert_ids. Commits, so no rows stay locked
+    while the identifies are sent.
+    """
+    now = datetime.utcnow()
+    users = (
+        select(IdentifyOperation.app_id, IdentifyOperation.user_id, IdentifyOperation.device_id)
+        .where(_claimable(now, created_before))
+        .order_by(IdentifyOperation.created_at)
+        .limit(query_size)
+        .subquery()
+    )
+    same_user = (
+        select(users.c.app_id)
+        .where(users.c.app_id == IdentifyOperation.app_id,
+               users.c.user_id.is_not_distinct_from(IdentifyOperation.user_id),
+               users.c.device_id.is_not_distinct_from(IdentifyOperation.device_id))
+        .exists()
+    )
+    candidates = (
+        select(IdentifyOperation.id)
+        .where(_claimable(now, created_before), same_user)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(IdentifyOperation)
+        .where(IdentifyOperation.id.in_(candidates))
+        .values(available_at=lease_until)
+        .returning(*OPERATION_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    operations = session.execute(statement).all()
+    session.commit()
+    return operations
+
+
+def mark_identify_operations_processed(session: Session, ids: Sequence[UUID], processed_at: datetime) -> None:
+    """Acknowledge sent operations and release their claim lease. Does not commit."""
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        session.execute(
+            update(IdentifyOperation)
+            .where(IdentifyOperation.id.in_(ids[start:start + ACK_CHUNK_SIZE]))
+            .values(processed_at=processed_at, available_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def release_identify_operations(session: Session, ids: Sequence[UUID]) -> None:
+    """Release the claim lease of operations to resend, so the next run claims them again. Does not commit."""
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        session.execute(
+            update(IdentifyOperation)
+            .where(IdentifyOperation.id.in_(ids[start:start + ACK_CHUNK_SIZE]))
+            .values(available_at=None)
+            .execution_options(synchronize_session=False)
+        )
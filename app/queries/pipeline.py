@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.models.pipeline import PipelineBatch
+
+
+def insert_pipeline_batch(session: Session, batch: PipelineBatch) -> None:
+    session.add(batch)
+    session.commit()
+
+
+def select_delivered_since(session: Session, windows: Sequence[int], now: Optional[datetime] = None) -> Dict[int, int]:
+    """
+    Rows delivered over each trailing window, keyed by window length in seconds.
+    Only batches inside the longest window are read, via the finished_at index.
+    """
+    now = now or datetime.utcnow()
+    columns = [
+        func.coalesce(
+            func.sum(PipelineBatch.rows_delivered).filter(PipelineBatch.finished_at >= now - timedelta(seconds=w)),
+            0,
+        )
+        for w in windows
+    ]
+    statement = select(*columns).where(PipelineBatch.finished_at >= now - timedelta(seconds=max(windows)))
+    totals = session.exec(statement).one()
+    return {w: int(total) for w, total in zip(windows, totals)}
+
+
+def select_last_success_per_destination(session: Session, since: timedelta = timedelta(days=1)) -> Dict[str, PipelineBatch]:
+    """
+    Most recent batch of each destination that delivered events within ``since``.
+    """
+    statement = (
+        select(PipelineBatch)
+        .where(PipelineBatch.status.in_(("success", "partial")),
+               PipelineBatch.rows_delivered > 0,
+               PipelineBatch.finished_at >= datetime.utcnow() - since)
+        .distinct(PipelineBatch.destination)
+        .order_by(PipelineBatch.destination, PipelineBatch.finished_at.desc())
+    )
+    return {batch.destination: batch for batch in session.exec(statement)}
+
+
+def select_batch_rate(session: Session, window: timedelta, now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Rows per second a single batch run worked through, over the batches that
+    fetched rows within the trailing ``window``; None when there were none.
+    """
+    now = now or datetime.utcnow()
+    statement = (
+        select(func.sum(PipelineBatch.rows_fetched),
+               func.sum(func.extract("epoch", PipelineBatch.finished_at - PipelineBatch.started_at)))
+        .where(PipelineBatch.finished_at >= now - window, PipelineBatch.rows_fetched > 0)
+    )
+    rows, seconds = session.exec(statement).one()
+    if not rows or not seconds:
+        return None
+    return int(rows) / float(seconds)
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from app.models.replay import ReplayChunk, ReplayJob
+
+
+def insert_replay_job(session: Session, job: ReplayJob, chunks: Sequence[Tuple[str, datetime, datetime]]) -> None:
+    """
+    Create a job and its pending chunks, given as (app_id, chunk_start, chunk_end).
+    """
+    session.add(job)
+    session.add_all(
+        ReplayChunk(job_id=job.id, app_id=app_id, chunk_start=start, chunk_end=end)
+        for app_id, start, end in chunks
+    )
+    session.commit()
+
+
+def select_unfinished_chunk_ids(session: Session, job_id: UUID) -> List[UUID]:
+    """
+    Chunks of a job that are pending or stopped on an error, oldest slice first.
+    """
+    statement = (
+        select(ReplayChunk.id)
+        .where(ReplayChunk.job_id == job_id, ReplayChunk.status != "done")
+        .order_by(ReplayChunk.chunk_start, ReplayChunk.app_id)
+    )
+    return list(session.exec(statement))
+
+
+def checkpoint_replay_chunk(session: Session, chunk_id: UUID, cursor: Tuple[datetime, UUID],
+                            sent: int, skipped: int, failed: int) -> None:
+    """
+    Record the last event handled and add the page's counts, so a resumed chunk starts after it.
+    """
+    session.execute(
+        update(ReplayChunk)
+        .where(ReplayChunk.id == chunk_id)
+        .values(
+            cursor_created_at=cursor[0],
+            cursor_id=cursor[1],
+            rows_sent=ReplayChunk.rows_sent + sent,
+            rows_skipped=ReplayChunk.rows_skipped + skipped,
+            rows_failed=ReplayChunk.rows_failed + failed,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    session.commit()
+
+
+def finish_replay_chunk(session: Session, chunk_id: UUID, status: str, error: Optional[str] = None) -> None:
+    session.execute(
+        update(ReplayChunk)
+        .where(ReplayChunk.id == chunk_id)
+        .values(status=status, last_error=error[:255] if error else None, updated_at=datetime.utcnow())
+    )
+    session.commit()
+
+
+def finish_replay_job(session: Session, job_id: UUID, status: str) -> None:
+    session.execute(
+        update(ReplayJob)
+        .where(ReplayJob.id == job_id)
+        .values(status=status, finished_at=datetime.utcnow())
+    )
+    session.commit()
+
+
+def select_replay_progress(session: Session, job_id: UUID) -> Dict[str, int]:
+    """
+    Chunk counts per status and event totals of a job.
+    """
+    statement = (
+        select(
+            ReplayChunk.status,
+            func.count(),
+            func.sum(ReplayChunk.rows_sent),
+            func.sum(ReplayChunk.rows_skipped),
+            func.sum(ReplayChunk.rows_failed),
+        )
+        .where(ReplayChunk.job_id == job_id)
+        .group_by(ReplayChunk.status)
+    )
+    progress = {"chunks_pending": 0, "chunks_done": 0, "chunks_error": 0,
+                "rows_sent": 0, "rows_skipped": 0, "rows_failed": 0}
+    for status, chunks, sent, skipped, failed in session.exec(statement):
+        progress[f"chunks_{status}"] = chunks
+        progress["rows_sent"] += int(sent or 0)
+        progress["rows_skipped"] += int(skipped or 0)
+        progress["rows_failed"] += int(failed or 0)
+    return progress
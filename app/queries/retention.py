@@ -0,0 +1,158 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, text, tuple_
+from sqlmodel import Session, select
+
+from app.models.identify import IdentifyOperation
+from app.models.pipeline import PipelineBatch
+from app.models.rollup import EventRollupMinute
+from app.models.track import AnalyticsTrackBase
+
+# Seconds a purge statement waits for a table lock before giving up, so it
+# never queues ahead of (and blocks) the ingest and pipeline writers
+PURGE_LOCK_TIMEOUT = "2s"
+
+
+def select_app_ids(session: Session) -> List[str]:
+    """
+    Distinct app_ids of the track table, found with a loose index scan over the app_id index.
+    """
+    statement = text("""
+        WITH RECURSIVE apps AS (
+            (SELECT app_id FROM analyticstrackbase ORDER BY app_id LIMIT 1)
+            UNION ALL
+            SELECT (SELECT t.app_id FROM analyticstrackbase t WHERE t.app_id > apps.app_id
+                    ORDER BY t.app_id LIMIT 1)
+            FROM apps WHERE apps.app_id IS NOT NULL
+        )
+        SELECT app_id FROM apps WHERE app_id IS NOT NULL
+    """)
+    return list(session.execute(statement).scalars())
+
+
+def purge_processed_analytics(session: Session, app_id: str, created_before: datetime,
+                              after: Optional[Tuple[datetime, UUID]], limit: int) -> Tuple[int, Optional[Tuple]]:
+    """
+    Delete up to ``limit`` processed rows of one app created before
+    ``created_before``, walking the (app_id, created_at, id) index from the
+    key ``after``, and commit. Unprocessed rows are left alone and rows
+    locked by someone else are skipped.
+
+    Returns:
+        tuple: (rows deleted, key of the last row deleted to continue from, None when the range is done)
+    """
+    session.execute(text(f"SET LOCAL lock_timeout = '{PURGE_LOCK_TIMEOUT}'"))
+    conditions = [
+        AnalyticsTrackBase.app_id == app_id,
+        AnalyticsTrackBase.created_at < created_before,
+        AnalyticsTrackBase.processed_at != None,
+    ]
+    if after is not None:
+        conditions.append(tuple_(AnalyticsTrackBase.created_at, AnalyticsTrackBase.id) > tuple_(*after))
+    chunk = (
+        select(AnalyticsTrackBase.created_at, AnalyticsTrackBase.id)
+        .where(*conditions)
+        .order_by(AnalyticsTrackBase.created_at, AnalyticsTrackBase.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = session.execute(chunk).all()
+    if rows:
+        session.execute(
+            delete(AnalyticsTrackBase)
+            .where(AnalyticsTrackBase.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+    session.commit()
+    if len(rows) < limit:
+        return len(rows), None
+    return len(rows), (rows[-1].created_at, rows[-1].id)
+
+
+def purge_minute_rollups(session: Session, bucket_before: datetime, limit: int) -> int:
+    """
+    Delete up to ``limit`` per-minute rollup rows of buckets before ``bucket_before``,
+    oldest first along the primary key, and commit.
+
+    Returns:
+        int: Rows deleted
+    """
+    session.execute(text(f"SET LOCAL lock_timeout = '{PURGE_LOCK_TIMEOUT}'"))
+    key = tuple_(EventRollupMinute.bucket, EventRollupMinute.app_id,
+                 EventRollupMinute.event_name, EventRollupMinute.outcome)
+    oldest = (
+        select(EventRollupMinute.bucket, EventRollupMinute.app_id,
+               EventRollupMinute.event_name, EventRollupMinute.outcome)
+        .where(EventRollupMinute.bucket < bucket_before)
+        .order_by(EventRollupMinute.bucket)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = session.execute(
+        delete(EventRollupMinute).where(key.in_(oldest)).execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def _purge_oldest(session: Session, table, column, before: datetime, limit: int) -> int:
+    """
+    Delete up to ``limit`` rows of ``table`` whose ``column`` is before ``before``,
+    oldest first along the index on ``column``, and commit.
+    """
+    session.execute(text(f"SET LOCAL lock_timeout = '{PURGE_LOCK_TIMEOUT}'"))
+    oldest = (
+        select(table.id)
+        .where(column < before)
+        .order_by(column)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = session.execute(
+        delete(table).where(table.id.in_(oldest)).execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def purge_pipeline_batches(session: Session, finished_before: datetime, limit: int) -> int:
+    """
+    Delete up to ``limit`` pipeline batch records finished before ``finished_before`` and commit.
+
+    Returns:
+        int: Rows deleted
+    """
+    return _purge_oldest(session, PipelineBatch, PipelineBatch.finished_at, finished_before, limit)
+
+
+def purge_processed_identify_operations(session: Session, processed_before: datetime, limit: int) -> int:
+    """
+    Delete up to ``limit`` identify operations sent before ``processed_before``
+    and commit. Unsent operations are left alone.
+
+    Returns:
+        int: Rows deleted
+    """
+    return _purge_oldest(session, IdentifyOperation, IdentifyOperation.processed_at, processed_before, limit)
+
+
+def select_replication_lag_seconds(session: Session) -> float:
+    """
+    Replay lag of the slowest standby, 0 without standbys or the privilege to see them.
+    """
+    lag = session.execute(
+        text("SELECT EXTRACT(EPOCH FROM MAX(replay_lag)) FROM pg_stat_replication")
+    ).scalar()
+    return float(lag or 0)
+
+
+def select_active_backends(session: Session) -> int:
+    """
+    Backends of this database currently running a statement, besides this one.
+    """
+    return session.execute(
+        text("SELECT count(*) FROM pg_stat_activity "
+             "WHERE datname = current_database() AND state = 'active' AND pid <> pg_backend_pid()")
+    ).scalar()
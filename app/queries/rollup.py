@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.models.rollup import EventRollupHour, EventRollupMinute
+from app.pipeline.rollup import GRANULARITIES, RollupCounts
+
+ROLLUP_TABLES = {"minute": EventRollupMinute, "hour": EventRollupHour}
+
+
+def add_rollup_counts(session: Session, counts: RollupCounts) -> None:
+    """
+    Add a batch's outcome counts to the minute and hour rollups.
+
+    Does not commit, so the counts land in the transaction that acknowledges
+    the rows. Keys are upserted in primary key order, so concurrent batches
+    touching the same buckets wait on each other instead of deadlocking.
+    """
+    for granularity in GRANULARITIES:
+        table = ROLLUP_TABLES[granularity]
+        values = [
+            {"bucket": bucket, "app_id": app_id, "event_name": event_name, "outcome": outcome, "count": count}
+            for (bucket, app_id, event_name, outcome), count in sorted(counts.by_granularity(granularity).items())
+        ]
+        if not values:
+            continue
+        statement = insert(table).values(values)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[table.bucket, table.app_id, table.event_name, table.outcome],
+            set_={"count": table.count + statement.excluded.count},
+        ))
+
+
+def select_rollup_counts(session: Session, granularity: str, start: datetime, end: datetime,
+                         group_by: Sequence[str], filters: Optional[Dict[str, str]] = None,
+                         outcomes: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    Event counts per bucket in ``[start, end)``, summed over the columns not in ``group_by``.
+    Only ``outcomes`` are counted when given.
+    Reads a bucket range of the primary key, so the cost follows the range, not the event volume.
+
+    Returns:
+        list: Dicts with the bucket, the group_by columns and the count, in bucket order
+    """
+    table = ROLLUP_TABLES[granularity]
+    columns = [getattr(table, column) for column in group_by]
+    statement = (
+        select(table.bucket, *columns, func.sum(table.count).label("count"))
+        .where(table.bucket >= start, table.bucket < end)
+        .group_by(table.bucket, *columns)
+        .order_by(table.bucket, *columns)
+    )
+    for column, value in (filters or {}).items():
+        statement = statement.where(getattr(table, column) == value)
+    if outcomes is not None:
+        statement = statement.where(table.outcome.in_(outcomes))
+    return [row._asdict() for row in session.exec(statement)]
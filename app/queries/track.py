@@ -1,10 +1,33 @@
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import DateTime, case, func, literal, or_, text, update
 from sqlmodel import Session, select
 
 from app.core.db import engine
 from app.models.track import AnalyticsTrackBase
+from app.pipeline.records import EventRecord
+
+# Only the columns the dispatch pipeline needs, in EventRecord.from_row order
+RECORD_COLUMNS = (
+    AnalyticsTrackBase.id,
+    AnalyticsTrackBase.event_id,
+    AnalyticsTrackBase.app_id,
+    AnalyticsTrackBase.event_name,
+    AnalyticsTrackBase.event_data,
+    AnalyticsTrackBase.identity,
+    AnalyticsTrackBase.created_at,
+    AnalyticsTrackBase.priority,
+)
+
+
+def _available(now: datetime):
+    return or_(AnalyticsTrackBase.available_at == None, AnalyticsTrackBase.available_at <= now)
 
 
-def select_un_processed_analytics(query_size: int, session: Session = None):
+def select_un_processed_analytics(query_size: int, session: Session = None) -> List[EventRecord]:
     use_default_session = False
 
     if session is None:
@@ -12,10 +35,167 @@ def select_un_processed_analytics(query_size: int, session: Session = None):
         use_default_session = True
 
     try:
-        statement = select(AnalyticsTrackBase).where(AnalyticsTrackBase.processed_at == None).limit(query_size)
+        statement = select(*RECORD_COLUMNS).where(AnalyticsTrackBase.processed_at == None,
+                                                  _available(datetime.utcnow())).limit(query_size)
         results = session.exec(statement)
-        return results.fetchall()
+        return [EventRecord.from_row(row) for row in results]
 
     finally:
         if use_default_session:
             session.close()
+
+
+def select_backlogged_app_ids(session: Session, priority: str) -> List[str]:
+    """
+    Distinct app_ids with unprocessed rows in a lane, found with a loose index scan
+    over the partial per-app index: one index probe per app instead of a backlog scan.
+    """
+    statement = text("""
+        WITH RECURSIVE apps AS (
+            (SELECT app_id FROM analyticstrackbase
+             WHERE processed_at IS NULL AND priority = :priority ORDER BY app_id LIMIT 1)
+            UNION ALL
+            SELECT (SELECT t.app_id FROM analyticstrackbase t
+                    WHERE t.processed_at IS NULL AND t.priority = :priority AND t.app_id > apps.app_id
+                    ORDER BY t.app_id LIMIT 1)
+            FROM apps WHERE apps.app_id IS NOT NULL
+        )
+        SELECT app_id FROM apps WHERE app_id IS NOT NULL
+    """)
+    return list(session.execute(statement, {"priority": priority}).scalars())
+
+
+def claim_un_processed_analytics(session: Session, priority: str, app_id: str, query_size: int,
+                                 lease_until: datetime) -> List[EventRecord]:
+    """
+    Claim up to ``query_size`` of the oldest available rows of one app in one lane.
+
+    Claimed rows get ``available_at = lease_until`` so concurrent workers skip
+    them until they are acknowledged or the lease runs out. Rows locked by
+    another claim in progress are skipped rather than waited on.
+    """
+    now = datetime.utcnow()
+    candidates = (
+        select(AnalyticsTrackBase.id)
+        .where(AnalyticsTrackBase.priority == priority,
+               AnalyticsTrackBase.app_id == app_id,
+               AnalyticsTrackBase.processed_at == None,
+               _available(now))
+        .order_by(AnalyticsTrackBase.created_at)
+        .limit(query_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(AnalyticsTrackBase)
+        .where(AnalyticsTrackBase.id.in_(candidates))
+        .values(available_at=lease_until)
+        .returning(*RECORD_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    rows = session.execute(statement).all()
+    session.commit()
+    return [EventRecord.from_row(row) for row in rows]
+
+
+ACK_CHUNK_SIZE = 1000
+
+
+def mark_analytics_processed(session: Session, ids: Sequence[UUID], processed_at: datetime) -> None:
+    """
+    Acknowledge delivered rows and release their claim lease.
+    Does not commit; the caller commits the whole ack stage at once.
+    """
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        session.execute(
+            update(AnalyticsTrackBase)
+            .where(AnalyticsTrackBase.id.in_(ids[start:start + ACK_CHUNK_SIZE]))
+            .values(processed_at=processed_at, available_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def schedule_analytics_retries(session: Session, ids: Sequence[UUID], error: str, now: datetime,
+                               base_seconds: float, max_seconds: float, max_attempts: int,
+                               give_up: bool = False) -> List[UUID]:
+    """
+    Record a failed delivery attempt and make the rows available again after
+    an exponential backoff with jitter: ``min(base * 2^attempts, max)`` scaled
+    by a random factor between 0.5 and 1, so rows that failed together do not
+    all come back at once. Rows that reach ``max_attempts``, or all rows when
+    ``give_up`` is set (permanent errors), are marked processed instead.
+    Does not commit; the caller commits the whole ack stage at once.
+
+    Returns:
+        list: Ids of the rows given up on
+    """
+    attempts = AnalyticsTrackBase.attempts + 1
+    exhausted = literal(True) if give_up else attempts >= max_attempts
+    delay = func.least(base_seconds * func.power(2, AnalyticsTrackBase.attempts), max_seconds) \
+        * (0.5 + func.random() / 2)
+    retry_at = literal(now, DateTime) + func.make_interval(0, 0, 0, 0, 0, 0, delay)
+
+    given_up = []
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        result = session.execute(
+            update(AnalyticsTrackBase)
+            .where(AnalyticsTrackBase.id.in_(ids[start:start + ACK_CHUNK_SIZE]))
+            .values(
+                attempts=attempts,
+                last_error=error[:255],
+                processed_at=case((exhausted, now), else_=None),
+                available_at=case((exhausted, None), else_=retry_at),
+            )
+            .returning(AnalyticsTrackBase.id, AnalyticsTrackBase.processed_at)
+            .execution_options(synchronize_session=False)
+        )
+        given_up.extend(row_id for row_id, processed_at in result if processed_at is not None)
+    return given_up
+
+
+def estimate_backlog_depth(session: Session) -> int:
+    """
+    Planner estimate of the number of unprocessed rows.
+    Costs one EXPLAIN instead of counting the backlog; accuracy follows the
+    table statistics kept fresh by autovacuum/ANALYZE.
+    """
+    plan = session.execute(
+        text("EXPLAIN (FORMAT JSON) SELECT 1 FROM analyticstrackbase WHERE processed_at IS NULL")
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def select_oldest_unprocessed_created_at(session: Session) -> Optional[datetime]:
+    """
+    Creation time of the oldest unprocessed row, read from the head of the partial unprocessed index.
+    """
+    statement = (
+        select(AnalyticsTrackBase.created_at)
+        .where(AnalyticsTrackBase.processed_at == None)
+        .order_by(AnalyticsTrackBase.created_at)
+        .limit(1)
+    )
+    return session.exec(statement).first()
+
+
+def select_backlog_stats(session: Session) -> Tuple[int, Optional[datetime]]:
+    """
+    Return the estimated number of unprocessed rows and the creation time of the oldest one.
+    """
+    oldest = select_oldest_unprocessed_created_at(session)
+    if oldest is None:
+        return 0, None
+    return estimate_backlog_depth(session), oldest
+
+
+def select_inserted_rows_total(session: Session) -> Optional[int]:
+    """
+    Rows ever inserted into the track table according to the statistics
+    collector; the difference between two readings is the arrival rate.
+    None when the statistics are not available.
+    """
+    return session.execute(
+        text("SELECT n_tup_ins FROM pg_stat_user_tables WHERE relname = 'analyticstrackbase'")
+    ).scalar()
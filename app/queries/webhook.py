@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import List, Sequence
+from uuid import UUID
+
+from sqlalchemy import DateTime, Row, delete, func, insert, literal, update
+from sqlmodel import Session, select
+
+from app.models.track import AnalyticsTrackBase
+from app.models.webhook import WebhookNotification
+from app.queries.track import ACK_CHUNK_SIZE
+
+MAX_URL_LENGTH = 2048
+
+# Returned by claims as plain rows, which outlive the claim's commit unlike ORM instances
+NOTIFICATION_COLUMNS = (
+    WebhookNotification.id,
+    WebhookNotification.url,
+    WebhookNotification.event_id,
+    WebhookNotification.app_id,
+    WebhookNotification.event_name,
+    WebhookNotification.outcome,
+    WebhookNotification.processed_at,
+)
+
+
+def enqueue_webhook_notifications(session: Session, ids: Sequence[UUID], outcome: str,
+                                  processed_at: datetime) -> None:
+    """
+    Copy the rows among ``ids`` that have a callback_webhook into the notification outbox.
+    Reads the URL from event_meta on the database side, so the pipeline never loads it.
+    Does not commit; called from the ack stage's transaction.
+    """
+    url = AnalyticsTrackBase.event_meta["callback_webhook"].as_string()
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        rows = (
+            select(func.gen_random_uuid(), url, AnalyticsTrackBase.event_id, AnalyticsTrackBase.app_id,
+                   AnalyticsTrackBase.event_name, literal(outcome), literal(processed_at, DateTime),
+                   literal(0), literal(processed_at, DateTime))
+            .where(AnalyticsTrackBase.id.in_(ids[start:start + ACK_CHUNK_SIZE]),
+                   url != None,
+                   func.length(url) <= MAX_URL_LENGTH)
+        )
+        session.execute(
+            insert(WebhookNotification).from_select(
+                ["id", "url", "event_id", "app_id", "event_name", "outcome", "processed_at",
+                 "attempts", "available_at"],
+                rows,
+            )
+        )
+
+
+def claim_webhook_notifications(session: Session, limit: int, now: datetime,
+                                lease_until: datetime) -> List[Row]:
+    """
+    Claim up to ``limit`` of the notifications due at ``now``, oldest first, by
+    moving their ``available_at`` to ``lease_until``; concurrent runs skip them
+    until they are sent, backed off or the lease runs out.
+    """
+    candidates = (
+        select(WebhookNotification.id)
+        .where(WebhookNotification.available_at <= now)
+        .order_by(WebhookNotification.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(WebhookNotification)
+        .where(WebhookNotification.id.in_(candidates))
+        .values(available_at=lease_until)
+        .returning(*NOTIFICATION_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    notifications = session.execute(statement).all()
+    session.commit()
+    return notifications
+
+
+def delete_webhook_notifications(session: Session, ids: Sequence[UUID]) -> None:
+    """Remove sent or abandoned notifications. Does not commit."""
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        session.execute(
+            delete(WebhookNotification)
+            .where(WebhookNotification.id.in_(ids[start:start + ACK_CHUNK_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def schedule_webhook_retries(session: Session, ids: Sequence[UUID], error: str, now: datetime,
+                             base_seconds: float, max_seconds: float, max_attempts: int) -> List[UUID]:
+    """
+    Record a failed attempt and make the notifications due again after an
+    exponential backoff with jitter, like ``schedule_analytics_retries``.
+    Notifications that reach ``max_attempts`` are deleted instead.
+    Does not commit.
+
+    Returns:
+        list: Ids of the notifications given up on
+    """
+    delay = func.least(base_seconds * func.power(2, WebhookNotification.attempts), max_seconds) \
+        * (0.5 + func.random() / 2)
+    retry_at = literal(now, DateTime) + func.make_interval(0, 0, 0, 0, 0, 0, delay)
+
+    given_up = []
+    for start in range(0, len(ids), ACK_CHUNK_SIZE):
+        result = session.execute(
+            update(WebhookNotification)
+            .where(WebhookNotification.id.in_(ids[start:start + ACK_CHUNK_SIZE]))
+            .values(attempts=WebhookNotification.attempts + 1, last_error=error[:255], available_at=retry_at)
+            .returning(WebhookNotification.id, WebhookNotification.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        given_up.extend(row_id for row_id, attempts in result if attempts >= max_attempts)
+    delete_webhook_notifications(session, given_up)
+    return given_up
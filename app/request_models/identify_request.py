@@ -0,0 +1,55 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from typing import Any, Dict, List, Optional
+
+from app.pipeline.identify import OPERATIONS
+
+
+class IdentifyOperationIn(BaseModel):
+    user_id: Optional[str] = None
+    device_id: Optional[str] = None
+    user_properties: Dict[str, Dict[str, Any]]
+
+    @field_validator("user_properties")
+    @classmethod
+    def _known_operations(cls, value: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        unknown = set(value) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported operations {sorted(unknown)}, expected any of {list(OPERATIONS)}")
+        if not any(value.values()):
+            raise ValueError("user_properties contains no properties")
+        return value
+
+    @model_validator(mode="after")
+    def _has_identity(self):
+        if not self.user_id and not self.device_id:
+            raise ValueError("Either user_id or device_id is required")
+        return self
+
+
+class IdentifyBatchIn(BaseModel):
+    app_id: str = Field(max_length=10)
+    operations: List[IdentifyOperationIn] = Field(min_length=1, max_length=1000)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "app_id": "esa",
+                "operations": [
+                    {
+                        "user_id": "user-123",
+                        "user_properties": {
+                            "$set": {"plan": "pro"},
+                            "$add": {"screens_viewed": 1}
+                        }
+                    },
+                    {
+                        "device_id": "e3c794c0-6313-48f0-bed2-4dd59b8f12df",
+                        "user_properties": {
+                            "$setOnce": {"first_seen_screen": "home"},
+                            "$append": {"visited_screens": "cart"}
+                        }
+                    }
+                ]
+            }
+        }
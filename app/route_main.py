@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 
-from app.routes import track
+from app.routes import events, identify, stats, track
 
 api_router = APIRouter()
 api_router.include_router(track.router)
+api_router.include_router(identify.router)
+api_router.include_router(stats.router)
+api_router.include_router(events.router)
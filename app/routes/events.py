@@ -0,0 +1,134 @@
+import base64
+import json
+import logging
+import re
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.deps import AsyncSession, naive_utc
+from app.queries.events import EventKey, select_events_page, stream_events
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/analytics", tags=["events"])
+
+# Uncompressed NDJSON collected before it is handed to the compressor
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+
+def encode_cursor(created_at: datetime, event_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> EventKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, event_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(event_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
+def event_to_dict(row) -> dict:
+    event = row._asdict()
+    event["created_at"] = row.created_at.isoformat()
+    event["processed_at"] = row.processed_at.isoformat() if row.processed_at else None
+    return event
+
+
+def gzip_ndjson(rows: Iterable) -> Iterator[bytes]:
+    """
+    Encode rows as NDJSON and gzip them incrementally, buffering at most
+    EXPORT_BUFFER_BYTES of uncompressed output.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    buffer = []
+    buffered = 0
+    exported = 0
+    for row in rows:
+        line = json.dumps(event_to_dict(row), default=str, separators=(",", ":")).encode() + b"\n"
+        buffer.append(line)
+        buffered += len(line)
+        exported += 1
+        if buffered >= EXPORT_BUFFER_BYTES:
+            chunk = compressor.compress(b"".join(buffer))
+            buffer, buffered = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(buffer)) + compressor.flush()
+    logger.info("Exported %d events", exported)
+
+
+def _filters(start: Optional[datetime], end: Optional[datetime], event_name: Optional[str],
+             user_id: Optional[str], device_id: Optional[str]) -> dict:
+    return {
+        "start": naive_utc(start) if start else None,
+        "end": naive_utc(end) if end else None,
+        "event_name": event_name,
+        "user_id": user_id,
+        "device_id": device_id,
+    }
+
+
+@router.get("/events")
+def list_events(session: AsyncSession,
+                app_id: str,
+                start: Optional[datetime] = None,
+                end: Optional[datetime] = None,
+                event_name: Optional[str] = None,
+                user_id: Optional[str] = None,
+                device_id: Optional[str] = None,
+                order: Literal["asc", "desc"] = "desc",
+                limit: int = Query(default=100, ge=1, le=1000),
+                cursor: Optional[str] = None):
+    """
+    Raw events of one app, newest first by default.
+
+    Pages are keyed on (created_at, id): pass ``next_cursor`` from the response
+    as ``cursor`` to get the next page. Every page is a range scan of the
+    (app_id, created_at, id) index, however deep into the results it is.
+    ``user_id`` and ``device_id`` match the Amplitude identity of the event.
+    """
+    rows = select_events_page(
+        session, app_id, limit,
+        after=decode_cursor(cursor) if cursor else None,
+        descending=order == "desc",
+        **_filters(start, end, event_name, user_id, device_id),
+    )
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    return {"events": [event_to_dict(row) for row in rows], "next_cursor": next_cursor}
+
+
+@router.get("/events/export")
+def export_events(app_id: str,
+                  start: Optional[datetime] = None,
+                  end: Optional[datetime] = None,
+                  event_name: Optional[str] = None,
+                  user_id: Optional[str] = None,
+                  device_id: Optional[str] = None,
+                  cursor: Optional[str] = None):
+    """
+    Stream every matching event of one app, oldest first, as gzip-compressed NDJSON.
+
+    Rows are read in chunks through a server-side cursor, each chunk in its
+    own transaction, so the export runs in constant memory however many rows
+    match. ``cursor`` starts the export after an event, as in /events.
+    """
+    rows = stream_events(
+        app_id,
+        after=decode_cursor(cursor) if cursor else None,
+        **_filters(start, end, event_name, user_id, device_id),
+    )
+    safe_app_id = re.sub(r"[^A-Za-z0-9_-]", "", app_id)
+    filename = f"events-{safe_app_id}-{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson.gz"
+    return StreamingResponse(
+        gzip_ndjson(rows),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
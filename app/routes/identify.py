@@ -0,0 +1,49 @@
+import logging
+import time
+from typing import Any
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.metrics import INGEST_INSERT_SIZE, INGEST_LATENCY, INGEST_REQUESTS
+from app.deps import AsyncSession, too_many_requests
+from app.models.identify import IdentifyOperation
+from app.pipeline.backpressure import admit
+from app.request_models.identify_request import IdentifyBatchIn
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/analytics", tags=["identify"])
+
+
+@router.post("/identify")
+async def receive_identify_operations(batch: IdentifyBatchIn, session: AsyncSession) -> Any:
+    """
+    Queue a batch of user-property operations. They are coalesced per user
+    and sent to Amplitude as identify calls by the identify pipeline.
+    The batch counts against the app's ingest rate limit with one token per
+    operation; the analytics backlog does not shed identify operations.
+    """
+    started = time.perf_counter()
+    status = "error"
+    try:
+        rejection = await admit(batch.app_id, None, cost=len(batch.operations))
+        if rejection:
+            status = rejection[0]
+            return too_many_requests(*rejection)
+        session.add_all(
+            IdentifyOperation(
+                app_id=batch.app_id,
+                user_id=operation.user_id,
+                device_id=operation.device_id,
+                user_properties=operation.user_properties,
+            )
+            for operation in batch.operations
+        )
+        session.commit()
+        INGEST_INSERT_SIZE.observe(len(batch.operations))
+        status = "ok"
+        return JSONResponse(content={"status": "queued", "operations": len(batch.operations)}, status_code=202)
+    finally:
+        INGEST_REQUESTS.labels(batch.app_id, status).inc()
+        INGEST_LATENCY.labels(batch.app_id).observe(time.perf_counter() - started)
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.deps import AsyncSession, naive_utc
+from app.pipeline.rollup import FINAL_OUTCOMES, GROUP_BY_COLUMNS, OUTCOMES, bucket_start
+from app.queries.rollup import select_rollup_counts
+
+router = APIRouter(prefix="/analytics", tags=["stats"])
+
+# Ranges up to this long are answered from the minute rollup when no granularity is given
+AUTO_MINUTE_RANGE = timedelta(hours=6)
+# Longest range the minute rollup may be queried for
+MAX_MINUTE_RANGE = timedelta(days=2)
+
+
+@router.get("/stats")
+def get_event_stats(session: AsyncSession,
+                    start: Optional[datetime] = None,
+                    end: Optional[datetime] = None,
+                    granularity: Optional[Literal["minute", "hour"]] = None,
+                    group_by: List[str] = Query(default=["app_id"]),
+                    app_id: Optional[str] = None,
+                    event_name: Optional[str] = None,
+                    outcome: Optional[str] = None):
+    """
+    Event counts per minute or hour from the rollup tables, see app/pipeline/rollup.py.
+
+        GET /analytics/stats?start=2025-06-18T00:00:00Z&granularity=hour&group_by=app_id&group_by=outcome
+
+    ``start`` defaults to 24 hours before ``end``, ``end`` to now, and is
+    floored to its bucket so the first bucket is reported whole. Without
+    ``granularity``, ranges up to 6 hours use minutes and longer ones hours.
+    Buckets are reported by ingest time; counts are summed over the columns
+    not in ``group_by`` (app_id, event_name, outcome). Retried attempts are
+    only counted with ``outcome=retried``, so by default every event is
+    counted once, by its final outcome.
+    """
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+
+    unknown = [column for column in group_by if column not in GROUP_BY_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=422,
+                            detail=f"Cannot group by {unknown}, expected any of {list(GROUP_BY_COLUMNS)}")
+    if outcome is not None and outcome not in OUTCOMES:
+        raise HTTPException(status_code=422, detail=f"Unknown outcome {outcome}, expected one of {list(OUTCOMES)}")
+
+    granularity = granularity or ("minute" if end - start <= AUTO_MINUTE_RANGE else "hour")
+    if granularity == "minute" and end - start > MAX_MINUTE_RANGE:
+        raise HTTPException(status_code=422,
+                            detail=f"Minute buckets are limited to {MAX_MINUTE_RANGE}, use granularity=hour")
+    start = bucket_start(start, granularity)
+
+    group_by = list(dict.fromkeys(group_by))
+    filters = {column: value for column, value in
+               (("app_id", app_id), ("event_name", event_name), ("outcome", outcome)) if value is not None}
+    rows = select_rollup_counts(session, granularity, start, end, group_by, filters,
+                                outcomes=None if outcome is not None else FINAL_OUTCOMES)
+
+    buckets = []
+    total = 0
+    for row in rows:
+        count = int(row["count"])
+        total += count
+        buckets.append({**row, "bucket": row["bucket"].isoformat(), "count": count})
+
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": group_by,
+        "filters": filters,
+        "total": total,
+        "buckets": buckets,
+    }
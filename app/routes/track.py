@@ -1,27 +1,47 @@
 import logging
+import time
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
 
-from app.deps import AsyncSession
+from app.core.config import settings
+from app.core.metrics import INGEST_INSERT_SIZE, INGEST_LATENCY, INGEST_REQUESTS
+from app.core.tracing import SPAN_KIND_SERVER, event_span_id, event_trace_id, span
+from app.deps import AsyncSession, too_many_requests
 from app.models.track import AnalyticsTrackBase
-from app.pipeline.processor import trigger_analytics_processing, process_analytics_batch
+from app.pipeline.backpressure import admit
+from app.pipeline.dispatch import submit_analytics_batch
+from app.pipeline.priority import CRITICAL_LANE, DEFAULT_LANE, LANE_QUEUES, lane_for
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/analytics", tags=["track"])
 
+_last_critical_kick = 0.0
+
+
+def kick_critical_lane():
+    """
+    Drain the critical lane right away instead of waiting for the next beat tick.
+    Debounced per process, so a burst of critical events queues a single batch.
+    """
+    global _last_critical_kick
+    now = time.monotonic()
+    if now - _last_critical_kick < settings.CRITICAL_LANE_KICK_SECONDS:
+        return
+    _last_critical_kick = now
+    try:
+        submit_analytics_batch(CRITICAL_LANE, expires=settings.CRITICAL_LANE_INTERVAL_SECONDS * 2)
+    except Exception as e:
+        logger.warning(f"Failed to queue critical lane batch: {str(e)}")
+
 
 @router.post("/track")
 async def receive_analytics_to_queue(analytics: AnalyticsTrackBase,
-                                     session: AsyncSession) -> Any:
+                                     session: AsyncSession,
+                                     background_tasks: BackgroundTasks) -> Any:
     """"
             {
           "event_id": "072967b0-451e-454e-8023-5366c6fd31c6",
@@ -36,34 +56,69 @@ async def receive_analytics_to_queue(analytics: AnalyticsTrackBase,
               "device_id": "e3c794c0-6313-48f0-bed2-4dd59b8f12df"
             }
           },
-          "metadata": {}
+          "event_meta": {
+            "callback_webhook": "https://hooks.example.com/events"
+          },
+          "priority": "critical"
         }
+
+        "priority" is optional (critical, default or low); without it the lane
+        comes from PRIORITY_EVENTS by event_name. "event_meta.callback_webhook"
+        is optional too; when set, the event's final outcome is POSTed to it
+        (see app/pipeline/webhooks.py).
+
+        Answers 429 with Retry-After when the app is over its rate limit or
+        the event's lane is shed because the backlog is too large.
     """
-    analytics_item = analytics
-    session.add(analytics_item)
-    session.commit()
-    session.refresh(analytics_item)
-    return JSONResponse(content={"status": "all done"}, status_code=200)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        with span("POST /analytics/track",
+                  trace_id=event_trace_id(analytics.event_id),
+                  span_id=event_span_id(analytics.event_id),
+                  kind=SPAN_KIND_SERVER,
+                  attributes={"app_id": analytics.app_id, "event_name": analytics.event_name}):
+            requested = analytics.priority if "priority" in analytics.model_fields_set else None
+            analytics.priority = lane_for(analytics.event_name, requested)
+            rejection = await admit(analytics.app_id, analytics.priority)
+            if rejection:
+                status = rejection[0]
+                return too_many_requests(*rejection)
+            analytics_item = analytics
+            with span("db.insert"):
+                session.add(analytics_item)
+                session.commit()
+                session.refresh(analytics_item)
+            INGEST_INSERT_SIZE.observe(1)
+            if analytics_item.priority == CRITICAL_LANE:
+                background_tasks.add_task(kick_critical_lane)
+            status = "ok"
+            return JSONResponse(content={"status": "all done"}, status_code=200)
+    finally:
+        INGEST_REQUESTS.labels(analytics.app_id, status).inc()
+        INGEST_LATENCY.labels(analytics.app_id).observe(time.perf_counter() - started)
 
 
 @router.post("/analytics/process/")
 async def manual_process_analytics(batch_size: int = 1000):
-    task = trigger_analytics_processing(batch_size=batch_size)
-    return {"task_id": "task.id", "status": "processing"}
+    task_id = submit_analytics_batch(batch_size=batch_size)
+    return {"task_id": task_id, "status": "processing"}
 
 
 @router.post("/api/trigger-analytics")
-async def trigger_analytics(request: Request, batch_size: int = 1000):
+async def trigger_analytics(request: Request, batch_size: int = 1000, lane: str = DEFAULT_LANE):
     """
     Manually trigger analytics processing
     """
+    if lane not in LANE_QUEUES:
+        raise HTTPException(status_code=422, detail=f"Unknown lane {lane}, expected one of {list(LANE_QUEUES)}")
     try:
-        task = process_analytics_batch.delay(batch_size=batch_size)
+        task_id = submit_analytics_batch(lane, batch_size=batch_size)
 
         return {
             "status": "success",
             "message": "Analytics processing triggered",
-            "task_id": task.id
+            "task_id": task_id
         }
 
     except Exception as e:
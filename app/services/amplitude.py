@@ -1,8 +1,45 @@
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Tuple, Union
+import atexit
 import logging
-from amplitude import Amplitude, BaseEvent
-
+import uuid
+from datetime import timezone
+from amplitude import Amplitude, BaseEvent, Config, EventOptions, Identify
+
+from app.core.config import settings
+from app.core.logs import RateLimitedLog
+from app.core.metrics import DESTINATION_REQUEST_SECONDS, DESTINATION_RESPONSES
+from app.core.tracing import SPAN_KIND_CLIENT, span
 from app.models.track import AnalyticsTrackBase
+from app.pipeline.identify import CoalescedIdentify
+from app.pipeline.records import EventRecord, extract_amplitude_ids
+
+# Per-event problems repeat across whole batches; log a sample, not every event
+_event_warnings = RateLimitedLog(logging.getLogger(__name__), interval=60.0, limit=5)
+
+# Responses that will not change on a resend: invalid event, single event too large
+PERMANENT_FAILURE_CODES = frozenset({400, 413})
+
+# Callback messages of events the SDK stopped retrying (its retry cap, a full
+# buffer) or of request-level errors. They carry the code of the whole
+# request, e.g. the 400 that listed other events of the request as invalid or
+# a 413 for a multi-event payload, and say nothing about the event itself.
+RETRYABLE_MESSAGE_PREFIXES = (
+    "Event reached max retry times",
+    "Destination buffer full",
+    "Invalid API key",
+    "Request missing required field",
+)
+
+
+def is_permanent_failure(code: int, message: Optional[str]) -> bool:
+    """
+    Whether resending an event cannot succeed: Amplitude listed it as invalid or
+    silenced in a 400, or it alone was over the size limit in a 413. Events
+    that only shared a request with such an event are retried.
+    """
+    if code not in PERMANENT_FAILURE_CODES:
+        return False
+    return not (message or "").startswith(RETRYABLE_MESSAGE_PREFIXES)
 
 
 class AmplitudeTracker:
@@ -10,33 +47,50 @@ class AmplitudeTracker:
     A simple class for tracking events with the Amplitude Python SDK.
     """
 
-    def __init__(self, user_id: Optional[str] = None, device_id: Optional[str] = None):
+    def __init__(self, user_id: Optional[str] = None, device_id: Optional[str] = None,
+                 insert_id_suffix: str = ""):
         """
         Initialize the AmplitudeTracker.
 
         Args:
             user_id: Optional default user ID for events
             device_id: Optional default device ID for events
+            insert_id_suffix: Appended to every insert_id, so a replay is not
+                deduplicated against the original sends
         """
         # Setup logging
         self.logger = logging.getLogger(__name__)
 
         try:
             # Store API key and configuration
-            self.api_key = 'd68af844f7a681f8f9364981097737fb'
+            self.api_key = settings.AMPLITUDE_API_KEY
             self.user_id = user_id
             self.device_id = device_id
+            self.insert_id_suffix = insert_id_suffix
 
             # Log initialization
             self.logger.info(f"Initializing AmplitudeTracker with API key: {self.api_key[:4]}...")
 
-            # Initialize Amplitude client
-            self.client = Amplitude(self.api_key)
+            # Initialize Amplitude client; its own Config, the SDK's default instance
+            # is shared by every client and would mix up their callbacks
+            self.client = Amplitude(self.api_key, Config())
             self.client.use_batch = True
             self.client.configuration.flush_queue_size = 1000
+            if settings.AMPLITUDE_SERVER_URL:
+                self.client.configuration.server_url = settings.AMPLITUDE_SERVER_URL
 
             # Set timeouts to avoid hanging
             self.client.configuration.connection_timeout = 10.0  # Add reasonable timeout
+            self.flush_timeout = 30.0
+
+            # Per-event outcomes reported by the SDK, keyed by insert_id
+            self.outcomes: Dict[str, Tuple[int, Optional[str]]] = {}
+            self.client.configuration.callback = self._record_response
+            # One attempt per flush: failed events are reported through the callback
+            # right away and retried by the pipeline with backoff, instead of being
+            # re-queued inside this client; see is_permanent_failure for which
+            # of them are given up
+            self.client.configuration.flush_max_retries = 1
 
             if user_id:
                 self.client.configuration.user_id = user_id
@@ -73,7 +127,6 @@ class AmplitudeTracker:
             if not effective_user_id and not effective_device_id:
                 self.logger.warning("Neither user_id nor device_id is set for this event")
                 # Generate a random device_id if needed
-                import uuid
                 effective_device_id = str(uuid.uuid4())
                 self.logger.debug(f"Generated random device_id: {effective_device_id}")
 
@@ -97,12 +150,12 @@ class AmplitudeTracker:
             self.logger.error(f"Exception sending event to Amplitude: {str(e)}", exc_info=True)
             return False
 
-    def track_events(self, events: List[AnalyticsTrackBase]) -> bool:
+    def track_events(self, events: List[EventRecord]) -> bool:
         """
         Track multiple events to Amplitude.
 
         Args:
-            events: List of event dictionaries with event_type and optional properties
+            events: List of EventRecord instances from the dispatch pipeline
 
         Returns:
             bool: True if the events were sent successfully, False otherwise
@@ -111,54 +164,46 @@ class AmplitudeTracker:
             self.logger.warning("No events provided to track_events")
             return False
 
-        self.logger.info(f"Starting to track {len(events)} events")
-
-        # Log sample event for debugging
-        if events:
-            try:
-                sample = events[0]
-                self.logger.debug(f"Sample event: event_name={getattr(sample, 'event_name', None)}, " +
-                                  f"identity={getattr(sample, 'identity', None)}")
-
-                # Check if event_name exists on all events
-                missing_names = sum(1 for e in events if not getattr(e, 'event_name', None))
-                if missing_names:
-                    self.logger.warning(f"{missing_names} events are missing event_name")
-            except Exception as e:
-                self.logger.error(f"Error examining events: {str(e)}")
+        # Logging here runs per batch or per problem event, never per event,
+        # and uses %-style arguments so disabled levels are not formatted
+        self.logger.debug("Starting to track %d events", len(events))
+        self.logger.debug("Sample event: %r user_id=%s device_id=%s",
+                          events[0], events[0].user_id, events[0].device_id)
 
         successful = 0
+        skipped = 0
+        generated_ids = 0
         try:
-            for i, event_data in enumerate(events):
+            for record in events:
                 try:
-                    # Get event type (name)
-                    event_type = getattr(event_data, 'event_name', None)
+                    event_type = record.event_name
                     if not event_type:
-                        self.logger.warning(f"Skipping event at index {i} without event_name")
+                        skipped += 1
+                        self.outcomes[self._insert_id(record)] = (400, "Missing event_name")
+                        _event_warnings.warning("missing-event-name", "Skipping event %s without event_name",
+                                                record.id)
                         continue
 
-                    # Extract user and device IDs
-                    user_id, device_id = self.extract_ids_from_event(event_data)
+                    user_id, device_id = record.user_id, record.device_id
 
                     # Ensure we have at least one ID
                     if not user_id and not device_id:
-                        self.logger.warning(f"Event {i} ({event_type}) has neither user_id nor device_id")
+                        generated_ids += 1
+                        _event_warnings.warning("missing-ids", "Event %s (%s) has neither user_id nor device_id",
+                                                record.id, event_type)
                         # Generate a random device ID as fallback
-                        import uuid
                         device_id = str(uuid.uuid4())
-                        self.logger.debug(f"Generated random device_id for event {i}: {device_id}")
-
-                    # Get event properties safely
-                    event_properties = {}
-                    if hasattr(event_data, 'event_data') and event_data.event_data:
-                        event_properties = event_data.event_data
 
                     # Create the event
                     event = BaseEvent(
                         event_type=event_type,
                         user_id=user_id,
                         device_id=device_id,
-                        event_properties=event_properties
+                        event_properties=record.event_data or {},
+                        # Event time is the ingest time, not the send time
+                        time=int(record.created_at.replace(tzinfo=timezone.utc).timestamp() * 1000),
+                        # Lets Amplitude deduplicate rows that are sent again
+                        insert_id=self._insert_id(record)
                     )
 
                     # Track the event
@@ -167,11 +212,14 @@ class AmplitudeTracker:
 
                 except Exception as event_error:
                     # Log the error but continue processing other events
-                    self.logger.error(f"Error processing event at index {i}: {str(event_error)}")
+                    self.outcomes[self._insert_id(record)] = (0, f"Failed to build event: {event_error}")
+                    _event_warnings.error("event-error", "Error processing event %s: %s", record.id, event_error)
                     continue
 
-            # Log success
-            self.logger.info(f"Successfully tracked {successful}/{len(events)} events")
+            if skipped or generated_ids:
+                self.logger.warning("%d events skipped without event_name, %d sent with a generated device_id",
+                                    skipped, generated_ids)
+            self.logger.info("Successfully tracked %d/%d events", successful, len(events))
             return successful > 0
 
         except Exception as e:
@@ -179,15 +227,15 @@ class AmplitudeTracker:
             return False
 
     @staticmethod
-    def extract_ids_from_event(event: AnalyticsTrackBase):
+    def extract_ids_from_event(event: Union[EventRecord, AnalyticsTrackBase]):
         """
         Extract user_id and device_id from an event.
 
         Returns:
             tuple: (user_id, device_id)
         """
-        # Default return values
-        user_id, device_id = None, None
+        if isinstance(event, EventRecord):
+            return event.user_id, event.device_id
 
         try:
             # Safely get identity data
@@ -203,17 +251,12 @@ class AmplitudeTracker:
                 )
                 return None, None
 
-            # Get amplitude-specific identity info
-            amplitude_info = identity.get('amplitude')
-
-            if amplitude_info and isinstance(amplitude_info, dict):
-                user_id = amplitude_info.get('user_id')
-                device_id = amplitude_info.get('device_id')
+            return extract_amplitude_ids(identity)
 
         except Exception as e:
             logging.getLogger(__name__).error(f"Error extracting IDs: {str(e)}")
 
-        return user_id, device_id
+        return None, None
 
     def identify(self,
                  user_id: Optional[str] = None,
@@ -236,36 +279,11 @@ class AmplitudeTracker:
 
             self.logger.debug(f"Identifying user: user_id={effective_user_id}, device_id={effective_device_id}")
 
-            # Create identify event
-            identify = self.client.identify()
-
-            if effective_user_id:
-                identify.user_id = effective_user_id
-
-            if effective_device_id:
-                identify.device_id = effective_device_id
-
-            # Process operations
-            ops_count = 0
-            for op_type in ["$set", "$setOnce", "$add", "$append", "$prepend"]:
-                if op_type in user_properties:
-                    for key, value in user_properties[op_type].items():
-                        if op_type == "$set":
-                            identify.set(key, value)
-                        elif op_type == "$setOnce":
-                            identify.set_once(key, value)
-                        elif op_type == "$add":
-                            identify.add(key, value)
-                        elif op_type == "$append":
-                            identify.append(key, value)
-                        elif op_type == "$prepend":
-                            identify.prepend(key, value)
-                        ops_count += 1
-
+            identify, ops_count = self._build_identify(user_properties)
             self.logger.debug(f"Applied {ops_count} property operations")
 
             # Send the identify event
-            self.client.identify(identify)
+            self.client.identify(identify, EventOptions(user_id=effective_user_id, device_id=effective_device_id))
             self.logger.info("Identify event sent successfully")
             return True
 
@@ -273,6 +291,58 @@ class AmplitudeTracker:
             self.logger.error(f"Exception sending identify event: {str(e)}", exc_info=True)
             return False
 
+    def identify_batch(self, identifies: List[CoalescedIdentify]) -> int:
+        """
+        Queue coalesced identifies; they are sent in batches with the next flush.
+
+        Args:
+            identifies: Coalesced property operations, one identify each
+
+        Returns:
+            int: Number of identifies queued
+        """
+        queued = 0
+        for identify_ops in identifies:
+            try:
+                identify, _ = self._build_identify(identify_ops.operations)
+                self.client.identify(
+                    identify,
+                    EventOptions(user_id=identify_ops.user_id, device_id=identify_ops.device_id,
+                                 insert_id=identify_ops.insert_id),
+                )
+                queued += 1
+            except Exception as e:
+                self.logger.error(f"Error queueing identify for user_id={identify_ops.user_id}: {str(e)}")
+
+        self.logger.info(f"Queued {queued}/{len(identifies)} identify events")
+        return queued
+
+    @staticmethod
+    def _build_identify(user_properties: Dict[str, Dict[str, Any]]):
+        """
+        Build an SDK Identify from operations keyed by $set, $setOnce, $add, $append and $prepend.
+
+        Returns:
+            tuple: (Identify, number of property operations applied)
+        """
+        identify = Identify()
+        ops_count = 0
+        for op_type in ["$set", "$setOnce", "$add", "$append", "$prepend"]:
+            if op_type in user_properties:
+                for key, value in user_properties[op_type].items():
+                    if op_type == "$set":
+                        identify.set(key, value)
+                    elif op_type == "$setOnce":
+                        identify.set_once(key, value)
+                    elif op_type == "$add":
+                        identify.add(key, value)
+                    elif op_type == "$append":
+                        identify.append(key, value)
+                    elif op_type == "$prepend":
+                        identify.prepend(key, value)
+                    ops_count += 1
+        return identify, ops_count
+
     def flush(self) -> bool:
         """
         Immediately send any queued events to Amplitude servers.
@@ -282,9 +352,72 @@ class AmplitudeTracker:
         """
         try:
             self.logger.info("Flushing events to Amplitude...")
-            result = self.client.flush()
+            with DESTINATION_REQUEST_SECONDS.labels("amplitude").time(), \
+                    span("amplitude.flush", kind=SPAN_KIND_CLIENT):
+                result = self.client.flush()
+                # flush() hands the queued events to the SDK's thread pool,
+                # wait for the requests so the latency covers the HTTP round trip
+                for future in result if isinstance(result, list) else []:
+                    if hasattr(future, "result"):
+                        future.result(timeout=self.flush_timeout)
             self.logger.info(f"Flush completed with result: {result}")
             return True
         except Exception as e:
             self.logger.error(f"Exception flushing events: {str(e)}", exc_info=True)
             return False
+
+    def close(self) -> None:
+        """
+        Shut the client down once its outcomes are collected. Every client runs
+        a consumer thread and a thread pool and is registered with atexit, so
+        a tracker per batch would otherwise leak them for the process lifetime.
+        """
+        try:
+            self.client.shutdown()
+            atexit.unregister(self.client.shutdown)
+        except Exception as e:
+            self.logger.warning(f"Failed to shut down Amplitude client: {str(e)}")
+
+    def _insert_id(self, record: EventRecord) -> str:
+        return f"{record.id}{self.insert_id_suffix}"
+
+    def _record_response(self, event: BaseEvent, code: int, message: Optional[str] = None) -> None:
+        """
+        SDK callback invoked once per event with the destination response code.
+        """
+        DESTINATION_RESPONSES.labels("amplitude", str(code)).inc()
+        if event.insert_id:
+            self.outcomes[event.insert_id] = (code, message)
+
+    def delivery_outcomes(self, records: List[EventRecord]) -> Tuple[List, Dict[Any, Tuple[int, str]]]:
+        """
+        Split tracked records by the outcome the SDK reported for them.
+        Call after ``flush``; records without a reported outcome count as failed.
+
+        Returns:
+            tuple: (ids of delivered records, {id: (code, message)} of failed records)
+        """
+        delivered = []
+        failed = {}
+        for record in records:
+            code, message = self.outcomes.get(self._insert_id(record), (0, "No response from Amplitude"))
+            if code == 200:
+                delivered.append(record.id)
+            else:
+                failed[record.id] = (code, message or "Unknown error")
+        return delivered, failed
+
+    def identify_outcomes(self, identifies: List[CoalescedIdentify]) -> Dict[str, Tuple[int, str]]:
+        """
+        Identifies the SDK did not report as delivered. Call after ``flush``;
+        identifies without a reported outcome count as failed.
+
+        Returns:
+            dict: {insert_id: (code, message)} of failed identifies
+        """
+        failed = {}
+        for identify in identifies:
+            code, message = self.outcomes.get(identify.insert_id, (0, "No response from Amplitude"))
+            if code != 200:
+                failed[identify.insert_id] = (code, message or "Unknown error")
+        return failed
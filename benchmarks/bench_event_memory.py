@@ -0,0 +1,90 @@
+"""
+Memory benchmark: bytes per event held by the dispatch pipeline between the
+DB fetch and the HTTP send.
+
+"before" materializes every row as an ``AnalyticsTrackBase`` ORM object,
+"after" materializes the same rows as compact ``EventRecord`` instances.
+Both variants hold their own copy of the event properties, so the difference
+is the per-event container overhead.
+
+Usage:
+    python -m benchmarks.bench_event_memory [--events 100000]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.models.track import AnalyticsTrackBase
+from app.pipeline.records import EventRecord
+
+EVENT_NAMES = ("cart_add", "page_view", "scroll", "purchase", "signup")
+APP_IDS = ("esa", "intellipet", "shop")
+
+
+def synthetic_rows(count: int):
+    """Yield rows in the column order used by select_un_processed_analytics."""
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        # Copy the strings so every row owns its own object, as the DB driver does
+        yield (
+            uuid4(),
+            uuid4(),
+            "".join(APP_IDS[i % len(APP_IDS)]),
+            "".join(EVENT_NAMES[i % len(EVENT_NAMES)]),
+            {"cart_id": i, "account_id": 23456789, "product_price": 129.99},
+            {"amplitude": {"device_id": str(uuid4()), "user_id": f"user-{i % 5000}"}},
+            start + timedelta(milliseconds=i),
+            "default",
+        )
+
+
+def build_orm(rows):
+    return [
+        AnalyticsTrackBase(
+            id=id, event_id=event_id, app_id=app_id, event_name=event_name,
+            event_data=event_data, identity=identity, created_at=created_at, priority=priority,
+        )
+        for id, event_id, app_id, event_name, event_data, identity, created_at, priority in rows
+    ]
+
+
+def build_records(rows):
+    return [EventRecord.from_row(row) for row in rows]
+
+
+def measure(builder, count: int) -> int:
+    """Return the bytes retained by a batch of ``count`` events built by ``builder``."""
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    batch = builder(synthetic_rows(count))
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(batch) == count
+    del batch
+    return current - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per event for a pipeline batch")
+    parser.add_argument("--events", type=int, default=100_000, help="Number of events in the batch")
+    args = parser.parse_args()
+
+    before = measure(build_orm, args.events)
+    after = measure(build_records, args.events)
+
+    print(json.dumps({
+        "benchmark": "event_memory",
+        "events": args.events,
+        "before_bytes_per_event": round(before / args.events, 1),
+        "after_bytes_per_event": round(after / args.events, 1),
+        "reduction": round(1 - after / before, 3) if before else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cold start benchmark: time until a fresh ingest process can take traffic.
+
+"import" measures ``import main`` (the FastAPI app with all routes) in a new
+interpreter, repeated to get a stable median, and lists which heavy modules
+the import pulled in; the ingest API should not load Celery, redis or the
+Amplitude SDK. "serve" starts uvicorn and measures the time until /health
+answers, which also includes the lifespan startup (and needs the database).
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 10] [--serve] [--max-import-seconds 1.5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Modules the ingest API must not import at startup
+HEAVY_MODULES = ("celery", "kombu", "redis", "amplitude")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "modules": len(sys.modules),
+    "heavy": sorted({name.split(".")[0] for name in sys.modules} & set(%r)),
+}))
+"""
+
+
+def measure_import(runs: int, env) -> dict:
+    samples = []
+    probe = _IMPORT_PROBE % (HEAVY_MODULES,)
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=env, check=True)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    seconds = [s["seconds"] for s in samples]
+    return {
+        "runs": runs,
+        "median_seconds": round(statistics.median(seconds), 4),
+        "min_seconds": round(min(seconds), 4),
+        "modules_loaded": samples[-1]["modules"],
+        "heavy_modules_loaded": samples[-1]["heavy"],
+    }
+
+
+def measure_serve(port: int, env, timeout: float = 60.0) -> dict:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200:
+                    return {"seconds_to_healthy": round(time.perf_counter() - started, 3)}
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f"API did not become healthy within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest API cold start time")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to time the import in")
+    parser.add_argument("--serve", action="store_true", help="Also time uvicorn start until /health answers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-import-seconds", type=float, default=None,
+                        help="Exit 1 if the median import time exceeds this")
+    args = parser.parse_args()
+
+    # Measure the ingest role on its own
+    env = {**os.environ, "CELERY_AUTOSTART": "false"}
+    results = {"benchmark": "startup", "import": measure_import(args.runs, env)}
+    if args.serve:
+        results["serve"] = measure_serve(args.port, env)
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    if results["import"]["heavy_modules_loaded"]:
+        failures.append(f"heavy modules imported at startup: {results['import']['heavy_modules_loaded']}")
+    if args.max_import_seconds is not None and results["import"]["median_seconds"] > args.max_import_seconds:
+        failures.append(f"median import {results['import']['median_seconds']}s > {args.max_import_seconds}s")
+    if failures:
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
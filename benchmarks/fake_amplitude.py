@@ -0,0 +1,179 @@
+"""
+Local stand-in for the Amplitude HTTP API.
+
+Accepts the SDK's batch and httpapi uploads, answers with configurable
+latency, 5xx error rate and 429 throttling, and records every received
+event so the driver can compute dispatch throughput and end-to-end lag.
+
+Usage:
+    python -m benchmarks.fake_amplitude --port 9010 --latency-ms 50 --error-rate 0.01 --throttle-rate 0.02
+
+GET /stats returns the receive statistics, POST /reset clears them.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from benchmarks.stats import percentiles
+
+
+class FakeAmplitudeState:
+    """Receive statistics shared by all request handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.responses = {}
+            self.events_total = 0
+            self.insert_ids = set()
+            self.lags = []
+            self.first_event_at = None
+            self.last_event_at = None
+
+    def record_response(self, code: int):
+        with self.lock:
+            self.requests += 1
+            self.responses[code] = self.responses.get(code, 0) + 1
+
+    def record_events(self, events):
+        now = time.time()
+        with self.lock:
+            self.first_event_at = self.first_event_at or now
+            self.last_event_at = now
+            for event in events:
+                self.events_total += 1
+                insert_id = event.get("insert_id")
+                if insert_id is not None:
+                    if insert_id in self.insert_ids:
+                        continue
+                    self.insert_ids.add(insert_id)
+                if event.get("time"):
+                    self.lags.append(now - event["time"] / 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            unique = len(self.insert_ids) if self.insert_ids else self.events_total
+            elapsed = (self.last_event_at - self.first_event_at) if self.first_event_at else 0
+            return {
+                "requests": self.requests,
+                "responses": {str(code): count for code, count in self.responses.items()},
+                "events_total": self.events_total,
+                "events_unique": unique,
+                "events_duplicate": self.events_total - unique,
+                "first_event_at": self.first_event_at,
+                "last_event_at": self.last_event_at,
+                "events_per_second": round(unique / elapsed, 2) if elapsed > 0 else None,
+                "e2e_lag_seconds": percentiles(self.lags),
+            }
+
+
+def make_handler(state: FakeAmplitudeState, latency_ms: float, jitter_ms: float,
+                 error_rate: float, throttle_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, code: int, body: Dict[str, Any], headers: Dict[str, str] = None):
+            payload = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, state.stats())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == "/reset":
+                state.reset()
+                self._reply(200, {"status": "reset"})
+                return
+
+            delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+            roll = random.random()
+            if roll < throttle_rate:
+                state.record_response(429)
+                self._reply(429, {"code": 429, "error": "Too many requests for some devices and users"},
+                            {"Retry-After": "1"})
+                return
+            if roll < throttle_rate + error_rate:
+                state.record_response(500)
+                self._reply(500, {"code": 500, "error": "Internal server error"})
+                return
+
+            try:
+                events = json.loads(body).get("events", [])
+            except ValueError:
+                state.record_response(400)
+                self._reply(400, {"code": 400, "error": "Invalid JSON request body"})
+                return
+
+            state.record_events(events)
+            state.record_response(200)
+            self._reply(200, {
+                "code": 200,
+                "events_ingested": len(events),
+                "payload_size_bytes": len(body),
+                "server_upload_time": int(time.time() * 1000),
+            })
+
+    return Handler
+
+
+def start_fake_amplitude(port: int = 9010, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                         error_rate: float = 0.0, throttle_rate: float = 0.0):
+    """
+    Start the fake server in a daemon thread.
+
+    Returns:
+        tuple: (server, state)
+    """
+    state = FakeAmplitudeState()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port),
+        make_handler(state, latency_ms, jitter_ms, error_rate, throttle_rate),
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-amplitude", daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Amplitude HTTP API")
+    parser.add_argument("--port", type=int, default=9010)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    server, _ = start_fake_amplitude(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)
+    print(f"Fake Amplitude listening on http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
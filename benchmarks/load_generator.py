@@ -0,0 +1,107 @@
+"""
+Async load generator for the ingest API.
+
+Posts synthetic events to /analytics/track (or any ingest path taking the
+same payload) with a fixed number of concurrent clients and reports
+request rate and latency percentiles as JSON.
+
+Usage:
+    python -m benchmarks.load_generator --base-url http://127.0.0.1:8000 --concurrency 50 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+from uuid import uuid4
+
+import httpx
+
+from benchmarks.stats import percentiles
+
+TRACK_PATH = "/app/v1/analytics/track"
+EVENT_NAMES = ("cart_add", "page_view", "scroll", "heartbeat", "purchase", "signup")
+APP_IDS = ("esa", "intellipet", "shop")
+
+
+def synthetic_event() -> Dict[str, Any]:
+    return {
+        "event_id": str(uuid4()),
+        "app_id": random.choice(APP_IDS),
+        "event_name": random.choice(EVENT_NAMES),
+        "event_data": {"cart_id": random.randint(1, 10_000), "product_price": 129.99},
+        "identity": {"amplitude": {"device_id": str(uuid4()), "user_id": f"user-{random.randint(1, 5000)}"}},
+        "event_meta": {"sdk_version": "1.2.3"},
+    }
+
+
+async def _client_loop(client: httpx.AsyncClient, path: str, deadline: float,
+                       remaining: List[int], latencies: List[float], statuses: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        if remaining[0] <= 0:
+            return
+        remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=synthetic_event())
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def run_load(base_url: str, path: str = TRACK_PATH, concurrency: int = 50,
+                   duration: float = 30.0, max_requests: int = 0) -> Dict[str, Any]:
+    """
+    Drive the ingest API and return the measured results.
+
+    Args:
+        base_url: API base URL
+        path: Ingest path
+        concurrency: Number of concurrent clients
+        duration: Maximum run time in seconds
+        max_requests: Stop after this many requests, 0 for no limit
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = [max_requests or float("inf")]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _client_loop(client, path, deadline, remaining, latencies, statuses)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "accepted": statuses.get("200", 0),
+        "statuses": statuses,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_seconds": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async load generator for the ingest API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default=TRACK_PATH)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.base_url, args.path, args.concurrency, args.duration, args.requests))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
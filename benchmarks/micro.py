@@ -0,0 +1,227 @@
+"""
+Microbenchmarks for the per-event hot paths, gated against a stored baseline.
+
+Each case is timed on synthetic 1k, 10k and 100k event batches and reported
+as nanoseconds per event. Results are also divided by a fixed pure-Python
+calibration loop so a baseline recorded on one machine remains comparable
+on another; the gate compares these normalized costs.
+
+Usage:
+    python -m benchmarks.micro --update-baseline   # record benchmarks/baselines/micro.json
+    python -m benchmarks.micro --check             # exit 1 if any case regressed
+
+Without a recorded baseline --check exits 2, unless --allow-missing-baseline is given.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models.track import AnalyticsTrackBase
+from app.pipeline.records import EventRecord
+from app.queries.track import select_un_processed_analytics
+from app.services.amplitude import AmplitudeTracker
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_TOLERANCE = 1.5
+
+EVENT_NAMES = ("cart_add", "page_view", "scroll", "heartbeat", "purchase")
+APP_IDS = ("esa", "intellipet", "shop")
+
+
+def synthetic_payloads(count: int) -> List[dict]:
+    return [
+        {
+            "event_id": str(uuid4()),
+            "app_id": APP_IDS[i % len(APP_IDS)],
+            "event_name": EVENT_NAMES[i % len(EVENT_NAMES)],
+            "event_data": {"cart_id": i, "account_id": 23456789, "product_price": 129.99},
+            "identity": {"amplitude": {"device_id": str(uuid4()), "user_id": f"user-{i % 5000}"}},
+            "event_meta": {"sdk_version": "1.2.3"},
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_records(count: int) -> List[EventRecord]:
+    start = datetime(2025, 1, 1)
+    return [
+        EventRecord.from_row((
+            uuid4(), uuid4(), p["app_id"], p["event_name"], p["event_data"], p["identity"],
+            start + timedelta(milliseconds=i), "default",
+        ))
+        for i, p in enumerate(synthetic_payloads(count))
+    ]
+
+
+class _DiscardClient:
+    """Stands in for the SDK client so only the conversion cost is measured."""
+
+    def track(self, event):
+        pass
+
+
+def _calibrate() -> float:
+    """Nanoseconds for a fixed amount of interpreter work, best of five."""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter_ns()
+        total = 0
+        for i in range(200_000):
+            total += i % 7
+        best = min(best, time.perf_counter_ns() - started)
+    return best
+
+
+def _best_of(func: Callable[[], object], repeats: int) -> int:
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter_ns()
+        func()
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def case_track_events(count: int) -> Callable[[], object]:
+    tracker = AmplitudeTracker()
+    tracker.close()
+    tracker.client = _DiscardClient()
+    records = synthetic_records(count)
+    return lambda: tracker.track_events(records)
+
+
+def case_extract_ids(count: int) -> Callable[[], object]:
+    events = [AnalyticsTrackBase.model_validate(p) for p in synthetic_payloads(count)]
+    extract = AmplitudeTracker.extract_ids_from_event
+    return lambda: [extract(e) for e in events]
+
+
+def case_model_validation(count: int) -> Callable[[], object]:
+    payloads = synthetic_payloads(count)
+    validate = AnalyticsTrackBase.model_validate
+    return lambda: [validate(p) for p in payloads]
+
+
+def case_json_decode(count: int) -> Callable[[], object]:
+    bodies = [json.dumps(p).encode() for p in synthetic_payloads(count)]
+    return lambda: [json.loads(b) for b in bodies]
+
+
+def case_row_materialization(count: int) -> Callable[[], object]:
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[AnalyticsTrackBase.__table__])
+    with Session(engine) as session:
+        session.add_all(AnalyticsTrackBase.model_validate(p) for p in synthetic_payloads(count))
+        session.commit()
+    session = Session(engine)
+
+    def run():
+        rows = select_un_processed_analytics(query_size=count, session=session)
+        session.rollback()
+        return rows
+
+    return run
+
+
+CASES: Dict[str, Callable[[int], Callable[[], object]]] = {
+    "track_events": case_track_events,
+    "extract_ids_from_event": case_extract_ids,
+    "model_validation": case_model_validation,
+    "json_decode": case_json_decode,
+    "row_materialization": case_row_materialization,
+}
+
+
+def run_cases(sizes, repeats: int, only=None) -> Dict[str, Dict[str, float]]:
+    calibration_ns = _calibrate()
+    results = {"_calibration_ns": calibration_ns}
+    for name, factory in CASES.items():
+        if only and name not in only:
+            continue
+        results[name] = {}
+        for size in sizes:
+            run = factory(size)
+            run()  # warm up
+            ns_per_event = _best_of(run, repeats) / size
+            results[name][str(size)] = {
+                "ns_per_event": round(ns_per_event, 1),
+                "normalized": round(ns_per_event / calibration_ns * 1e6, 3),
+            }
+            print(f"{name:>24} {size:>7}: {ns_per_event:10.1f} ns/event", file=sys.stderr)
+    return results
+
+
+def check_against_baseline(results, baseline, tolerance: float) -> List[str]:
+    """
+    Return a message for each case/size whose normalized cost exceeds baseline * tolerance.
+    """
+    regressions = []
+    for name, sizes in results.items():
+        if name.startswith("_"):
+            continue
+        for size, measured in sizes.items():
+            expected = baseline.get(name, {}).get(size)
+            if not expected:
+                continue
+            ratio = measured["normalized"] / expected["normalized"]
+            if ratio > tolerance:
+                regressions.append(
+                    f"{name}[{size}]: {ratio:.2f}x baseline "
+                    f"({measured['ns_per_event']} ns/event vs {expected['ns_per_event']} ns/event recorded)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-event hot path microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="Run only these cases")
+    parser.add_argument("--check", action="store_true", help="Fail if a case regressed against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown factor before --check fails")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Let --check pass without a recorded baseline instead of failing")
+    args = parser.parse_args()
+
+    results = run_cases(args.sizes, args.repeats, args.case)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}. Record one on the reference machine with "
+                  f"`python -m benchmarks.micro --update-baseline` and commit it.", file=sys.stderr)
+            if args.allow_missing_baseline:
+                return
+            sys.exit(2)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = check_against_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("PER-EVENT COST REGRESSION:", file=sys.stderr)
+            for message in regressions:
+                print(f"  {message}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
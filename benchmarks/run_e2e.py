@@ -0,0 +1,173 @@
+"""
+End-to-end benchmark: ingest API -> Postgres -> Celery pipeline -> fake Amplitude.
+
+Starts the fake Amplitude server, the API (with Celery autostart disabled)
+and a Celery worker, drives the ingest API with the load generator while
+triggering drain tasks, then waits until every accepted event reached the
+fake destination. Requires Postgres and Redis as configured for the app.
+
+Results are written as JSON so runs can be compared between releases.
+
+Usage:
+    python -m benchmarks.run_e2e --duration 30 --concurrency 50 --latency-ms 50 --output bench_output.txt
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict
+
+import httpx
+
+from app.pipeline.priority import worker_queues
+from benchmarks.fake_amplitude import start_fake_amplitude
+from benchmarks.load_generator import TRACK_PATH, run_load
+
+TRIGGER_PATH = "/app/v1/analytics/api/trigger-analytics"
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _wait_for_api(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"API at {base_url} did not become healthy within {timeout}s")
+
+
+def _drain_loop(base_url: str, batch_size: int, interval: float, stop: threading.Event):
+    with httpx.Client(base_url=base_url, timeout=10.0) as client:
+        while not stop.is_set():
+            try:
+                client.post(TRIGGER_PATH, params={"batch_size": batch_size})
+            except httpx.HTTPError:
+                pass
+            stop.wait(interval)
+
+
+def run(args) -> Dict[str, Any]:
+    fake_server, fake_state = start_fake_amplitude(
+        args.fake_port, args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate
+    )
+    base_url = f"http://127.0.0.1:{args.api_port}"
+
+    env = os.environ.copy()
+    env["AMPLITUDE_SERVER_URL"] = f"http://127.0.0.1:{args.fake_port}/batch"
+    env["CELERY_AUTOSTART"] = "false"
+
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.api_port),
+         "--workers", str(args.api_workers), "--log-level", "warning"],
+        env=env,
+    )
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "celery", "-A", "app.pipeline.processor.celery_app", "worker",
+         "-c", str(args.worker_concurrency), "-Q", worker_queues(),
+         "--loglevel=WARNING", "--without-mingle", "--without-gossip"],
+        env=env,
+    )
+    stop_draining = threading.Event()
+    try:
+        _wait_for_api(base_url)
+        fake_state.reset()
+
+        drainer = threading.Thread(
+            target=_drain_loop,
+            args=(base_url, args.batch_size, args.drain_interval, stop_draining),
+            daemon=True,
+        )
+        drainer.start()
+
+        ingest = asyncio.run(run_load(base_url, TRACK_PATH, args.concurrency, args.duration, args.requests))
+        ingest_finished_at = time.time()
+
+        # Keep draining until everything accepted has reached the destination
+        deadline = time.monotonic() + args.drain_timeout
+        while time.monotonic() < deadline and fake_state.stats()["events_unique"] < ingest["accepted"]:
+            time.sleep(0.5)
+        stop_draining.set()
+
+        dispatch = fake_state.stats()
+        return {
+            "benchmark": "e2e",
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "config": {
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "api_workers": args.api_workers,
+                "worker_concurrency": args.worker_concurrency,
+                "batch_size": args.batch_size,
+                "drain_interval": args.drain_interval,
+                "latency_ms": args.latency_ms,
+                "error_rate": args.error_rate,
+                "throttle_rate": args.throttle_rate,
+            },
+            "ingest": ingest,
+            "dispatch": {
+                "events_delivered": dispatch["events_unique"],
+                "events_duplicate": dispatch["events_duplicate"],
+                "events_per_second": dispatch["events_per_second"],
+                "requests": dispatch["requests"],
+                "responses": dispatch["responses"],
+                "complete": dispatch["events_unique"] >= ingest["accepted"],
+                "drain_seconds_after_ingest": round(dispatch["last_event_at"] - ingest_finished_at, 3)
+                if dispatch["last_event_at"] else None,
+            },
+            "e2e_lag_seconds": dispatch["e2e_lag_seconds"],
+        }
+    finally:
+        stop_draining.set()
+        for process in (worker, api):
+            process.terminate()
+        for process in (worker, api):
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        fake_server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingest and dispatch benchmark")
+    parser.add_argument("--api-port", type=int, default=8077)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--fake-port", type=int, default=9010)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--requests", type=int, default=0, help="Stop ingest after this many requests")
+    parser.add_argument("--worker-concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drain-interval", type=float, default=1.0, help="Seconds between drain triggers")
+    parser.add_argument("--drain-timeout", type=float, default=300.0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="Write the JSON result to this file")
+    args = parser.parse_args()
+
+    result = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Shared helpers for benchmark reporting.
+"""
+from typing import Dict, Sequence
+
+
+def percentiles(values: Sequence[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, float]:
+    """
+    Nearest-rank percentiles of ``values``, keyed as 'p50', 'p95', ...
+    """
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f"p{p}": round(ordered[min(last, int(round(p / 100 * last)))], 6) for p in points}
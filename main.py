@@ -3,27 +3,30 @@ import os
 import subprocess
 import threading
 import time
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.route_main import api_router
+from app.core.broker import broker_status
+from app.core.compression import DecompressionMiddleware
 from app.core.config import settings
 from app.core.db import engine, init_db
+from app.core.logs import configure_logging, shutdown_logging
+from app.core.logtail import follow_lines, line_filter, tail_lines
+from app.core.metrics import render_metrics
+from app.pipeline.backpressure import load_shedder
+from app.pipeline.health import pipeline_health
+from app.pipeline.priority import worker_queues
 
 # Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json",
-)
-
-app.include_router(api_router, prefix=settings.API_V1_STR)
-
 worker_process = None
 beat_process = None
 
@@ -31,24 +34,19 @@ beat_process = None
 # Create a function to stream process output to logger
 def log_stream(stream, prefix, log_level=logging.INFO):
     """Stream subprocess output to logger."""
+    # Celery writes its own records to --logfile with their levels; only stray
+    # stdout/stderr output arrives here, logged at the stream's level
     for line in iter(stream.readline, ''):
         if not line:
             break
-        line = line.rstrip()
-        if "ERROR" in line or "Error" in line or "error" in line:
-            logger.error(f"{prefix}: {line}")
-        elif "WARNING" in line or "Warning" in line or "warning" in line:
-            logger.warning(f"{prefix}: {line}")
-        else:
-            logger.log(log_level, f"{prefix}: {line}")
+        logger.log(log_level, "%s: %s", prefix, line.rstrip())
 
 
 def start_celery_worker():
     global worker_process
     env = os.environ.copy()
 
-    # Set log level to DEBUG for more detailed information
-    env["LOGLEVEL"] = "DEBUG"
+    env["LOGLEVEL"] = settings.LOG_LEVEL
 
     # Start Celery worker process with file logging
     log_dir = os.path.join(os.getcwd(), "logs")
@@ -56,15 +54,22 @@ def start_celery_worker():
 
     worker_log_file = os.path.join(log_dir, "celery_worker.log")
 
+    command = [
+        "celery", "-A", "app.pipeline.celery_app.celery_app", "worker",
+        f"--loglevel={settings.LOG_LEVEL}",
+        # Task queue, one queue per priority lane (critical first) and webhook notifications
+        "-Q", worker_queues(),
+        "--logfile", worker_log_file  # Save logs to file
+    ]
+    if settings.AUTOSCALE_RESIZE_POOL:
+        # Pool bounds the autoscale controller resizes within
+        command.append(f"--autoscale={settings.AUTOSCALE_MAX_TASKS + settings.AUTOSCALE_POOL_RESERVE},"
+                       f"{settings.AUTOSCALE_POOL_RESERVE}")
+
     try:
         # Start with redirected output
         worker_process = subprocess.Popen(
-            [
-                "celery", "-A", "app.pipeline.celery_app.celery_app", "worker",
-                "--loglevel=DEBUG",  # Set to DEBUG for maximum info
-                "-l", "DEBUG",
-                "--logfile", worker_log_file  # Save logs to file
-            ],
+            command,
             env=env,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -108,7 +113,7 @@ def start_celery_beat():
         beat_process = subprocess.Popen(
             [
                 "celery", "-A", "app.pipeline.celery_app.celery_app", "beat",
-                "--loglevel=DEBUG",
+                f"--loglevel={settings.LOG_LEVEL}",
                 "--logfile", beat_log_file  # Save logs to file
             ],
             env=env,
@@ -139,11 +144,10 @@ def start_celery_beat():
         logger.error(f"Error starting celery beat: {err}")
 
 
-@app.on_event("startup")
-def on_startup():
-    # Create a session to pass to init_db
-    with Session(engine) as session:
-        init_db(session)
+def start_celery():
+    if not settings.CELERY_AUTOSTART:
+        logger.info("Celery autostart disabled, not starting worker and beat")
+        return
 
     # Start Celery worker in a separate thread
     worker_thread = threading.Thread(target=start_celery_worker)
@@ -158,6 +162,50 @@ def on_startup():
     logger.info("Celery worker and beat scheduler started")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create a session to pass to init_db
+    with Session(engine) as session:
+        init_db(session)
+
+    if settings.PIPELINE_MODE == "embedded":
+        # Loads the pipeline and destination SDK only in the mode that runs them
+        from app.pipeline.embedded import embedded_dispatcher
+
+        await embedded_dispatcher.start()
+    else:
+        broker_status.schedule_check()
+        start_celery()
+
+    yield
+
+    if settings.PIPELINE_MODE == "embedded":
+        await embedded_dispatcher.stop()
+    shutdown_logging()
+
+
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
+)
+
+app.add_middleware(
+    DecompressionMiddleware,
+    path_prefix=f"{settings.API_V1_STR}/analytics",
+    max_body_bytes=settings.INGEST_MAX_BODY_BYTES,
+)
+app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+def embedded_status():
+    if settings.PIPELINE_MODE != "embedded":
+        return None
+    from app.pipeline.embedded import embedded_dispatcher
+
+    return embedded_dispatcher.status()
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -170,10 +218,18 @@ async def health_check():
     worker_log = os.path.join(log_dir, "celery_worker.log")
     beat_log = os.path.join(log_dir, "celery_beat.log")
 
+    # Backlog and lag figures, cached so frequent probes stay cheap
+    pipeline = await run_in_threadpool(pipeline_health.snapshot)
+
     return {
         "status": "healthy",
+        "pipeline_mode": settings.PIPELINE_MODE,
         "celery_worker": worker_status,
         "celery_beat": beat_status,
+        "broker": broker_status.snapshot() if settings.PIPELINE_MODE == "celery" else None,
+        "embedded_dispatcher": embedded_status(),
+        "ingest_shedding": load_shedder.status(),
+        "pipeline": pipeline,
         "log_files": {
             "worker_log": worker_log if os.path.exists(worker_log) else None,
             "beat_log": beat_log if os.path.exists(beat_log) else None
@@ -181,10 +237,28 @@ async def health_check():
     }
 
 
+# Prometheus scrape endpoint, aggregates worker processes in multiprocess mode
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Add a route to view recent logs
 @app.get("/logs/{log_type}")
-async def get_logs(log_type: str, lines: int = 100):
-    """Endpoint to view the last N lines of logs."""
+async def get_logs(request: Request,
+                   log_type: str,
+                   lines: int = Query(100, ge=0, le=10000),
+                   level: Optional[str] = None,
+                   contains: Optional[str] = None,
+                   follow: bool = False):
+    """
+    Endpoint to view the last N lines of logs.
+
+    ``level`` keeps lines at or above a level, ``contains`` keeps lines with a
+    substring. With ``follow=true`` the response is a server-sent event stream
+    of the last N lines followed by new lines as they are written.
+    """
     log_dir = os.path.join(os.getcwd(), "logs")
 
     if log_type == "worker":
@@ -198,13 +272,26 @@ async def get_logs(log_type: str, lines: int = 100):
         return {"error": f"Log file {log_file} does not exist"}
 
     try:
-        # Use tail-like functionality to get last N lines
-        result = subprocess.run(
-            ["tail", "-n", str(lines), log_file],
-            capture_output=True,
-            text=True
-        )
-        log_content = result.stdout
-        return {"content": log_content}
+        predicate = line_filter(level, contains)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    try:
+        recent = await run_in_threadpool(tail_lines, log_file, lines, predicate)
     except Exception as e:
         return {"error": f"Failed to read log file: {str(e)}"}
+
+    if not follow:
+        return {"content": "".join(line + "\n" for line in recent)}
+
+    async def event_stream():
+        for line in recent:
+            yield f"data: {line}\n\n"
+        async for line in follow_lines(log_file, predicate):
+            if await request.is_disconnected():
+                break
+            # Comment lines keep idle connections alive
+            yield ": keepalive\n\n" if line is None else f"data: {line}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,79 @@
+import argparse
+import json
+import logging
+from datetime import datetime
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.logs import configure_logging, shutdown_logging
+from app.deps import naive_utc
+from app.pipeline.replay import DESTINATIONS, create_replay_job, replay_status, run_replay
+
+
+def timestamp(value: str) -> datetime:
+    return naive_utc(datetime.fromisoformat(value))
+
+
+def create_arg_parser():
+    parser = argparse.ArgumentParser(description='Resend a time range of events to a destination')
+    parser.add_argument('--loglevel', default=settings.LOG_LEVEL, help='Logging level to use')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start = commands.add_parser('start', help='Create a replay job and run it')
+    start.add_argument('--destination', choices=sorted(DESTINATIONS), default='amplitude')
+    start.add_argument('--app-id', dest='app_ids', action='append', required=True,
+                       help='App to replay, repeat for several apps')
+    start.add_argument('--start', type=timestamp, required=True, help='Start of the ingest time range, ISO 8601')
+    start.add_argument('--end', type=timestamp, required=True, help='End of the ingest time range (exclusive)')
+    start.add_argument('--event-name', default=None, help='Only replay this event')
+    start.add_argument('--new-insert-ids', action='store_true',
+                       help='Send as new events instead of letting Amplitude deduplicate ones it already has')
+    start.add_argument('--chunk-minutes', type=int, default=settings.REPLAY_CHUNK_MINUTES)
+
+    resume = commands.add_parser('resume', help='Continue a job from its checkpoints')
+    resume.add_argument('job_id', type=UUID)
+
+    status = commands.add_parser('status', help='Show the progress of a job')
+    status.add_argument('job_id', type=UUID)
+
+    for command in (start, resume):
+        command.add_argument('--workers', type=int, default=settings.REPLAY_WORKERS,
+                             help='Worker processes sending chunks in parallel')
+        command.add_argument('--max-rate', type=float, default=settings.REPLAY_MAX_EVENTS_PER_SECOND,
+                             help='Combined events per second across all workers')
+    return parser
+
+
+def main():
+    parser = create_arg_parser()
+    args = parser.parse_args()
+    configure_logging(args.loglevel)
+
+    if args.command == 'status':
+        result = replay_status(args.job_id)
+    else:
+        if args.command == 'start':
+            job = create_replay_job(args.destination, args.app_ids, args.start, args.end,
+                                    event_name=args.event_name, new_insert_ids=args.new_insert_ids,
+                                    chunk_minutes=args.chunk_minutes)
+            job_id = job.id
+            print(f"Replay job {job_id}, resume with: python replay.py resume {job_id}", flush=True)
+        else:
+            job_id = args.job_id
+        result = run_replay(job_id, workers=args.workers, max_events_per_second=args.max_rate)
+
+    print(json.dumps(result, indent=2))
+    shutdown_logging()
+    if result.get('status') == 'error':
+        exit(1)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except ImportError as e:
+        logging.error(f"Cannot import required modules: {e}")
+        exit(1)
+    except Exception as e:
+        logging.error(f"Error occurred: {e}")
+        exit(1)
@@ -0,0 +1,144 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+
+from app.core.compression import BodyTooLarge, DecompressionMiddleware, GzipDecoder, ZstdDecoder
+
+zstandard = pytest.importorskip("zstandard")
+
+LIMIT = 1024 * 1024
+BOMB = b"\0" * (10 * LIMIT)
+
+
+def decode(decoder_class, body: bytes, chunk_size: int = 1000) -> bytes:
+    decoder = decoder_class(LIMIT)
+    for start in range(0, len(body), chunk_size):
+        decoder.feed(body[start:start + chunk_size])
+    return decoder.finish()
+
+
+def test_gzip_round_trip():
+    payload = json.dumps([{"event_name": "cart_add", "n": n} for n in range(1000)]).encode()
+
+    assert decode(GzipDecoder, gzip.compress(payload)) == payload
+
+
+def test_gzip_multi_member_decodes_every_member():
+    body = gzip.compress(b"first ") + gzip.compress(b"second ") + gzip.compress(b"third")
+
+    assert decode(GzipDecoder, body, chunk_size=7) == gzip.decompress(body) == b"first second third"
+
+
+def test_gzip_bomb_is_rejected_at_the_limit():
+    with pytest.raises(BodyTooLarge):
+        decode(GzipDecoder, gzip.compress(BOMB))
+
+
+def test_gzip_multi_member_bomb_is_rejected_at_the_limit():
+    member = gzip.compress(b"\0" * (LIMIT // 2 + 1))
+
+    with pytest.raises(BodyTooLarge):
+        decode(GzipDecoder, member + member)
+
+
+def test_truncated_gzip_is_rejected():
+    body = gzip.compress(b"x" * 10000)
+
+    with pytest.raises(zlib.error):
+        decode(GzipDecoder, body[:-10])
+
+
+def test_zstd_multi_frame_decodes_every_frame():
+    compressor = zstandard.ZstdCompressor()
+    body = compressor.compress(b"first ") + compressor.compress(b"second")
+
+    assert decode(ZstdDecoder, body) == b"first second"
+
+
+def test_zstd_bomb_is_rejected_at_the_limit():
+    with pytest.raises(BodyTooLarge):
+        decode(ZstdDecoder, zstandard.ZstdCompressor().compress(BOMB))
+
+
+@pytest.mark.parametrize("frames", [1, 2])
+def test_truncated_zstd_is_rejected(frames):
+    compressor = zstandard.ZstdCompressor()
+    body = b"".join(compressor.compress(b"x" * 100000) for _ in range(frames))
+
+    with pytest.raises(zstandard.ZstdError):
+        decode(ZstdDecoder, body[:-5])
+
+
+def call_middleware(body: bytes, encoding: str, chunk_size: int = 1000):
+    """POST ``body`` through the middleware; returns (status, detail or the body the app received)."""
+    received = {}
+
+    async def app(scope, receive, send):
+        message = await receive()
+        received["body"] = message["body"]
+        received["headers"] = dict(scope["headers"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = DecompressionMiddleware(app, path_prefix="/app/v1", max_body_bytes=LIMIT)
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)] or [b""]
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/app/v1/analytics/track",
+             "headers": [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode())]}
+    asyncio.run(middleware(scope, receive, send))
+
+    status = sent[0]["status"]
+    if status != 200:
+        return status, json.loads(sent[1]["body"])["detail"]
+    return status, received
+
+
+def test_middleware_hands_the_app_the_decompressed_body():
+    payload = b'{"event_name": "cart_add"}'
+
+    status, received = call_middleware(gzip.compress(payload), "gzip")
+
+    assert status == 200
+    assert received["body"] == payload
+    assert received["headers"][b"content-length"] == str(len(payload)).encode()
+    assert b"content-encoding" not in received["headers"]
+
+
+def test_middleware_rejects_unsupported_encoding():
+    status, detail = call_middleware(b"...", "br")
+
+    assert status == 415
+    assert "br" in detail
+
+
+@pytest.mark.parametrize("encoding, body", [
+    ("gzip", gzip.compress(BOMB)),
+    ("zstd", zstandard.ZstdCompressor().compress(BOMB)),
+])
+def test_middleware_rejects_bombs(encoding, body):
+    status, _ = call_middleware(body, encoding)
+
+    assert status == 413
+
+
+@pytest.mark.parametrize("encoding, body", [
+    ("gzip", gzip.compress(b"x" * 10000)[:-10]),
+    ("zstd", zstandard.ZstdCompressor().compress(b"x" * 10000)[:-5]),
+    ("gzip", b"not gzip at all"),
+])
+def test_middleware_rejects_invalid_bodies(encoding, body):
+    status, _ = call_middleware(body, encoding)
+
+    assert status == 400
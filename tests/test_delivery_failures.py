@@ -0,0 +1,136 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from amplitude import BaseEvent, Config
+from amplitude.http_client import Response
+from amplitude.processor import ResponseProcessor
+from amplitude.storage import InMemoryStorage
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.pipeline import batch
+from app.queries.track import schedule_analytics_retries
+from app.services.amplitude import is_permanent_failure
+
+
+@pytest.mark.parametrize("code, message, permanent", [
+    (400, "Invalid field values on some events", True),
+    (413, "Payload too large", True),
+    (400, "Request missing required field api_key", False),
+    (400, "Event reached max retry times 1.", False),
+    (413, "Event reached max retry times 1.", False),
+    (400, "Destination buffer full. Retry temporarily disabled", False),
+    (400, None, True),
+    (429, "Exceeded daily quota", False),
+    (500, "Internal server error", False),
+    (0, "No response from Amplitude", False),
+])
+def test_is_permanent_failure(code, message, permanent):
+    assert is_permanent_failure(code, message) is permanent
+
+
+def process(body: dict, event_count: int) -> list:
+    """Run an Amplitude response through the SDK's processor as AmplitudeTracker configures it."""
+    outcomes = []
+    configuration = Config(flush_max_retries=1, callback=lambda event, code, message: outcomes.append(
+        (event.event_type, is_permanent_failure(code, message))))
+    storage = InMemoryStorage()
+    storage.setup(configuration, None)
+    processor = ResponseProcessor()
+    processor.setup(configuration, storage)
+    events = [BaseEvent(event_type=f"event_{n}", user_id="u1") for n in range(event_count)]
+    processor.process_response(Response(Response.get_status(body["code"]), body), events)
+    return sorted(outcomes)
+
+
+def test_400_gives_up_only_on_the_events_listed_as_invalid():
+    body = {"code": 400, "error": "Invalid field values on some events",
+            "events_with_invalid_fields": {"time": [1]}, "silenced_events": [2]}
+
+    assert process(body, 4) == [("event_0", False), ("event_1", True), ("event_2", True), ("event_3", False)]
+
+
+def test_400_missing_request_field_is_retried():
+    body = {"code": 400, "error": "Request missing required field", "missing_field": "api_key"}
+
+    assert process(body, 2) == [("event_0", False), ("event_1", False)]
+
+
+def test_413_gives_up_on_a_single_event_only():
+    body = {"code": 413, "error": "Payload too large"}
+
+    assert process(body, 1) == [("event_0", True)]
+    assert process(body, 3) == [("event_0", False), ("event_1", False), ("event_2", False)]
+
+
+def test_server_errors_are_retried():
+    assert process({"code": 503, "error": "Service unavailable"}, 2) == [("event_0", False), ("event_1", False)]
+
+
+class FakeSession:
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return self.rows
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_schedule_retries_gives_up_at_the_attempt_limit():
+    retried, exhausted = uuid4(), uuid4()
+    session = FakeSession(rows=[(retried, None), (exhausted, datetime(2025, 6, 18))])
+
+    given_up = schedule_analytics_retries(session, [retried, exhausted], "500: error", datetime(2025, 6, 18),
+                                          base_seconds=1.0, max_seconds=60.0, max_attempts=5)
+
+    assert given_up == [exhausted]
+    assert "analyticstrackbase.attempts + 1 >= 5" in compiled(session.statements[0])
+
+
+def test_schedule_retries_gives_up_on_every_row_of_a_permanent_failure():
+    session = FakeSession()
+
+    schedule_analytics_retries(session, [uuid4()], "400: invalid", datetime(2025, 6, 18),
+                               base_seconds=1.0, max_seconds=60.0, max_attempts=5, give_up=True)
+
+    statement = compiled(session.statements[0])
+    assert "CASE WHEN true THEN" in statement
+    assert ">= 5" not in statement
+
+
+def test_failures_are_grouped_by_permanence(monkeypatch):
+    monkeypatch.setattr(settings, "DELIVERY_MAX_ATTEMPTS", 3)
+    attempts = {}
+    calls = []
+
+    def schedule(session, ids, error, now, base_seconds, max_seconds, max_attempts, give_up=False):
+        calls.append((error, give_up))
+        for row_id in ids:
+            attempts[row_id] = attempts.get(row_id, 0) + 1
+        return [row_id for row_id in ids if give_up or attempts[row_id] >= max_attempts]
+
+    monkeypatch.setattr(batch, "schedule_analytics_retries", schedule)
+    invalid, shared, server = uuid4(), uuid4(), uuid4()
+    failed_ids = {invalid: [invalid], shared: [shared], server: [server]}
+    failed = {invalid: (400, "Invalid field values on some events"),
+              shared: (400, "Event reached max retry times 1."),
+              server: (500, "Internal server error")}
+
+    retried, given_up = batch._schedule_retries(None, failed_ids, failed, datetime(2025, 6, 18))
+
+    assert sorted(calls) == [("400: Event reached max retry times 1.", False),
+                             ("400: Invalid field values on some events", True),
+                             ("500: Internal server error", False)]
+    assert given_up == [invalid]
+    assert sorted(retried) == sorted([shared, server])
+
+    for _ in range(2):
+        retried, given_up = batch._schedule_retries(None, {shared: [shared]}, {shared: failed[shared]},
+                                                    datetime(2025, 6, 18))
+    assert (retried, given_up) == ([], [shared])
@@ -0,0 +1,68 @@
+import random
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.pipeline.identify import coalesce_operations
+from app.queries.identify import claim_identify_operations
+
+CREATED_AT = datetime(2025, 6, 18, 9, 30)
+
+
+def operation(user_id, user_properties, created_at=CREATED_AT):
+    return SimpleNamespace(id=uuid4(), app_id="esa", user_id=user_id, device_id=None,
+                           user_properties=user_properties, created_at=created_at)
+
+
+def test_coalescing_is_independent_of_claim_order():
+    # Same created_at, so only the id orders them
+    operations = [operation("u1", {"$add": {"points": n}}) for n in range(5)]
+    operations += [operation("u1", {"$setOnce": {"points": 0}}), operation("u2", {"$set": {"plan": "pro"}})]
+
+    first, _ = coalesce_operations(operations, 60)
+    for _ in range(5):
+        random.shuffle(operations)
+        again, _ = coalesce_operations(operations, 60)
+        assert [(i.insert_id, i.operations) for i in again] == [(i.insert_id, i.operations) for i in first]
+
+
+def test_insert_id_changes_with_the_coalesced_operations():
+    operations = [operation("u1", {"$add": {"points": 1}}), operation("u1", {"$add": {"points": 2}})]
+
+    [both], _ = coalesce_operations(operations, 60)
+    [first], _ = coalesce_operations(operations[:1], 60)
+
+    assert both.insert_id != first.insert_id
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(all=lambda: [])
+
+    def commit(self):
+        self.committed = True
+
+
+def test_claim_takes_every_operation_of_the_claimed_users():
+    session = FakeSession()
+
+    claim_identify_operations(session, 100, datetime(2025, 6, 18, 9, 31), datetime(2025, 6, 18, 9, 36))
+
+    statement = str(session.statements[0].compile(dialect=postgresql.dialect(),
+                                                  compile_kwargs={"literal_binds": True}))
+    claimed, users = statement.split("EXISTS", 1)
+    assert "SET available_at='2025-06-18 09:36:00'" in claimed
+    assert "LIMIT" not in claimed
+    assert "LIMIT 100" in users
+    assert "user_id IS NOT DISTINCT FROM identifyoperation.user_id" in users
+    assert "device_id IS NOT DISTINCT FROM identifyoperation.device_id" in users
+    assert statement.rstrip().endswith("identifyoperation.created_at")
+    assert "FOR UPDATE SKIP LOCKED" in statement
+    assert session.committed
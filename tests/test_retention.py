@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from app.pipeline import retention
+from app.pipeline.retention import RetentionPurge
+
+
+class FakeSession:
+    def commit(self):
+        pass
+
+
+def make_purge(monkeypatch, chunk_size=10, max_run_seconds=60.0, lag=0.0):
+    monkeypatch.setattr(retention, "select_replication_lag_seconds", lambda session: lag)
+    monkeypatch.setattr(retention, "select_active_backends", lambda session: 0)
+    monkeypatch.setattr(retention, "HEADROOM_POLL_SECONDS", 0.0)
+    return RetentionPurge(chunk_size=chunk_size, pause_seconds=0.0, max_lag_seconds=5.0,
+                          max_active_backends=10, max_run_seconds=max_run_seconds)
+
+
+def test_purge_table_deletes_in_chunks_until_short_chunk(monkeypatch):
+    purge = make_purge(monkeypatch)
+    remaining = [25]
+    cutoffs = []
+
+    def purge_rows(session, cutoff, limit):
+        cutoffs.append(cutoff)
+        deleted = min(remaining[0], limit)
+        remaining[0] -= deleted
+        return deleted
+
+    cutoff = datetime(2025, 6, 1)
+    assert purge.purge_table(FakeSession(), "pipelinebatch", purge_rows, cutoff)
+
+    assert purge.table_rows_purged == {"pipelinebatch": 25}
+    assert purge.chunks == 3
+    assert cutoffs == [cutoff] * 3
+
+
+def test_purge_table_stops_when_database_stays_loaded(monkeypatch):
+    purge = make_purge(monkeypatch, max_run_seconds=0.05, lag=60.0)
+
+    def purge_rows(session, cutoff, limit):
+        raise AssertionError("must not delete while replication lags")
+
+    assert not purge.purge_table(FakeSession(), "identifyoperation", purge_rows, datetime(2025, 6, 1))
+    assert purge.table_rows_purged == {"identifyoperation": 0}
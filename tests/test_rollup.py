@@ -0,0 +1,104 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.pipeline.records import EventRecord
+from app.pipeline.rollup import FINAL_OUTCOMES, RollupCounts, bucket_start
+from app.queries.rollup import select_rollup_counts
+from app.routes import stats
+from app.routes.stats import get_event_stats
+
+
+def test_bucket_start_floors_to_minute_and_hour():
+    timestamp = datetime(2025, 6, 18, 9, 42, 18, 123456)
+
+    assert bucket_start(timestamp, "minute") == datetime(2025, 6, 18, 9, 42)
+    assert bucket_start(timestamp, "hour") == datetime(2025, 6, 18, 9)
+    with pytest.raises(ValueError):
+        bucket_start(timestamp, "day")
+
+
+def test_rollup_counts_fold_minutes_into_hours():
+    rows = [EventRecord(id=uuid4(), event_id=uuid4(), app_id="esa", event_name="cart_add", event_data={},
+                        user_id="u1", device_id=None, created_at=datetime(2025, 6, 18, 9, minute))
+            for minute in (1, 1, 59)]
+    counts = RollupCounts(rows)
+    counts.add([row.id for row in rows], "delivered")
+    counts.add([rows[0].id], "retried")
+
+    assert counts.by_granularity("minute")[(datetime(2025, 6, 18, 9, 1), "esa", "cart_add", "delivered")] == 2
+    assert counts.by_granularity("hour") == {
+        (datetime(2025, 6, 18, 9), "esa", "cart_add", "delivered"): 3,
+        (datetime(2025, 6, 18, 9), "esa", "cart_add", "retried"): 1,
+    }
+
+
+class FakeSession:
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.statements = []
+
+    def exec(self, statement):
+        self.statements.append(statement)
+        return self.rows
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_select_rollup_counts_filters_outcomes():
+    session = FakeSession()
+
+    select_rollup_counts(session, "hour", datetime(2025, 6, 18), datetime(2025, 6, 19), ["app_id"],
+                         outcomes=FINAL_OUTCOMES)
+    select_rollup_counts(session, "hour", datetime(2025, 6, 18), datetime(2025, 6, 19), ["app_id"],
+                         filters={"outcome": "retried"})
+
+    assert "outcome IN ('delivered', 'sampled_out', 'given_up')" in compiled(session.statements[0])
+    assert "outcome = 'retried'" in compiled(session.statements[1])
+    assert " IN " not in compiled(session.statements[1])
+
+
+@pytest.fixture
+def rollup_query(monkeypatch):
+    calls = []
+
+    def select(session, granularity, start, end, group_by, filters, outcomes=None):
+        calls.append({"granularity": granularity, "start": start, "end": end,
+                      "filters": filters, "outcomes": outcomes})
+        return [{"bucket": start, "app_id": "esa", "count": 3}, {"bucket": end, "app_id": "esa", "count": 4}]
+
+    monkeypatch.setattr(stats, "select_rollup_counts", select)
+    return calls
+
+
+def test_stats_count_final_outcomes_by_default(rollup_query):
+    result = get_event_stats(None, start=datetime(2025, 6, 18), end=datetime(2025, 6, 19),
+                             granularity="hour", group_by=["app_id"], app_id=None, event_name=None, outcome=None)
+
+    assert rollup_query[0]["outcomes"] == FINAL_OUTCOMES
+    assert rollup_query[0]["filters"] == {}
+    assert result["total"] == 7
+
+
+def test_stats_count_retried_attempts_when_asked(rollup_query):
+    get_event_stats(None, start=datetime(2025, 6, 18), end=datetime(2025, 6, 19),
+                    granularity="hour", group_by=["app_id"], app_id=None, event_name=None, outcome="retried")
+
+    assert rollup_query[0]["outcomes"] is None
+    assert rollup_query[0]["filters"] == {"outcome": "retried"}
+
+
+@pytest.mark.parametrize("granularity, start, floored", [
+    ("minute", datetime(2025, 6, 18, 9, 42, 18), datetime(2025, 6, 18, 9, 42)),
+    ("hour", datetime(2025, 6, 18, 9, 42, 18), datetime(2025, 6, 18, 9)),
+])
+def test_stats_floor_start_to_its_bucket(rollup_query, granularity, start, floored):
+    result = get_event_stats(None, start=start, end=datetime(2025, 6, 18, 10, 30), granularity=granularity,
+                             group_by=["app_id"], app_id=None, event_name=None, outcome=None)
+
+    assert rollup_query[0]["start"] == floored
+    assert result["start"] == floored.isoformat()
@@ -0,0 +1,37 @@
+from datetime import datetime
+from uuid import uuid4
+
+from app.pipeline.records import EventRecord
+from app.pipeline.rules import EventRule, RuleEngine
+
+engine = RuleEngine([EventRule("esa", "heartbeat", "aggregate", window_seconds=300)])
+
+
+def heartbeat(second: int) -> EventRecord:
+    return EventRecord(id=uuid4(), event_id=uuid4(), app_id="esa", event_name="heartbeat", event_data={},
+                       user_id="u1", device_id=None, created_at=datetime(2025, 6, 18, 9, 0, second))
+
+
+def test_counter_event_stands_for_every_merged_row():
+    rows = [heartbeat(second) for second in (1, 2, 3)]
+
+    outcome = engine.apply(rows)
+
+    [counter] = outcome.records
+    assert counter.event_data["count"] == 3
+    assert outcome.merged_ids == {counter.id: [row.id for row in rows]}
+    assert counter.id not in {row.id for row in rows}
+    assert counter.event_id == counter.id
+
+
+def test_counter_id_depends_on_all_merged_rows_not_their_order():
+    rows = [heartbeat(second) for second in (1, 2, 3)]
+
+    [counter] = engine.apply(rows).records
+    [reordered] = engine.apply(list(reversed(rows))).records
+    [complemented] = engine.apply(rows + [heartbeat(4)]).records
+    [first_only] = engine.apply(rows[:1]).records
+
+    assert reordered.id == counter.id
+    assert complemented.id != counter.id
+    assert first_only.id != counter.id
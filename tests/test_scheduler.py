@@ -0,0 +1,65 @@
+from app.pipeline.scheduler import FairScheduler
+
+
+def test_plan_splits_batch_by_weight():
+    scheduler = FairScheduler(weights={"a": 3.0, "b": 1.0})
+
+    assert scheduler.plan(["a", "b"], 100) == {"a": 75, "b": 25}
+
+
+def test_plan_skips_apps_without_weight():
+    scheduler = FairScheduler(weights={"b": 0.0})
+
+    assert scheduler.plan(["a", "b"], 10) == {"a": 10}
+    assert scheduler.plan([], 10) == {}
+    assert scheduler.plan(["a"], 0) == {}
+
+
+def test_plan_respects_quotas():
+    scheduler = FairScheduler(quotas={"a": 10})
+
+    allowance = scheduler.plan(["a", "b"], 100)
+
+    assert allowance["a"] == 10
+    assert sum(allowance.values()) <= 100
+
+
+def test_plan_assigns_rounding_remainder():
+    scheduler = FairScheduler()
+
+    allowance = scheduler.plan(["a", "b", "c"], 100)
+
+    assert sum(allowance.values()) == 100
+    assert max(allowance.values()) - min(allowance.values()) <= 1
+
+
+def test_plan_never_exceeds_batch_size():
+    scheduler = FairScheduler(weights={"a": 5.0})
+
+    # Nothing is charged, as if every claim was lost: credit must not pile up
+    for _ in range(50):
+        allowance = scheduler.plan(["a", "b", "c"], 100)
+        assert sum(allowance.values()) <= 100
+        assert all(rows <= 100 for rows in allowance.values())
+
+    assert all(deficit <= 100 for deficit in scheduler._deficits.values())
+
+
+def test_charge_forfeits_deficit_when_app_runs_dry():
+    scheduler = FairScheduler()
+    allowance = scheduler.plan(["a", "b"], 100)
+
+    scheduler.charge("a", 3, allowance["a"])
+    scheduler.charge("b", allowance["b"], allowance["b"])
+
+    assert scheduler._deficits == {"a": 0.0, "b": 0.0}
+    assert scheduler.plan(["a", "b"], 100) == {"a": 50, "b": 50}
+
+
+def test_plan_drops_credit_of_apps_without_backlog():
+    scheduler = FairScheduler()
+    scheduler.plan(["a", "b"], 100)
+
+    scheduler.plan(["b"], 100)
+
+    assert "a" not in scheduler._deficits
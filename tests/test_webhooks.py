@@ -0,0 +1,91 @@
+import socket
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.pipeline.webhooks import WebhookClient, is_callable_url, parse_ip_address
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://127.1/hook",
+    "http://0177.0.0.1/hook",
+    "http://2130706433/hook",
+    "http://0x7f.0.0.1/hook",
+    "http://10.1.2.3/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "http://[fe80::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://[::ffff:10.0.0.1]/hook",
+    "http://0.0.0.0/hook",
+])
+def test_non_public_addresses_are_not_callable(url):
+    assert not is_callable_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "https://hooks.example.com/events",
+    "http://8.8.8.8/hook",
+    "http://[2606:4700::1111]/hook",
+])
+def test_public_urls_are_callable(url):
+    assert is_callable_url(url)
+
+
+@pytest.mark.parametrize("url", ["ftp://example.com/hook", "file:///etc/passwd", "http:///hook", "http://[::1/hook"])
+def test_other_urls_are_not_callable(url):
+    assert not is_callable_url(url)
+
+
+def test_allowed_hosts(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", ["Hooks.Example.com"])
+
+    assert is_callable_url("https://hooks.example.com/events")
+    assert not is_callable_url("https://other.example.com/events")
+
+
+def test_parse_ip_address_normalizes_ipv4_forms():
+    assert str(parse_ip_address("127.1")) == "127.0.0.1"
+    assert str(parse_ip_address("2130706433")) == "127.0.0.1"
+    assert parse_ip_address("hooks.example.com") is None
+
+
+@pytest.fixture
+def loopback_listener():
+    """An HTTP listener on 127.0.0.1 answering 200 to anything."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    accepted = []
+
+    def serve():
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            accepted.append(connection)
+            connection.recv(65536)
+            connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            connection.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield server.getsockname()[1], accepted
+    server.close()
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "127.1", "0177.0.0.1", "2130706433", "localhost"])
+def test_client_refuses_to_connect_to_loopback(loopback_listener, host):
+    pytest.importorskip("aiohttp")
+    port, accepted = loopback_listener
+    client = WebhookClient(max_connections=4, max_connections_per_host=2, timeout=5.0)
+    try:
+        [(code, error)] = client.post_all([(f"http://{host}:{port}/hook", {"events": []})])
+    finally:
+        client.close()
+
+    assert code is None
+    assert error.startswith("ClientConnectorDNSError")
+    assert not accepted
@@ -1,22 +1,34 @@
 import argparse
 import logging
 
-from app.pipeline.celery_config import celery_app
+from app.pipeline.celery_app import celery_app
+from app.core.config import settings
+from app.core.metrics import start_metrics_server
+from app.pipeline.priority import worker_queues
 
 
 def create_arg_parser():
     parser = argparse.ArgumentParser(description='Start a Celery Worker')
-    parser.add_argument('--loglevel', default='DEBUG', help='Logging level to use')
+    parser.add_argument('--loglevel', default=settings.LOG_LEVEL, help='Logging level to use')
     parser.add_argument('--mingle-enabled', action='store_true', help='Enable worker state synchronization at startup')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Expose Prometheus metrics on this port')
+    parser.add_argument('--queues', default=worker_queues(),
+                        help='Comma-separated queues to consume, e.g. analytics.critical for a dedicated critical-lane worker')
     return parser
 
 
 def main():
     parser = create_arg_parser()
     args = parser.parse_args()
-    command = ['worker', f'--loglevel={args.loglevel}']
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    command = ['worker', f'--loglevel={args.loglevel}', f'--queues={args.queues}']
     if not args.mingle_enabled:
         command.append('--without-mingle')
+    if settings.AUTOSCALE_RESIZE_POOL:
+        # Pool bounds the autoscale controller resizes within, see app/pipeline/autoscale.py
+        command.append(f'--autoscale={settings.AUTOSCALE_MAX_TASKS + settings.AUTOSCALE_POOL_RESERVE},'
+                       f'{settings.AUTOSCALE_POOL_RESERVE}')
     celery_app.worker_main(command)
 
 